@@ -2,28 +2,132 @@
 Flask API - REST Endpoints for Q&A System
 """
 import os
-import traceback
-from flask import Flask, request, jsonify, send_file
+import json
+import atexit
+import functools
+import logging
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from flask_cors import CORS
-from werkzeug.utils import secure_filename
 
-from config import UPLOAD_FOLDER
-from qa_engine import qa_engine
+from config import UPLOAD_FOLDER, MAX_UPLOAD_BYTES, LOG_LEVEL, LOG_FORMAT, ADMIN_TOKEN
+from qa import SchedulerBusy, admin_allowed, setup_logging
+from qa.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from qa_engine import qa_engine, WarmingUp
+
+setup_logging(LOG_LEVEL, LOG_FORMAT)
+log = logging.getLogger(__name__)
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 app = Flask(__name__)
 CORS(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
+
+
+def warming_up_response(e):
+    response = jsonify({"error": str(e), "status": "warming_up", "stage": e.stage})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+
+def busy_response(e):
+    response = jsonify({"error": str(e), "status": "busy", "retry_after": e.retry_after})
+    response.status_code = 503
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response
+
+
+def admin_only(view):
+    """Token or localhost check for routes that change what users are told"""
+    @functools.wraps(view)
+    def wrapped(*args, **kwargs):
+        if not admin_allowed(request.headers, request.remote_addr, ADMIN_TOKEN):
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapped
 
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({
-        "status": "ok",
-        "kb_size": len(qa_engine.knowledge_base)
-    })
+    return jsonify(qa_engine.health_report())
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(qa_engine.render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+
+@app.route('/kb/reload', methods=['POST'])
+@admin_only
+def reload_kb():
+    try:
+        kb_size = qa_engine.reload_kb()
+        return jsonify({"status": "reloaded", "kb_size": kb_size})
+    except WarmingUp as e:
+        return warming_up_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/kb/review', methods=['GET'])
+@admin_only
+def review_queue():
+    return jsonify({"clusters": qa_engine.promoter.review_queue()})
+
+
+@app.route('/kb/review/<int:cluster_id>', methods=['POST'])
+@admin_only
+def review_cluster(cluster_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    action = data.get('action')
+    try:
+        if action == 'approve':
+            cluster = qa_engine.promoter.approve(cluster_id, data.get('answer'))
+        elif action == 'reject':
+            cluster = qa_engine.promoter.reject(cluster_id)
+        else:
+            return jsonify({"error": "action must be 'approve' or 'reject'"}), 400
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    if cluster is None:
+        return jsonify({"error": f"Unknown cluster {cluster_id}"}), 404
+    # Drop cached answers so the decision applies immediately
+    qa_engine.answer_cache.clear()
+    return jsonify({"status": cluster["status"], "cluster": cluster})
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def stream_response(query):
+    # Retrieval and LLM admission run here, so a full queue is a plain 503
+    events = qa_engine.stream_answer(query)
+    
+    def generate():
+        try:
+            for event, payload in events:
+                yield sse_event(event, payload)
+        except SchedulerBusy as e:
+            yield sse_event("busy", {"error": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            log.exception("Stream error")
+            yield sse_event("error", {"error": str(e)})
+        finally:
+            # Runs when the client disconnects too, cancelling the LLM job
+            close = getattr(events, "close", None)
+            if close:
+                close()
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 
 @app.route('/ask', methods=['POST'])
@@ -32,6 +136,7 @@ def ask_question():
         response_format = request.form.get('response_format', 'text')
         
         # Get question from text or audio
+        stt_latency_ms = None
         if 'text' in request.form:
             query = request.form['text']
         elif 'audio' in request.files:
@@ -39,42 +144,58 @@ def ask_question():
             if not qa_engine.allowed_file(audio_file.filename):
                 return jsonify({"error": "Invalid audio format"}), 400
             
-            filename = secure_filename(audio_file.filename)
-            audio_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            audio_file.save(audio_path)
-            
-            query = qa_engine.transcribe_audio(audio_path)
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
-            
+            query, stt_latency_ms = qa_engine.transcribe_audio(audio_file.read())
             if not query:
                 return jsonify({"error": "Could not understand audio"}), 400
         else:
             return jsonify({"error": "No text or audio provided"}), 400
         
-        print(f"\n💬 Question: {query}")
-        
-        # Get answer
-        answer, source = qa_engine.get_answer(query)
-        print(f"📝 Answer ({source}): {answer[:100]}...")
+        log.debug("Question", extra={"query": query, "format": response_format})
         
         # Return in requested format
-        if response_format == 'audio':
-            audio_file = qa_engine.generate_speech(answer)
-            if audio_file and os.path.exists(audio_file):
-                return send_file(audio_file, mimetype='audio/wav')
-            else:
-                return jsonify({"error": "TTS failed"}), 500
+        if response_format == 'stream':
+            return stream_response(query)
+        elif response_format == 'audio':
+            audio_path, audio_stream = qa_engine.answer_audio(query)
+            if audio_path:
+                # Pre-rendered KB audio, served by the WSGI file wrapper (sendfile when available)
+                return send_file(audio_path, mimetype='audio/wav', conditional=True)
+            return Response(stream_with_context(audio_stream), mimetype='audio/wav')
         else:
-            return jsonify({
+            answer, source = qa_engine.get_answer(query)
+            log.debug("Answer", extra={"source": source, "answer": answer[:100]})
+            response = {
                 "answer": answer,
                 "source": source,
                 "format": "text"
-            })
+            }
+            if stt_latency_ms is not None:
+                response["stt_latency_ms"] = round(stt_latency_ms, 1)
+            return jsonify(response)
     
+    except WarmingUp as e:
+        return warming_up_response(e)
+    except SchedulerBusy as e:
+        return busy_response(e)
+    except Exception as e:
+        log.exception("Request failed")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object with \"questions\""}), 400
+    try:
+        results = qa_engine.answer_batch(data.get('questions'))
+        return jsonify({"results": results, "count": len(results)})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except WarmingUp as e:
+        return warming_up_response(e)
     except Exception as e:
-        print(f"Error: {e}")
-        traceback.print_exc()
+        log.exception("Request failed")
         return jsonify({"error": str(e)}), 500
 
 
@@ -86,7 +207,7 @@ def navigate():
         if not destination:
             return jsonify({"error": "No destination"}), 400
         
-        print(f"🧭 Navigating to: {destination}")
+        log.info("🧭 Navigating", extra={"destination": destination})
         return jsonify({
             "status": "success",
             "message": f"Navigating to {destination}"
@@ -96,11 +217,14 @@ def navigate():
 
 
 if __name__ == "__main__":
-    if not qa_engine.initialize():
-        print("❌ Failed to initialize. Exiting.")
-        exit(1)
+    # Models load in the background; /health reports each stage and /ask
+    # serves KB hits as soon as retrieval is ready
+    qa_engine.start_background()
+    # The learned-answer store is written lazily; don't lose the last counts on exit
+    atexit.register(qa_engine.promoter.flush)
     
-    print("\n🚀 Server: http://0.0.0.0:5000")
-    print("Endpoints: GET /health, POST /ask, POST /navigate\n")
+    log.info("🚀 Server: http://0.0.0.0:5000")
+    log.info("Endpoints: GET /health, GET /metrics, POST /ask, POST /ask/batch, POST /navigate, POST /kb/reload, "
+             "GET|POST /kb/review")
     
     app.run(host='0.0.0.0', port=5000, debug=False)
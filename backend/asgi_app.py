@@ -0,0 +1,332 @@
+"""
+ASGI API - same endpoints as app.py on an async stack (Starlette + uvicorn)
+
+The event loop only parses requests and writes responses. Model work runs
+on dedicated thread pools (retrieval/LLM, speech-to-text, text-to-speech),
+so a slow generation never holds up /health or another upload. Uploads are
+read in chunks into a spooled temp file instead of one big buffer, and on
+SIGTERM uvicorn stops accepting connections, lets in-flight requests finish
+and then the LLM queue is drained before the workers exit.
+
+Run:
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000 --timeout-graceful-shutdown 30
+or:
+    python asgi_app.py
+"""
+import json
+import asyncio
+import logging
+import tempfile
+import functools
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from config import (
+    ASGI_HOST, ASGI_PORT, ASGI_MODEL_THREADS, ASGI_STT_THREADS, ASGI_TTS_THREADS, ASGI_SHUTDOWN_TIMEOUT,
+    MAX_UPLOAD_BYTES, LOG_LEVEL, LOG_FORMAT, ADMIN_TOKEN
+)
+from qa import SchedulerBusy, admin_allowed, setup_logging
+from qa.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from qa_engine import qa_engine, WarmingUp
+
+setup_logging(LOG_LEVEL, LOG_FORMAT)
+log = logging.getLogger(__name__)
+
+UPLOAD_CHUNK = 64 * 1024
+UPLOAD_SPOOL = 1024 * 1024  # uploads larger than this go to a temp file on disk
+
+MODEL_EXECUTOR = ThreadPoolExecutor(ASGI_MODEL_THREADS, thread_name_prefix="asgi-model")
+STT_EXECUTOR = ThreadPoolExecutor(ASGI_STT_THREADS, thread_name_prefix="asgi-stt")
+TTS_EXECUTOR = ThreadPoolExecutor(ASGI_TTS_THREADS, thread_name_prefix="asgi-tts")
+
+
+async def run_in(executor, fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, functools.partial(fn, *args))
+
+
+def _close_when_idle(pending, iterator):
+    # A next() may still be running in a worker thread after the client left
+    if pending is not None:
+        with contextlib.suppress(Exception):
+            pending.result()
+    close = getattr(iterator, "close", None)
+    if close:
+        close()
+
+
+async def iterate_in(executor, iterator):
+    """Drive a blocking iterator from the event loop, one next() per executor call"""
+    done = object()
+    pending = None
+    try:
+        while True:
+            pending = executor.submit(next, iterator, done)
+            item = await asyncio.wrap_future(pending)
+            if item is done:
+                break
+            yield item
+    finally:
+        # Closing cancels upstream work, e.g. the LLM job behind a streamed answer
+        executor.submit(_close_when_idle, pending, iterator)
+
+
+def warming_up_response(e):
+    return JSONResponse(
+        {"error": str(e), "status": "warming_up", "stage": e.stage},
+        status_code=503, headers={"Retry-After": "5"}
+    )
+
+
+def busy_response(e):
+    return JSONResponse(
+        {"error": str(e), "status": "busy", "retry_after": e.retry_after},
+        status_code=503, headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def admin_only(endpoint):
+    """Token or localhost check for routes that change what users are told"""
+    @functools.wraps(endpoint)
+    async def wrapped(request):
+        client_host = request.client.host if request.client else None
+        if not admin_allowed(request.headers, client_host, ADMIN_TOKEN):
+            return JSONResponse({"error": "Admin access required"}, status_code=403)
+        return await endpoint(request)
+    return wrapped
+
+
+def limited_receive(receive, limit):
+    """ASGI receive wrapper that rejects bodies larger than limit while they stream in"""
+    received = 0
+
+    async def wrapped():
+        nonlocal received
+        message = await receive()
+        received += len(message.get("body", b""))
+        if received > limit:
+            raise HTTPException(413, f"Upload larger than {limit} bytes")
+        return message
+    return wrapped
+
+
+async def read_question(request):
+    """
+    Parse /ask input: a multipart form (text or audio field) or a raw audio/* body
+    :return: (fields dict, spooled audio file or None, audio filename)
+    """
+    request = Request(request.scope, limited_receive(request.receive, MAX_UPLOAD_BYTES))
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("audio/"):
+        audio = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL)
+        async for chunk in request.stream():
+            audio.write(chunk)
+        audio.seek(0)
+        subtype = content_type.split("/", 1)[1].split(";")[0].strip()
+        return dict(request.query_params), audio, f"upload.{subtype}"
+
+    # Starlette's multipart parser streams file parts into spooled temp files
+    form = await request.form(max_files=1)
+    fields = {key: value for key, value in form.items() if isinstance(value, str)}
+    upload = form.get("audio")
+    if upload is None or isinstance(upload, str):
+        return fields, None, None
+    return fields, upload.file, upload.filename or ""
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def sse_stream(events):
+    try:
+        async for event, payload in iterate_in(MODEL_EXECUTOR, events):
+            yield sse_event(event, payload)
+    except SchedulerBusy as e:
+        yield sse_event("busy", {"error": str(e), "retry_after": e.retry_after})
+    except Exception as e:
+        log.exception("Stream error")
+        yield sse_event("error", {"error": str(e)})
+
+
+async def health(request):
+    # Never touches a model, so probes are answered even while every executor is busy
+    return JSONResponse(qa_engine.health_report())
+
+
+async def metrics(request):
+    # Aggregating the workers' metrics reads files: off the event loop, but not
+    # behind the model threads, which may all be waiting on the LLM
+    return Response(await run_in(None, qa_engine.render_metrics), media_type=METRICS_CONTENT_TYPE)
+
+
+@admin_only
+async def reload_kb(request):
+    try:
+        kb_size = await run_in(MODEL_EXECUTOR, qa_engine.reload_kb)
+        return JSONResponse({"status": "reloaded", "kb_size": kb_size})
+    except WarmingUp as e:
+        return warming_up_response(e)
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@admin_only
+async def review_queue(request):
+    return JSONResponse({"clusters": qa_engine.promoter.review_queue()})
+
+
+@admin_only
+async def review_cluster(request):
+    cluster_id = request.path_params["cluster_id"]
+    try:
+        data = await request.json()
+    except ValueError:
+        return JSONResponse({"error": "Body must be JSON"}, status_code=400)
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Body must be a JSON object"}, status_code=400)
+    action = data.get("action")
+    try:
+        if action == "approve":
+            cluster = await run_in(MODEL_EXECUTOR, qa_engine.promoter.approve, cluster_id, data.get("answer"))
+        elif action == "reject":
+            cluster = await run_in(MODEL_EXECUTOR, qa_engine.promoter.reject, cluster_id)
+        else:
+            return JSONResponse({"error": "action must be 'approve' or 'reject'"}, status_code=400)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=409)
+    if cluster is None:
+        return JSONResponse({"error": f"Unknown cluster {cluster_id}"}, status_code=404)
+    qa_engine.answer_cache.clear()
+    return JSONResponse({"status": cluster["status"], "cluster": cluster})
+
+
+async def ask_question(request):
+    audio = None
+    try:
+        fields, audio, filename = await read_question(request)
+        response_format = fields.get("response_format", "text")
+
+        stt_latency_ms = None
+        if "text" in fields:
+            query = fields["text"]
+        elif audio is not None:
+            if not qa_engine.allowed_file(filename):
+                return JSONResponse({"error": "Invalid audio format"}, status_code=400)
+            query, stt_latency_ms = await run_in(STT_EXECUTOR, lambda: qa_engine.transcribe_audio(audio.read()))
+            if not query:
+                return JSONResponse({"error": "Could not understand audio"}, status_code=400)
+        else:
+            return JSONResponse({"error": "No text or audio provided"}, status_code=400)
+
+        log.debug("Question", extra={"query": query, "format": response_format})
+
+        if response_format == "stream":
+            # Admission happens before the response starts, so a full queue is a plain 503
+            events = await run_in(MODEL_EXECUTOR, qa_engine.stream_answer, query)
+            return StreamingResponse(
+                sse_stream(events),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+        elif response_format == "audio":
+            audio_path, audio_stream = await run_in(MODEL_EXECUTOR, qa_engine.answer_audio, query)
+            if audio_path:
+                return FileResponse(audio_path, media_type="audio/wav")
+            return StreamingResponse(iterate_in(TTS_EXECUTOR, audio_stream), media_type="audio/wav")
+        else:
+            answer, source = await run_in(MODEL_EXECUTOR, qa_engine.get_answer, query)
+            log.debug("Answer", extra={"source": source, "answer": answer[:100]})
+            response = {"answer": answer, "source": source, "format": "text"}
+            if stt_latency_ms is not None:
+                response["stt_latency_ms"] = round(stt_latency_ms, 1)
+            return JSONResponse(response)
+
+    except WarmingUp as e:
+        return warming_up_response(e)
+    except SchedulerBusy as e:
+        return busy_response(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.exception("Request failed")
+        return JSONResponse({"error": str(e)}, status_code=500)
+    finally:
+        if audio is not None:
+            audio.close()
+
+
+async def ask_batch(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Body must be a JSON object with \"questions\""}, status_code=400)
+    try:
+        results = await run_in(MODEL_EXECUTOR, qa_engine.answer_batch, data.get("questions"))
+        return JSONResponse({"results": results, "count": len(results)})
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except WarmingUp as e:
+        return warming_up_response(e)
+    except Exception as e:
+        log.exception("Request failed")
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def navigate(request):
+    try:
+        data = await request.json()
+        destination = data.get("destination")
+        if not destination:
+            return JSONResponse({"error": "No destination"}, status_code=400)
+
+        log.info("🧭 Navigating", extra={"destination": destination})
+        return JSONResponse({"status": "success", "message": f"Navigating to {destination}"})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    # Models load in the background; /health reports each stage
+    qa_engine.start_background()
+    yield
+    # uvicorn has already stopped accepting and waited for open requests
+    await run_in(None, qa_engine.shutdown, ASGI_SHUTDOWN_TIMEOUT)
+    for executor in (MODEL_EXECUTOR, STT_EXECUTOR, TTS_EXECUTOR):
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route("/health", health, methods=["GET"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/ask", ask_question, methods=["POST"]),
+        Route("/ask/batch", ask_batch, methods=["POST"]),
+        Route("/navigate", navigate, methods=["POST"]),
+        Route("/kb/reload", reload_kb, methods=["POST"]),
+        Route("/kb/review", review_queue, methods=["GET"]),
+        Route("/kb/review/{cluster_id:int}", review_cluster, methods=["POST"]),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    log.info(f"🚀 Server (ASGI): http://{ASGI_HOST}:{ASGI_PORT}")
+    log.info("Endpoints: GET /health, GET /metrics, POST /ask, POST /ask/batch, POST /navigate, POST /kb/reload, "
+             "GET|POST /kb/review")
+    uvicorn.run(app, host=ASGI_HOST, port=ASGI_PORT, timeout_graceful_shutdown=ASGI_SHUTDOWN_TIMEOUT)
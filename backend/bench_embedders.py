@@ -0,0 +1,96 @@
+"""
+Compare embedding backends: PyTorch SentenceTransformer vs int8 ONNX Runtime
+Each backend runs in a fresh process so import time and memory are isolated
+
+Usage:
+    python bench_embedders.py [--queries 200] [--backends torch,onnx]
+"""
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+
+QUERIES = [
+    "Where is the library?", "What are the fee office timings?", "Who teaches Data Structures?",
+    "Where is the CS Lab?", "hello", "How do I apply for admission?", "Where is Professor Sara Ali's office?"
+]
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+BACKEND_MODULES = {
+    "torch": ("sentence_transformers",),
+    "onnx": ("onnxruntime", "tokenizers"),
+}
+
+
+def child(backend, n_queries):
+    start = time.perf_counter()
+    from config import EMBED_MODEL, ONNX_EMBED_DIR, EMBED_THREADS
+    from qa.embedders import create_embedder
+    # The embedders import their runtime lazily; import it here so it's timed as import, not load
+    for module in BACKEND_MODULES.get(backend, ()):
+        importlib.import_module(module)
+    import_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    embedder = create_embedder(backend, EMBED_MODEL, ONNX_EMBED_DIR, EMBED_THREADS)
+    load_s = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    embedder.encode([QUERIES[0]])
+    first_ms = (time.perf_counter() - start) * 1000
+    
+    latencies = []
+    for i in range(n_queries):
+        start = time.perf_counter()
+        embedder.encode([QUERIES[i % len(QUERIES)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    
+    print(json.dumps({
+        "backend": backend,
+        "import_s": import_s,
+        "load_s": load_s,
+        "first_query_ms": first_ms,
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[int(len(latencies) * 0.95)],
+        "rss_mb": rss_mb()
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", default="torch,onnx")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        child(args.child, args.queries)
+        return
+    
+    print(f"{'backend':<8} {'import s':>9} {'load s':>8} {'1st ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'RSS MB':>8}")
+    for backend in args.backends.split(","):
+        p = subprocess.run(
+            [sys.executable, __file__, "--child", backend, "--queries", str(args.queries)],
+            capture_output=True, text=True
+        )
+        if p.returncode != 0:
+            print(f"{backend:<8} failed: {p.stderr.strip().splitlines()[-1] if p.stderr.strip() else p.returncode}")
+            continue
+        r = json.loads(p.stdout.strip().splitlines()[-1])
+        print(f"{r['backend']:<8} {r['import_s']:9.2f} {r['load_s']:8.2f} {r['first_query_ms']:8.1f} "
+              f"{r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['rss_mb']:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
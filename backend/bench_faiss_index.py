@@ -0,0 +1,94 @@
+"""
+Benchmark FAISS index types against the flat index
+Reports recall@k, single-query latency and memory for every option on a
+synthetic clustered corpus of normalized 384-dim vectors (MiniLM-shaped)
+
+Usage:
+    python bench_faiss_index.py [--sizes 10000,100000] [--queries 500] [--k 10]
+"""
+import time
+import argparse
+
+import faiss
+import numpy as np
+
+from config import FAISS_INDEX_PARAMS
+from qa.index_factory import INDEX_TYPES, build_index, choose_index_type, normalize
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * 4096
+
+
+def synthetic_corpus(n, dim, n_queries, seed=0):
+    """Clustered unit vectors plus noisy copies of corpus points as queries"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 50, 1), dim)).astype("float32")
+    corpus = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim)).astype("float32")
+    picks = rng.integers(0, n, n_queries)
+    queries = corpus[picks] + 0.2 * rng.standard_normal((n_queries, dim)).astype("float32")
+    return normalize(corpus), normalize(queries)
+
+
+def bench(index_type, corpus, queries, truth, k):
+    rss_before = rss_bytes()
+    start = time.perf_counter()
+    index = build_index(index_type, corpus, np.arange(len(corpus), dtype="int64"), FAISS_INDEX_PARAMS)
+    build_s = time.perf_counter() - start
+    rss_delta = rss_bytes() - rss_before
+    
+    latencies = []
+    found = np.empty((len(queries), k), dtype="int64")
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)  # single-query latency, as served per request
+    try:
+        for i in range(len(queries)):
+            start = time.perf_counter()
+            _, ids = index.search(queries[i:i + 1], k)
+            latencies.append((time.perf_counter() - start) * 1000)
+            found[i] = ids[0]
+    finally:
+        faiss.omp_set_num_threads(threads)  # the next build and ground truth use every core
+    
+    recall_1 = np.mean(found[:, 0] == truth[:, 0])
+    recall_k = np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))])
+    return {
+        "type": index_type,
+        "build_s": build_s,
+        "recall@1": recall_1,
+        f"recall@{k}": recall_k,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "index_mb": faiss.serialize_index(index).nbytes / 1e6,
+        "rss_mb": max(rss_delta, 0) / 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on a synthetic corpus")
+    parser.add_argument("--sizes", default="10000,100000", help="comma-separated corpus sizes")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    args = parser.parse_args()
+    
+    for n in [int(size) for size in args.sizes.split(",")]:
+        corpus, queries = synthetic_corpus(n, args.dim, args.queries)
+        exact = faiss.IndexFlatL2(args.dim)
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+        
+        print(f"\n📊 {n} vectors x {args.dim} dims, {args.queries} queries "
+              f"(auto picks: {choose_index_type(n, 'auto', FAISS_INDEX_PARAMS)})")
+        print(f"   {'type':<10} {'build s':>8} {'R@1':>6} {f'R@{args.k}':>6} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'index MB':>9} {'RSS +MB':>8}")
+        for index_type in args.types.split(","):
+            r = bench(index_type, corpus, queries, truth, args.k)
+            print(f"   {r['type']:<10} {r['build_s']:8.2f} {r['recall@1']:6.3f} {r[f'recall@{args.k}']:6.3f} "
+                  f"{r['p50_ms']:8.3f} {r['p95_ms']:8.3f} {r['index_mb']:9.1f} {r['rss_mb']:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark route search on synthetic campus graphs
+Compares the original path-copying Dijkstra with the predecessor-map
+Dijkstra and A* (plus, optionally, RouteTable lookups) on the same random
+(start, goal) pairs: per-query latency, peak memory of the search, and a
+check that every method finds routes of the same length
+
+Usage:
+    python bench_navigation.py [--sizes 2x2,6x4,12x4] [--queries 200] [--route-table]
+"""
+import time
+import heapq
+import random
+import argparse
+import tracemalloc
+
+import numpy as np
+
+from navigation import RouteTable, astar, dijkstra
+from navigation.synthetic_campus import generate_campus
+
+
+def legacy_dijkstra(graph_map, start, goal):
+    """The original implementation: a full path copy is pushed for every relaxation"""
+    pq = [(0, start, [start])]
+    visited = set()
+    while pq:
+        current_dist, current_node, path = heapq.heappop(pq)
+        if current_node in visited:
+            continue
+        visited.add(current_node)
+        if current_node == goal:
+            return path, current_dist
+        for neighbor, edge_data in graph_map.get_neighbors(current_node).items():
+            if neighbor not in visited:
+                heapq.heappush(pq, (current_dist + edge_data["distance"], neighbor, path + [neighbor]))
+    return None, None
+
+
+def bench(search, campus, pairs, memory_pairs):
+    latencies = []
+    distances = []
+    for start, goal in pairs:
+        t0 = time.perf_counter()
+        _, distance = search(campus, start, goal)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        distances.append(distance)
+
+    # Separate pass: tracemalloc slows the search down
+    peak = 0
+    for start, goal in memory_pairs:
+        tracemalloc.start()
+        search(campus, start, goal)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "peak_kb": peak / 1024,
+        "distances": distances,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare route search methods on synthetic campuses")
+    parser.add_argument("--sizes", default="2x2,6x4,12x4", help="comma-separated BUILDINGSxFLOORS campuses")
+    parser.add_argument("--corridor-nodes", type=int, default=30)
+    parser.add_argument("--rooms", type=int, default=2, help="rooms per corridor node")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--route-table", action="store_true", help="also build a RouteTable (slow on big maps)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes.split(","):
+        buildings, floors = (int(part) for part in size.lower().split("x"))
+        campus = generate_campus(buildings, floors, args.corridor_nodes, args.rooms, seed=args.seed)
+        nodes = campus.get_all_nodes()
+        rng = random.Random(args.seed)
+        pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(args.queries)]
+        # Peak memory on the longest routes, where path copies hurt most
+        longest = sorted(pairs, key=lambda pair: -dijkstra(campus, *pair)[1])[:5]
+
+        methods = [("legacy", legacy_dijkstra), ("dijkstra", dijkstra), ("astar", astar)]
+        if args.route_table:
+            start = time.perf_counter()
+            table = RouteTable(campus, background=False)
+            print(f"\n🗂️  Route table built in {time.perf_counter() - start:.2f}s "
+                  f"({table.get_stats()['table_bytes'] / 1e6:.1f} MB)")
+            methods.append(("table", lambda graph_map, start, goal: table.route(start, goal)))
+
+        edges = sum(len(neighbors) for neighbors in campus.graph.values())
+        print(f"\n📊 {buildings} buildings x {floors} floors: {len(nodes)} nodes, {edges} edges, "
+              f"{args.queries} queries (heuristic scale {campus.get_heuristic_scale():.2f})")
+        print(f"   {'method':<10} {'p50 ms':>9} {'p95 ms':>9} {'peak KB':>9} {'speedup':>8} {'same length':>12}")
+        baseline = None
+        for name, search in methods:
+            r = bench(search, campus, pairs, longest)
+            baseline = baseline or r
+            same = all(abs(a - b) < 1e-3 for a, b in zip(r["distances"], baseline["distances"]))
+            print(f"   {name:<10} {r['p50_ms']:9.3f} {r['p95_ms']:9.3f} {r['peak_kb']:9.1f} "
+                  f"{baseline['p50_ms'] / max(r['p50_ms'], 1e-9):7.1f}x {'yes' if same else 'NO':>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,517 @@
+"""
+Per-stage latency benchmark for the QA pipeline
+Replays a query corpus (text questions and audio clips) through QAEngine
+and reports p50/p95/p99 latency and throughput for each stage: audio
+decode, STT, embedding, FAISS search, LLM prefill (time to first token),
+LLM decode and TTS, plus end to end.
+
+--backend stub swaps the embedder, LLM, STT and TTS for deterministic
+stand-ins (hashed bag-of-words vectors, canned answers, silence), so the
+replay runs in CI without any model files and takes the same path every
+time. --backend real loads the configured models. Every run writes a JSON
+report; pass --baseline to diff it against a stored one.
+
+Corpus: JSON lines, one {"text": ...} or {"audio": "clip.wav", "text": transcript}
+per line (audio paths relative to the corpus file). Without --corpus a
+built-in corpus is made from the knowledge base plus synthetic clips.
+
+Usage:
+    python bench_qa_pipeline.py [--backend stub|real] [--corpus queries.jsonl] [--repeat 3]
+                                [--out report.json] [--baseline baseline.json] [--fail-on-regression]
+"""
+import io
+import os
+import re
+import sys
+import json
+import time
+import wave
+import zlib
+import hashlib
+import argparse
+import platform
+import tempfile
+import threading
+from collections import Counter
+
+import numpy as np
+
+from config import (
+    EMBED_BACKEND, EMBED_MODEL, FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS, MODEL_PATH,
+    STT_BACKEND, STT_MODEL_PATH, STT_SAMPLE_RATE
+)
+from qa import AnswerPromoter, IndexStore, SpeechToText, decode_audio, embedder_id, setup_logging
+from qa.stt import STT_BACKENDS
+from qa_engine import QAEngine
+
+STAGES = ("decode", "stt", "embed", "search", "llm_prefill", "llm_decode", "tts")
+PERCENTILES = (50, 95, 99)
+
+OFF_KB_QUESTIONS = [
+    "What is the best way to prepare for final exams?",
+    "Can you recommend a good book on machine learning?",
+    "How do I stay focused while studying late at night?",
+    "What should I bring on my first day of university?",
+    "Is it a good idea to take a gap year?",
+    "How can I improve my public speaking?",
+    "What are some tips for writing a research paper?",
+    "How do I manage my time between classes and a part-time job?"
+]
+
+
+class StageTimer:
+    """Thread-safe collection of per-stage durations (the LLM runs on scheduler threads)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.samples = {stage: [] for stage in STAGES}
+            self.items = Counter()
+
+    def record(self, stage, seconds, items=1):
+        with self._lock:
+            self.samples[stage].append(seconds)
+            self.items[stage] += items
+
+    def last(self, stage):
+        with self._lock:
+            return self.samples[stage][-1] if self.samples[stage] else 0.0
+
+    def count(self, stage):
+        with self._lock:
+            return len(self.samples[stage])
+
+
+class Timed:
+    """Proxy that times the named methods of a component, e.g. Timed(embedder, timer, encode="embed")"""
+
+    def __init__(self, target, timer, **stages):
+        self._target = target
+        self._timer = timer
+        self._stages = stages
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        stage = self._stages.get(name)
+        if stage is None:
+            return attr
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                self._timer.record(stage, time.perf_counter() - start)
+        return timed
+
+
+class TimedLlama:
+    """Splits a streamed llama.cpp call into prefill (to the first token) and decode (the rest)"""
+
+    def __init__(self, llm, timer):
+        self._llm = llm
+        self._timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    def __call__(self, prompt, stream=False, **kwargs):
+        start = time.perf_counter()
+        chunks = self._llm(prompt, stream=stream, **kwargs)
+        return self._timed_chunks(chunks, start) if stream else chunks
+
+    def _timed_chunks(self, chunks, start):
+        first = None
+        tokens = 0
+        try:
+            for chunk in chunks:
+                if first is None:
+                    first = time.perf_counter()
+                    self._timer.record("llm_prefill", first - start)
+                tokens += 1
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            if first is not None and tokens > 1:
+                self._timer.record("llm_decode", time.perf_counter() - first, items=tokens - 1)
+
+
+class StubEmbedder:
+    """Hashed bag of words and bigrams: same text, same vector; shared words, nearby vectors"""
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            words = re.findall(r"[a-z0-9']+", text.lower())
+            for feature in words + [" ".join(pair) for pair in zip(words, words[1:])]:
+                h = int.from_bytes(hashlib.md5(feature.encode("utf-8")).digest()[:8], "little")
+                vectors[row, h % self.dim] += 1.0 if (h >> 32) & 1 else -1.0
+            if not words:
+                vectors[row, 0] = 1.0
+        return vectors
+
+
+class StubLlama:
+    """Canned, prompt-dependent answers streamed word by word; supports the prefix-cache calls"""
+
+    def __init__(self):
+        self.tokens = []
+
+    def tokenize(self, text):
+        return [zlib.crc32(word) for word in text.split()]
+
+    def reset(self):
+        self.tokens = []
+
+    def eval(self, tokens):
+        self.tokens.extend(tokens)
+
+    def save_state(self):
+        return list(self.tokens)
+
+    def load_state(self, state):
+        self.tokens = list(state)
+
+    def __call__(self, prompt, max_tokens=128, stream=False, **kwargs):
+        question = prompt.rsplit("Question:", 1)[-1].split("Answer:")[0].strip().rstrip("?")
+        words = (f"You asked about {question}. The campus help desk can give you the details. "
+                 f"It is open on weekdays from nine to five.").split()
+        pieces = [word + " " for word in words[:max_tokens]]
+        finish = "length" if len(words) > max_tokens else "stop"
+        if not stream:
+            return {"choices": [{"text": "".join(pieces), "finish_reason": finish}]}
+        return ({"choices": [{"text": piece, "finish_reason": finish if i == len(pieces) - 1 else None}]}
+                for i, piece in enumerate(pieces))
+
+
+class StubRecognizer:
+    """Returns the transcript registered for a clip's decoded PCM"""
+    name = "stub"
+    transcripts = {}
+
+    def __init__(self, model_path=None, sample_rate=16000):
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def register(cls, audio, text, sample_rate=STT_SAMPLE_RATE):
+        cls.transcripts[hashlib.sha1(decode_audio(audio, sample_rate)).hexdigest()] = text
+
+    def transcribe_pcm(self, pcm):
+        return self.transcripts.get(hashlib.sha1(pcm).hexdigest(), "")
+
+
+class StubTTS:
+    """Silence, 50ms per word"""
+    sample_rate = 22050
+
+    def synthesize(self, text):
+        return bytes(2 * int(self.sample_rate * 0.05) * len(text.split()))
+
+    def status(self):
+        return [{"id": 0, "alive": True, "restarts": 0, "resident_model": True}]
+
+    def close(self):
+        pass
+
+
+STT_BACKENDS[StubRecognizer.name] = StubRecognizer
+
+
+class BenchEngine(QAEngine):
+    """QAEngine with every model call timed, and optionally stubbed"""
+
+    def __init__(self, timer, stub, workdir):
+        super().__init__()
+        self.timer = timer
+        self.stub = stub
+        model_id = embedder_id("stub", "hashed-words") if stub else embedder_id(EMBED_BACKEND, EMBED_MODEL)
+        if stub:
+            self.index_store = IndexStore(
+                os.path.join(workdir, "vector.index"), model_id, FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS
+            )
+        # Replays must take the same path every time, so nothing gets promoted
+        self.promoter = AnswerPromoter(os.path.join(workdir, "learned_answers.json"), model_id, min_count=10 ** 9)
+
+    def _load_embedder(self):
+        if self.stub:
+            self.embedder = StubEmbedder()
+        else:
+            super()._load_embedder()
+        self.embedder = Timed(self.embedder, self.timer, encode="embed")
+
+    def _build_kb_state(self, documents, rebuild=False):
+        kb = super()._build_kb_state(documents, rebuild)
+        kb.index = Timed(kb.index, self.timer, search="search")
+        return kb
+
+    def _create_llm(self):
+        return TimedLlama(StubLlama() if self.stub else super()._create_llm(), self.timer)
+
+    def _start_tts(self):
+        if self.stub:
+            self.tts_pool = StubTTS()
+        else:
+            super()._start_tts()
+        self.tts_pool = Timed(self.tts_pool, self.timer, synthesize="tts")
+
+    def _load_stt(self):
+        self.stt = SpeechToText("stub" if self.stub else STT_BACKEND, STT_MODEL_PATH, STT_SAMPLE_RATE)
+        self.stt.recognizer = Timed(self.stt.recognizer, self.timer, transcribe_pcm="stt")
+
+
+def synthetic_clip(seed, seconds=1.5, rate=44100):
+    """Deterministic stereo 44.1 kHz WAV, so decoding has to downmix and resample"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate)) / rate
+    tone = np.sin(2 * np.pi * (180 + 40 * seed % 200) * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t))
+    samples = (tone * 8000 + rng.normal(0, 300, len(t))).astype(np.int16)
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(samples, 2).tobytes())
+    return buf.getvalue()
+
+
+def builtin_corpus(knowledge_base, n_text=24, n_audio=6):
+    """KB questions (exact and paraphrased), off-KB questions for the LLM and synthetic clips"""
+    questions = [item["question"] for item in knowledge_base]
+    step = max(len(questions) // n_text, 1)
+    picked = questions[::step][:n_text]
+    corpus = []
+    for i, question in enumerate(picked):
+        # Odd entries are reworded so they miss the verbatim match and go through the embedder
+        text = question if i % 2 == 0 else f"{question.rstrip('?')} on campus?"
+        corpus.append({"text": text, "audio": None})
+    corpus += [{"text": question, "audio": None} for question in OFF_KB_QUESTIONS]
+    for i, question in enumerate(picked[:n_audio]):
+        corpus.append({"text": question, "audio": synthetic_clip(i)})
+    return corpus
+
+
+def load_corpus(path):
+    corpus = []
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            audio = None
+            if entry.get("audio"):
+                with open(os.path.join(base, entry["audio"]), "rb") as clip:
+                    audio = clip.read()
+            corpus.append({"text": entry.get("text"), "audio": audio})
+    return corpus
+
+
+def summarize(samples, items=None):
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    total = float(np.sum(samples))
+    summary = {"count": len(samples)}
+    for p in PERCENTILES:
+        summary[f"p{p}_ms"] = round(float(np.percentile(ms, p)), 3)
+    summary["mean_ms"] = round(float(ms.mean()), 3)
+    summary["total_s"] = round(total, 4)
+    summary["per_second"] = round(len(samples) / total, 2) if total else 0.0
+    if items is not None and items != len(samples):
+        summary["items"] = items
+        summary["items_per_second"] = round(items / total, 2) if total else 0.0
+    return summary
+
+
+def replay(engine, corpus, timer, tts=True, keep_cache=False):
+    """Run every corpus entry through STT (for clips), get_answer and TTS"""
+    latencies = []
+    sources = Counter()
+    for item in corpus:
+        if not keep_cache:
+            engine.answer_cache.clear()
+        start = time.perf_counter()
+        query = item["text"]
+        if item["audio"] is not None:
+            recognized = timer.count("stt")
+            query, stt_ms = engine.transcribe_audio(item["audio"])
+            recognizer_s = timer.last("stt") if timer.count("stt") > recognized else 0.0
+            timer.record("decode", max(stt_ms / 1000 - recognizer_s, 0.0))
+            if not query:
+                sources["stt_empty"] += 1
+                latencies.append(time.perf_counter() - start)
+                continue
+        answer, source = engine.get_answer(query)
+        if tts:
+            engine.synthesize_pcm(answer)
+        latencies.append(time.perf_counter() - start)
+        sources[source] += 1
+    return latencies, sources
+
+
+def run_benchmark(backend="stub", corpus=None, repeat=1, warmup=3, tts=True, keep_cache=False, verbose=False):
+    """
+    :param corpus: List of {"text", "audio"} entries; None builds the built-in corpus
+    :return: Report dict
+    """
+    timer = StageTimer()
+    if verbose:
+        setup_logging("DEBUG")
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = BenchEngine(timer, backend == "stub", workdir)
+        try:
+            engine.initialize()
+            if corpus is None:
+                corpus = builtin_corpus(engine.knowledge_base)
+            skip = set() if tts else {"tts"}
+            if not any(item["audio"] is not None for item in corpus):
+                skip.add("stt")
+            failed = {name: stage.get("error") for name, stage in engine.stages.items()
+                      if stage["status"] != "ready" and name not in skip}
+            if failed:
+                raise RuntimeError(f"Stages not ready: {failed}")
+            if backend == "stub":
+                for item in corpus:
+                    if item["audio"] is not None:
+                        StubRecognizer.register(item["audio"], item["text"] or "")
+
+            replay(engine, corpus[:warmup], timer, tts, keep_cache)
+            timer.reset()
+            start = time.perf_counter()
+            latencies, sources = [], Counter()
+            for _ in range(repeat):
+                run_latencies, run_sources = replay(engine, corpus, timer, tts, keep_cache)
+                latencies += run_latencies
+                sources += run_sources
+            wall = time.perf_counter() - start
+        finally:
+            engine.shutdown()
+
+    return {
+        "meta": {
+            "backend": backend,
+            "embed": "stub" if backend == "stub" else embedder_id(EMBED_BACKEND, EMBED_MODEL),
+            "llm": "stub" if backend == "stub" else os.path.basename(MODEL_PATH),
+            "stt": "stub" if backend == "stub" else STT_BACKEND,
+            "faiss_index_type": FAISS_INDEX_TYPE,
+            "tts": tts,
+            "keep_cache": keep_cache,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")
+        },
+        "queries": len(latencies),
+        "wall_seconds": round(wall, 4),
+        "throughput_qps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "sources": dict(sources),
+        "end_to_end": summarize(latencies),
+        "stages": {stage: summarize(timer.samples[stage], timer.items[stage]) for stage in STAGES}
+    }
+
+
+def compare(report, baseline, tolerance=0.2, min_ms=1.0):
+    """
+    Percentile changes per stage against a baseline report
+    A row is a regression when it is both tolerance (relative) and min_ms (absolute) slower
+    :return: List of {"stage", "metric", "baseline", "current", "change", "regression"}
+    """
+    rows = []
+    pairs = [("end_to_end", report.get("end_to_end", {}), baseline.get("end_to_end", {}))]
+    pairs += [(stage, report["stages"].get(stage, {}), baseline.get("stages", {}).get(stage, {})) for stage in STAGES]
+    for stage, current, base in pairs:
+        if not current.get("count") or not base.get("count"):
+            continue
+        for p in PERCENTILES:
+            metric = f"p{p}_ms"
+            old, new = base[metric], current[metric]
+            rows.append({
+                "stage": stage,
+                "metric": metric,
+                "baseline": old,
+                "current": new,
+                "change": round((new - old) / old, 3) if old else 0.0,
+                "regression": new > old * (1 + tolerance) and new - old >= min_ms
+            })
+    return rows
+
+
+def print_report(report):
+    print(f"\n📊 {report['queries']} queries in {report['wall_seconds']:.2f}s "
+          f"({report['throughput_qps']:.1f}/s), backend={report['meta']['backend']}, sources={report['sources']}")
+    print(f"   {'stage':<12} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'per s':>9}")
+    rows = [(stage, report["stages"][stage]) for stage in STAGES] + [("end_to_end", report["end_to_end"])]
+    for stage, s in rows:
+        if not s["count"]:
+            print(f"   {stage:<12} {0:>6}")
+            continue
+        rate = s.get("items_per_second", s["per_second"])
+        print(f"   {stage:<12} {s['count']:>6} {s['p50_ms']:9.2f} {s['p95_ms']:9.2f} {s['p99_ms']:9.2f} {rate:9.1f}")
+    if "items_per_second" in report["stages"]["llm_decode"]:
+        print("   (llm_decode rate is tokens per second)")
+
+
+def print_diff(rows):
+    print(f"\n   {'stage':<12} {'metric':<7} {'baseline':>9} {'current':>9} {'change':>8}")
+    for row in rows:
+        status = "❌" if row["regression"] else "✅"
+        print(f"   {row['stage']:<12} {row['metric']:<7} {row['baseline']:9.2f} {row['current']:9.2f} "
+              f"{row['change'] * 100:+7.1f}% {status}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark for the QA pipeline")
+    parser.add_argument("--backend", choices=("stub", "real"), default="stub")
+    parser.add_argument("--corpus", help="JSON lines of {\"text\"} / {\"audio\", \"text\"} entries")
+    parser.add_argument("--repeat", type=int, default=1, help="passes over the corpus")
+    parser.add_argument("--warmup", type=int, default=3, help="entries replayed before measuring")
+    parser.add_argument("--no-tts", action="store_true", help="skip speech synthesis of answers")
+    parser.add_argument("--keep-cache", action="store_true", help="let repeated questions hit the answer cache")
+    parser.add_argument("--out", help="report path (default qa_bench_<backend>.json)")
+    parser.add_argument("--baseline", help="report to diff against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown counted as a regression")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit 1 when a regression is found")
+    parser.add_argument("--verbose", action="store_true", help="log every request (DEBUG)")
+    args = parser.parse_args()
+
+    report = run_benchmark(
+        args.backend, load_corpus(args.corpus) if args.corpus else None, args.repeat, args.warmup,
+        tts=not args.no_tts, keep_cache=args.keep_cache, verbose=args.verbose
+    )
+    print_report(report)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.tolerance, args.min_ms)
+        print_diff(rows)
+        regressions = [row for row in rows if row["regression"]]
+        report["baseline"] = {"path": args.baseline, "tolerance": args.tolerance, "diff": rows}
+
+    out = args.out or f"qa_bench_{args.backend}.json"
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Report written to {out}")
+
+    if regressions:
+        print(f"⚠️  {len(regressions)} regression(s) over {args.tolerance:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
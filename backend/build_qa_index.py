@@ -1,32 +1,182 @@
 """
 Script to build/rebuild the FAISS index for QA system
 Run this after updating knowledge base files
-"""
-from qa_engine import OfflineQAEngine
 
-print("🔧 Building QA Index...")
-print("=" * 60)
+Ingests knowledge_base.json, knowledge_base/faqs.json and
+knowledge_base/faculty.json into one document store, embeds only what
+changed (in large batches across all cores), updates the runtime index
+and writes a versioned snapshot under INDEX_VERSIONS_DIR
+
+With --prerender-audio, also renders every KB answer that isn't in the
+audio store yet, so the API can serve those answers as ready WAV files
 
-engine = OfflineQAEngine()
-engine.initialize()
+Usage:
+    python build_qa_index.py [--force] [--workers N] [--batch-size N] [--prerender-audio]
+"""
+import os
+import json
+import time
+import argparse
 
-print("\n✅ Index built successfully!")
-print(f"Total documents indexed: {len(engine.documents)}")
-print("\nTesting with sample questions:")
-print("-" * 60)
+from config import (
+    EMBED_MODEL, KB_PATH, FAQ_PATH, FACULTY_PATH, FAISS_PATH,
+    INDEX_VERSIONS_DIR, BUILD_BATCH_SIZE, FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS,
+    EMBED_BACKEND, ONNX_EMBED_DIR, EMBED_THREADS, TTS_MODEL, TTS_POOL_SIZE, TTS_TIMEOUT, TTS_AUDIO_STORE
+)
+from qa import (
+    AudioStore, IndexStore, TTSWorkerPool, create_embedder, embedder_id, load_documents, normalize_vectors,
+    voice_sample_rate, wav_bytes
+)
 
-sample_questions = [
+SAMPLE_QUESTIONS = [
     "Where is the CS Lab?",
     "Who teaches Data Structures?",
     "Where can I pay fees?",
     "What are library hours?"
 ]
 
-for q in sample_questions:
-    result = engine.answer_question(q)
-    print(f"\nQ: {q}")
-    print(f"A: {result['answer']}")
-    print(f"Confidence: {result['confidence']}")
 
-print("\n" + "=" * 60)
-print("Done! The index is ready for use.")
+def make_encoder(model, workers, batch_size, timings):
+    """
+    Encode callable that spreads large jobs over a multi-process pool
+    (SentenceTransformer only; the ONNX backend already uses every core per batch)
+    """
+    def encode(texts):
+        start = time.perf_counter()
+        if workers > 1 and len(texts) > batch_size and hasattr(model, "start_multi_process_pool"):
+            pool = model.start_multi_process_pool(target_devices=["cpu"] * workers)
+            try:
+                vectors = model.encode_multi_process(texts, pool, batch_size=batch_size)
+            finally:
+                model.stop_multi_process_pool(pool)
+        else:
+            vectors = model.encode(texts, batch_size=batch_size)
+        timings["embed"] += time.perf_counter() - start
+        return vectors
+    return encode
+
+
+def next_version(versions_dir):
+    os.makedirs(versions_dir, exist_ok=True)
+    existing = [int(name[1:]) for name in os.listdir(versions_dir) if name.startswith("v") and name[1:].isdigit()]
+    return f"v{max(existing, default=0) + 1:04d}"
+
+
+def build(force=False, workers=None, batch_size=BUILD_BATCH_SIZE, index_type=FAISS_INDEX_TYPE):
+    workers = workers or os.cpu_count() or 1
+    timings = {"load_sources": 0.0, "load_model": 0.0, "embed": 0.0, "index": 0.0, "snapshot": 0.0}
+
+    start = time.perf_counter()
+    documents = load_documents(KB_PATH, FAQ_PATH, FACULTY_PATH)
+    timings["load_sources"] = time.perf_counter() - start
+    print(f"📚 Loaded {len(documents)} documents")
+
+    start = time.perf_counter()
+    model = create_embedder(EMBED_BACKEND, EMBED_MODEL, ONNX_EMBED_DIR, EMBED_THREADS)
+    timings["load_model"] = time.perf_counter() - start
+
+    store = IndexStore(FAISS_PATH, embedder_id(EMBED_BACKEND, EMBED_MODEL), index_type, FAISS_INDEX_PARAMS)
+    start = time.perf_counter()
+    index, id_to_pos, stats = store.sync(
+        [doc["question"] for doc in documents],
+        make_encoder(model, workers, batch_size, timings),
+        force=force
+    )
+    timings["index"] = time.perf_counter() - start - timings["embed"]
+
+    start = time.perf_counter()
+    version = next_version(INDEX_VERSIONS_DIR)
+    version_dir = os.path.join(INDEX_VERSIONS_DIR, version)
+    store.snapshot(version_dir)
+    with open(os.path.join(version_dir, "documents.json"), "w", encoding="utf-8") as f:
+        json.dump(documents, f, indent=2)
+    with open(os.path.join(version_dir, "build.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "embed_model": embedder_id(EMBED_BACKEND, EMBED_MODEL),
+            "index_type": stats["index_type"],
+            "documents": len(documents),
+            "workers": workers,
+            "batch_size": batch_size,
+            "stats": stats,
+            "timings": timings
+        }, f, indent=2)
+    with open(os.path.join(INDEX_VERSIONS_DIR, "LATEST"), "w") as f:
+        f.write(version)
+    timings["snapshot"] = time.perf_counter() - start
+
+    print(f"\n✅ Index {version} [{stats['index_type']}] built "
+          f"({stats['reused']} reused, {stats['embedded']} embedded, {stats['removed']} removed)")
+    print("\n⏱️  Stage timings:")
+    for stage, seconds in timings.items():
+        print(f"   {stage:<13} {seconds:8.3f}s")
+    if stats["embedded"]:
+        print(f"\n🚀 Throughput: {stats['embedded'] / max(timings['embed'], 1e-9):.1f} docs/sec "
+              f"({workers} workers, batch {batch_size})")
+
+    return model, index, id_to_pos, documents
+
+
+def prerender_audio(documents, store=None, synthesize=None):
+    """
+    Render audio for every answer that isn't in the audio store yet
+    :param store: AudioStore (default: TTS_AUDIO_STORE for TTS_MODEL)
+    :param synthesize: Callable text -> raw PCM (default: a piper worker pool)
+    :return: Dict with rendered / skipped / failed counts
+    """
+    store = store or AudioStore(TTS_AUDIO_STORE, TTS_MODEL)
+    pool = None
+    if synthesize is None:
+        pool = TTSWorkerPool(TTS_MODEL, size=TTS_POOL_SIZE, timeout=TTS_TIMEOUT).start()
+        synthesize = pool.synthesize
+    sample_rate = voice_sample_rate(TTS_MODEL)
+
+    def render(text):
+        pcm = synthesize(text)
+        return wav_bytes(pcm, sample_rate) if pcm else None
+
+    start = time.perf_counter()
+    try:
+        stats = store.prerender([doc["answer"] for doc in documents], render)
+    finally:
+        if pool is not None:
+            pool.close()
+    print(f"\n🔊 Audio store: {stats['rendered']} rendered, {stats['skipped']} already there, "
+          f"{stats['failed']} failed ({time.perf_counter() - start:.1f}s)")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the QA FAISS index from all knowledge_base sources")
+    parser.add_argument("--force", action="store_true", help="re-embed every document")
+    parser.add_argument("--workers", type=int, default=None, help="encoding processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=BUILD_BATCH_SIZE, help="encode batch size")
+    parser.add_argument("--index-type", default=FAISS_INDEX_TYPE, help="auto, flat, hnsw, hnsw_sq8, ivf_sq8, ivf_pq")
+    parser.add_argument("--prerender-audio", action="store_true", help="render audio for new KB answers")
+    args = parser.parse_args()
+
+    print("🔧 Building QA Index...")
+    print("=" * 60)
+
+    model, index, id_to_pos, documents = build(args.force, args.workers, args.batch_size, args.index_type)
+
+    print("\nTesting with sample questions:")
+    print("-" * 60)
+    vectors = normalize_vectors(model.encode(SAMPLE_QUESTIONS))
+    distances, ids = index.search(vectors, 1)
+    for question, dist, vec_id in zip(SAMPLE_QUESTIONS, distances[:, 0], ids[:, 0]):
+        doc = documents[id_to_pos[vec_id]]
+        print(f"\nQ: {question}")
+        print(f"A: {doc['answer']}")
+        print(f"Match: {doc['id']} ({doc['category']}) distance={dist:.3f}")
+
+    if args.prerender_audio:
+        prerender_audio(documents)
+
+    print("\n" + "=" * 60)
+    print("Done! The index is ready for use.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Offline calibration of the KB distance threshold
+Replays a labelled set of paraphrased questions through the same retrieval
+the server uses (verbatim match, FAISS candidates fused with BM25), sweeps
+the threshold and reports for every value:
+- KB hit rate: share of questions answered from the KB
+- precision: share of those KB answers that are the labelled entry
+- recall: share of answerable questions answered correctly from the KB
+- projected average latency: KB answers cost --kb-ms, misses --llm-ms
+
+The sweep can also cover other index types and lexical weights. The best
+threshold for the served setup (FAISS_INDEX_TYPE, HYBRID_LEXICAL_WEIGHT and
+BM25_SATURATION) is written into the index manifest, so it is loaded together
+with the index (FAISS_USE_CALIBRATION); other setups are only reported.
+
+Labels: JSON lines, one {"query": ..., "expected": <KB doc id or question>}
+per line. "expected" may be a list when several entries are correct, and
+null marks a question the KB can't answer (it should go to the LLM).
+
+Usage:
+    python calibrate_threshold.py --labels labels.jsonl [--min-precision 0.95]
+                                  [--index-types flat,hnsw_sq8] [--weights 0,0.3]
+                                  [--bench qa_bench_real.json] [--dry-run]
+"""
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+from config import (
+    EMBED_MODEL, KB_PATH, FAQ_PATH, FACULTY_PATH, FAISS_PATH, FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS,
+    FAISS_L2_THRESHOLD, EMBED_BACKEND, ONNX_EMBED_DIR, EMBED_THREADS,
+    HYBRID_CANDIDATES, HYBRID_LEXICAL_WEIGHT, BM25_K1, BM25_B, BM25_SATURATION
+)
+from qa import IndexStore, LexicalIndex, create_embedder, embedder_id, load_documents, normalize_vectors
+from qa.index_factory import build_index
+
+KB_MS = 60.0
+LLM_MS = 4000.0
+
+
+def load_labels(path, documents):
+    """
+    :return: (queries, expected) where expected[i] is the set of correct KB
+             positions for queries[i], empty when the KB can't answer it
+    :raises ValueError: for a malformed line or an unknown KB entry
+    """
+    positions = {}
+    for pos, doc in enumerate(documents):
+        positions.setdefault(doc["id"], set()).add(pos)
+        positions.setdefault(doc["question"], set()).add(pos)
+
+    queries, expected = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if not isinstance(item.get("query"), str) or not item["query"].strip():
+                raise ValueError(f"{path}:{number}: missing \"query\"")
+            targets = item.get("expected")
+            targets = [] if targets is None else targets if isinstance(targets, list) else [targets]
+            correct = set()
+            for target in targets:
+                if target not in positions:
+                    raise ValueError(f"{path}:{number}: {target!r} is not a KB id or question")
+                correct |= positions[target]
+            queries.append(item["query"])
+            expected.append(correct)
+    if not queries:
+        raise ValueError(f"{path}: no labelled questions")
+    return queries, expected
+
+
+def top_matches(queries, vectors, index, id_to_pos, lexical, weight):
+    """
+    Best KB candidate per query, scored like QAEngine: a verbatim match always
+    hits (-inf), otherwise the fused distance of the top FAISS/BM25 candidate
+    :return: (positions, distances) arrays; position -1 when nothing was found
+    """
+    distances, ids = index.search(vectors, HYBRID_CANDIDATES)
+    indexes = np.where(ids >= 0, id_to_pos[np.maximum(ids, 0)], -1)
+    positions = np.full(len(queries), -1, dtype="int64")
+    best = np.full(len(queries), np.inf)
+    for i, query in enumerate(queries):
+        exact = lexical.exact_match(query)
+        if exact is not None:
+            positions[i], best[i] = exact, -np.inf
+            continue
+        ranked = lexical.fuse(query, distances[i], indexes[i], weight)
+        if ranked:
+            positions[i], best[i] = ranked[0][0], ranked[0][1]
+    return positions, best
+
+
+def sweep(positions, distances, expected, thresholds, kb_ms=KB_MS, llm_ms=LLM_MS):
+    """One row of hit rate, precision, recall and projected latency per threshold"""
+    correct = np.array([pos in targets for pos, targets in zip(positions, expected)])
+    answerable = sum(1 for targets in expected if targets)
+    rows = []
+    for threshold in thresholds:
+        hit = distances <= threshold
+        hits = int(hit.sum())
+        correct_hits = int((hit & correct).sum())
+        hit_rate = hits / len(positions)
+        rows.append({
+            "threshold": round(float(threshold), 4),
+            "hit_rate": round(hit_rate, 4),
+            "precision": round(correct_hits / hits, 4) if hits else 1.0,
+            "recall": round(correct_hits / answerable, 4) if answerable else 0.0,
+            "false_hits": hits - correct_hits,
+            "false_misses": int((~hit & correct).sum()),
+            "avg_ms": round(hit_rate * kb_ms + (1 - hit_rate) * llm_ms, 1)
+        })
+    return rows
+
+
+def choose(rows, min_precision):
+    """
+    Highest KB hit rate with precision >= min_precision; among thresholds that
+    give the same result, the middle one, to leave margin on both sides
+    :return: The chosen row, or None when no threshold is precise enough
+    """
+    eligible = [row for row in rows if row["precision"] >= min_precision]
+    if not eligible:
+        return None
+    best = max((row["hit_rate"], row["precision"]) for row in eligible)
+    tied = [row for row in eligible if (row["hit_rate"], row["precision"]) == best]
+    return tied[len(tied) // 2]
+
+
+def parse_range(text):
+    start, stop, step = (float(part) for part in text.split(":"))
+    return np.round(np.arange(start, stop + step / 2, step), 4)
+
+
+def bench_latencies(path):
+    """KB and LLM path latency (mean ms) from a bench_qa_pipeline.py report"""
+    with open(path, "r", encoding="utf-8") as f:
+        stages = json.load(f)["stages"]
+    mean = lambda stage: stages.get(stage, {}).get("mean_ms", 0.0)
+    kb_ms = mean("kb_search")
+    return kb_ms, kb_ms + mean("llm_queue") + mean("llm_prefill") + mean("llm_decode")
+
+
+def print_rows(rows, chosen):
+    print(f"   {'threshold':>9} {'KB hit':>7} {'prec':>6} {'recall':>7} {'false+':>7} {'false-':>7} {'avg ms':>8}")
+    for row in rows:
+        mark = " ◀ chosen" if row is chosen else " (config)" if row["threshold"] == FAISS_L2_THRESHOLD else ""
+        print(f"   {row['threshold']:9.3f} {row['hit_rate']:7.1%} {row['precision']:6.1%} {row['recall']:7.1%} "
+              f"{row['false_hits']:7d} {row['false_misses']:7d} {row['avg_ms']:8.1f}{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the KB distance threshold on labelled questions")
+    parser.add_argument("--labels", required=True, help="JSON lines of {\"query\", \"expected\"}")
+    parser.add_argument("--range", default="0.1:1.6:0.05", help="thresholds to sweep as start:stop:step")
+    parser.add_argument("--min-precision", type=float, default=0.95, help="lowest acceptable KB precision")
+    parser.add_argument("--index-types", default="", help="also sweep these index types (comma-separated)")
+    parser.add_argument("--weights", default="", help="also sweep these BM25 fusion weights (comma-separated)")
+    parser.add_argument("--kb-ms", type=float, default=KB_MS, help="latency of a KB answer")
+    parser.add_argument("--llm-ms", type=float, default=LLM_MS, help="latency of an LLM answer")
+    parser.add_argument("--bench", help="take --kb-ms/--llm-ms from a bench_qa_pipeline.py report")
+    parser.add_argument("--out", help="write every sweep row to this JSON file")
+    parser.add_argument("--dry-run", action="store_true", help="report only, leave the manifest unchanged")
+    args = parser.parse_args()
+
+    kb_ms, llm_ms = bench_latencies(args.bench) if args.bench else (args.kb_ms, args.llm_ms)
+    thresholds = parse_range(args.range)
+
+    documents = load_documents(KB_PATH, FAQ_PATH, FACULTY_PATH)
+    queries, expected = load_labels(args.labels, documents)
+    print(f"🎯 Calibrating on {len(queries)} questions ({sum(1 for e in expected if e)} answerable by the KB), "
+          f"KB {kb_ms:.0f}ms vs LLM {llm_ms:.0f}ms")
+
+    embedder = create_embedder(EMBED_BACKEND, EMBED_MODEL, ONNX_EMBED_DIR, EMBED_THREADS)
+    store = IndexStore(FAISS_PATH, embedder_id(EMBED_BACKEND, EMBED_MODEL), FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS)
+    index, id_to_pos, stats = store.sync([doc["question"] for doc in documents], embedder.encode)
+    served = (stats["index_type"], HYBRID_LEXICAL_WEIGHT)
+    vectors = normalize_vectors(embedder.encode(queries, batch_size=64))
+    lexical = LexicalIndex(documents, k1=BM25_K1, b=BM25_B, saturation=BM25_SATURATION)
+
+    index_types = [served[0]] + [t for t in args.index_types.split(",") if t and t != served[0]]
+    weights = [served[1]] + [float(w) for w in args.weights.split(",") if w and float(w) != served[1]]
+    manifest, _, embeddings = store.load()
+    ids = np.array([entry["id"] for entry in manifest["entries"]], dtype="int64")
+
+    results = []
+    for index_type in index_types:
+        if index_type != served[0]:
+            index = build_index(index_type, np.asarray(embeddings, dtype="float32"), ids, FAISS_INDEX_PARAMS)
+        for weight in weights:
+            positions, distances = top_matches(queries, vectors, index, id_to_pos, lexical, weight)
+            rows = sweep(positions, distances, expected, thresholds, kb_ms, llm_ms)
+            results.append({"index_type": index_type, "lexical_weight": weight, "rows": rows,
+                            "chosen": choose(rows, args.min_precision)})
+
+    current = results[0]
+    print(f"\n📊 Served setup: index {served[0]}, lexical weight {served[1]}")
+    print_rows(current["rows"], current["chosen"])
+
+    if len(results) > 1:
+        print(f"\n🔀 Best threshold per setup (precision >= {args.min_precision:.0%}):")
+        for result in results:
+            chosen = result["chosen"]
+            summary = (f"threshold {chosen['threshold']:.3f}  KB hit {chosen['hit_rate']:.1%}  "
+                       f"precision {chosen['precision']:.1%}  avg {chosen['avg_ms']:.0f}ms") if chosen else "none"
+            print(f"   {result['index_type']:<10} weight {result['lexical_weight']:<5} {summary}")
+        better = max((r for r in results if r["chosen"]), key=lambda r: r["chosen"]["hit_rate"], default=None)
+        if better and current["chosen"] and better["chosen"]["hit_rate"] > current["chosen"]["hit_rate"]:
+            print(f"\n💡 FAISS_INDEX_TYPE = \"{better['index_type']}\" and HYBRID_LEXICAL_WEIGHT = "
+                  f"{better['lexical_weight']} answer more from the KB; set them and rerun to calibrate that setup")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"labels": args.labels, "kb_ms": kb_ms, "llm_ms": llm_ms, "results": results}, f, indent=2)
+
+    chosen = current["chosen"]
+    if chosen is None:
+        print(f"\n❌ No threshold reaches {args.min_precision:.0%} precision; manifest left unchanged")
+        return 1
+    if args.dry_run:
+        print(f"\n✅ Best threshold {chosen['threshold']:.3f} (dry run, manifest left unchanged)")
+        return 0
+    store.save_calibration({
+        "threshold": chosen["threshold"],
+        "index_type": served[0],
+        "lexical_weight": served[1],
+        "bm25_saturation": BM25_SATURATION,
+        "hit_rate": chosen["hit_rate"],
+        "precision": chosen["precision"],
+        "recall": chosen["recall"],
+        "min_precision": args.min_precision,
+        "labels": len(queries),
+        "calibrated_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    })
+    print(f"\n✅ Threshold {chosen['threshold']:.3f} written to {store.manifest_path} "
+          f"(KB hit {chosen['hit_rate']:.1%}, precision {chosen['precision']:.1%}); restart the server to use it")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
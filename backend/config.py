@@ -7,12 +7,128 @@ MODEL_PATH = os.path.expanduser("~/.llama_models/tinyllama-1.1b-chat-v0.3.Q4_K_M
 LLM_CTX = 2048
 LLM_MAX_TOKENS = 1000
 LLM_TEMPERATURE = 0.1
-FAISS_L2_THRESHOLD = 0.8
+LLM_USE_MMAP = True  # GGUF weights are mapped from disk and shared by every process through the page cache
+# Evaluate the fixed system prompt once and restore its KV state per request
+LLM_PREFIX_CACHE = True
+# Inference scheduler: each worker loads its own model copy
+LLM_WORKERS = 1
+LLM_QUEUE_MAX = 8            # waiting jobs before /ask answers 503
+LLM_JOB_DEADLINE = 60        # seconds from submit; dropped or cut short after this
+LLM_SHORT_QUERY_WORDS = 12   # queries up to this many words jump ahead of longer ones
+# Generation budget per question type (see qa/generation.py); LLM_MAX_TOKENS stays the hard cap
+LLM_BUDGETS = {
+    "greeting": {"max_tokens": 48, "max_sentences": 1},
+    "factual": {"max_tokens": 96, "max_sentences": 2},
+    "explanation": {"max_tokens": 220, "max_sentences": 4},
+    "general": {"max_tokens": 128, "max_sentences": 3},
+}
+LLM_GEN_DEADLINE = 20        # wall-clock seconds of generation per answer
+FAISS_L2_THRESHOLD = 0.8  # squared L2 between normalized vectors (= 2 - 2 * cosine)
+# Use the threshold calibrate_threshold.py wrote into the index manifest instead
+# (only while the index type, HYBRID_LEXICAL_WEIGHT and BM25_SATURATION match the calibrated ones)
+FAISS_USE_CALIBRATION = True
 
 EMBED_MODEL = "all-MiniLM-L6-v2"
+EMBED_BACKEND = "torch"  # "torch" (SentenceTransformer) or "onnx" (int8 ONNX Runtime, see export_onnx_embedder.py)
+ONNX_EMBED_DIR = os.path.expanduser("~/.onnx_models/all-MiniLM-L6-v2-int8")
+EMBED_THREADS = 0  # ONNX Runtime intra-op threads, 0 = all cores
 KB_PATH = "knowledge_base.json"
+FAQ_PATH = "knowledge_base/faqs.json"
+FACULTY_PATH = "knowledge_base/faculty.json"
 FAISS_PATH = "vector.index"
 TTS_MODEL = os.path.expanduser("~/tts_models/en_US-libritts-high.onnx")
 
 UPLOAD_FOLDER = "/tmp/robot_uploads"
 ALLOWED_AUDIO_EXTENSIONS = {'mp3', 'wav', 'ogg', 'webm', 'm4a', 'flac'}
+MAX_UPLOAD_BYTES = 16 * 1024 * 1024
+
+# Answer cache (exact LRU + semantic tier)
+CACHE_MAX_SIZE = 256
+CACHE_TTL_SECONDS = 3600
+CACHE_SEMANTIC_SIZE = 256
+CACHE_SEMANTIC_DISTANCE = 0.15
+
+# Sentence-pipelined TTS
+TTS_PIPELINE_MAX_PENDING = 8
+
+# Persistent piper worker pool
+TTS_POOL_SIZE = 2
+TTS_TIMEOUT = 30
+TTS_HEALTH_INTERVAL = 30
+
+# Pre-rendered KB answer audio (content-addressed)
+TTS_AUDIO_STORE = "tts_audio"
+
+# Speech recognition: "vosk" / "whisper_cpp" (offline) or "google" (online)
+STT_BACKEND = "vosk"
+STT_MODEL_PATH = os.path.expanduser("~/stt_models/vosk-model-small-en-us-0.15")
+STT_SAMPLE_RATE = 16000
+
+# Micro-batching of query embedding + FAISS search
+SEARCH_BATCH_MAX = 16
+SEARCH_BATCH_WAIT_MS = 5
+# POST /ask/batch: questions per request, and LLM jobs a batch keeps queued at once
+BATCH_MAX_QUESTIONS = 64
+BATCH_LLM_CONCURRENCY = 2
+
+# Offline index builder (build_qa_index.py)
+INDEX_VERSIONS_DIR = "index_versions"
+BUILD_BATCH_SIZE = 256
+
+# Hybrid retrieval: FAISS candidates re-ranked with BM25 over questions + keywords
+HYBRID_CANDIDATES = 10
+HYBRID_LEXICAL_WEIGHT = 0.3
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_SATURATION = 3.0  # BM25 score that earns half of HYBRID_LEXICAL_WEIGHT
+
+# FAISS index type: "auto" picks flat / hnsw_sq8 / ivf_pq by corpus size,
+# or force one of "flat", "hnsw", "hnsw_sq8", "ivf_sq8", "ivf_pq"
+FAISS_INDEX_TYPE = "auto"
+FAISS_MMAP = True  # read the index with faiss IO_FLAG_MMAP where the index type supports it
+FAISS_INDEX_PARAMS = {
+    "hnsw_min": 10000,
+    "ivf_min": 200000,
+    "hnsw_m": 32,
+    "ef_search": 64,
+    "nprobe": 16,
+    "pq_m": 48,
+}
+
+# Learned answers: LLM fallbacks asked PROMOTION_MIN_COUNT times are promoted
+# into a secondary index searched after the KB
+PROMOTION_PATH = "learned_answers.json"
+PROMOTION_MIN_COUNT = 5
+PROMOTION_DISTANCE = 0.2   # squared L2 between normalized query vectors
+PROMOTION_REVIEW = False   # True: wait for approval via /kb/review instead of promoting
+PROMOTION_SAVE_INTERVAL = 30.0          # seconds between store writes (promotions are written at once)
+PROMOTION_PENDING_TTL = 7 * 24 * 3600   # drop pending clusters not asked again for this long
+PROMOTION_MAX_PENDING = 5000            # least asked pending clusters beyond this are dropped
+
+# ASGI serving mode (asgi_app.py): thread pools for blocking model calls
+ASGI_HOST = "0.0.0.0"
+ASGI_PORT = 5000
+ASGI_MODEL_THREADS = 16     # retrieval and LLM waits (generation itself is capped by LLM_WORKERS)
+ASGI_STT_THREADS = 2
+ASGI_TTS_THREADS = 4
+ASGI_SHUTDOWN_TIMEOUT = 30  # seconds to finish in-flight requests and drain the LLM queue
+
+# Multi-process serving (gunicorn.conf.py): KB, embedder and index are loaded
+# once in the master and shared copy-on-write by the forked workers
+QA_WORKERS = 2
+
+# Admin routes (/kb/reload, /kb/review): with a token, clients send
+# "Authorization: Bearer <token>"; without one, only local requests are allowed
+ADMIN_TOKEN = os.environ.get("QA_ADMIN_TOKEN")
+
+# Logging: per-request detail (search candidates, STT text) is logged at DEBUG
+LOG_LEVEL = os.environ.get("QA_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("QA_LOG_FORMAT", "text")  # "text" or "json" (one object per line)
+# Directory where gunicorn workers share their metrics, so /metrics reports all
+# of them (gunicorn.conf.py sets it; unset: per-process metrics)
+METRICS_MULTIPROC_DIR = os.environ.get("QA_METRICS_DIR")
+METRICS_SYNC_INTERVAL = 1.0  # seconds between writes of a worker's samples
+
+# GET /metrics histogram buckets (latencies use qa.metrics.LATENCY_BUCKETS)
+DISTANCE_BUCKETS = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.2, 1.5, 2.0)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 4, 6, 8, 12, 16, 24, 32, 48, 64)
@@ -0,0 +1,72 @@
+"""
+Export all-MiniLM-L6-v2 to ONNX and quantize it to int8
+Writes model.onnx, model_quantized.onnx and tokenizer.json to ONNX_EMBED_DIR,
+then checks the quantized vectors against the PyTorch SentenceTransformer
+
+Usage:
+    python export_onnx_embedder.py [--out DIR]
+Then set EMBED_BACKEND = "onnx" in config.py (the index re-embeds on next start)
+"""
+import os
+import argparse
+
+import numpy as np
+
+from config import EMBED_MODEL, ONNX_EMBED_DIR, KB_PATH, FAQ_PATH, FACULTY_PATH
+from qa import OnnxEmbedder, load_documents
+
+
+def export(out_dir):
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    
+    os.makedirs(out_dir, exist_ok=True)
+    hub_name = f"sentence-transformers/{EMBED_MODEL}"
+    tokenizer = AutoTokenizer.from_pretrained(hub_name)
+    model = AutoModel.from_pretrained(hub_name).eval()
+    tokenizer.save_pretrained(out_dir)
+    
+    dummy = tokenizer(["Where is the library?"], return_tensors="pt")
+    inputs = ("input_ids", "attention_mask", "token_type_ids")
+    model_path = os.path.join(out_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(dummy[name] for name in inputs), model_path,
+            input_names=list(inputs), output_names=["last_hidden_state"],
+            dynamic_axes={name: {0: "batch", 1: "sequence"} for name in inputs + ("last_hidden_state",)},
+            opset_version=14
+        )
+    print(f"✅ Exported {model_path}")
+    
+    quantized_path = os.path.join(out_dir, "model_quantized.onnx")
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized {quantized_path} "
+          f"({os.path.getsize(model_path) / 1e6:.1f}MB -> {os.path.getsize(quantized_path) / 1e6:.1f}MB)")
+
+
+def check(out_dir):
+    """Cosine similarity between PyTorch and int8 ONNX vectors on the KB questions"""
+    from sentence_transformers import SentenceTransformer
+    
+    questions = [doc["question"] for doc in load_documents(KB_PATH, FAQ_PATH, FACULTY_PATH)]
+    reference = SentenceTransformer(EMBED_MODEL).encode(questions, normalize_embeddings=True)
+    quantized = OnnxEmbedder(out_dir).encode(questions)
+    cosine = (reference * quantized).sum(axis=1)
+    print(f"📐 PyTorch vs ONNX int8 cosine over {len(questions)} questions: "
+          f"mean {cosine.mean():.4f}, min {cosine.min():.4f}")
+    
+    ref_top = np.argmax(reference @ reference.T - 2 * np.eye(len(questions)), axis=1)
+    onnx_top = np.argmax(quantized @ quantized.T - 2 * np.eye(len(questions)), axis=1)
+    print(f"🔁 Nearest-neighbour agreement: {np.mean(ref_top == onnx_top):.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export and int8-quantize the embedding model for ONNX Runtime")
+    parser.add_argument("--out", default=ONNX_EMBED_DIR)
+    parser.add_argument("--skip-check", action="store_true")
+    args = parser.parse_args()
+    
+    export(args.out)
+    if not args.skip_check:
+        check(args.out)
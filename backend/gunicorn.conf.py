@@ -0,0 +1,39 @@
+"""
+gunicorn config for multi-process serving of asgi_app
+
+The master preloads the KB, embedder and FAISS index once and forks
+QA_WORKERS uvicorn workers that share those pages copy-on-write. Each
+worker loads its own LLM context on startup (asgi_app lifespan); the GGUF
+weights are memory-mapped, so all workers share one copy in the page cache.
+Workers write their metrics to QA_METRICS_DIR (a temp directory unless set),
+so GET /metrics on any worker reports the totals of all of them.
+
+Run:
+    gunicorn -c gunicorn.conf.py asgi_app:app
+"""
+import os
+import tempfile
+
+# Before config is imported, here and in the preloaded app
+os.environ.setdefault("QA_METRICS_DIR", os.path.join(tempfile.gettempdir(), "qa-metrics"))
+
+from config import ASGI_HOST, ASGI_PORT, ASGI_SHUTDOWN_TIMEOUT, QA_WORKERS, METRICS_MULTIPROC_DIR
+from qa.metrics import clear_multiproc_dir, mark_process_dead
+
+bind = f"{ASGI_HOST}:{ASGI_PORT}"
+workers = QA_WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = ASGI_SHUTDOWN_TIMEOUT
+# Model loading happens after fork, in the background; don't let the arbiter kill slow starters
+timeout = 120
+
+
+def on_starting(server):
+    clear_multiproc_dir(METRICS_MULTIPROC_DIR)
+    from qa_engine import qa_engine
+    qa_engine.preload()
+
+
+def child_exit(server, worker):
+    mark_process_dead(METRICS_MULTIPROC_DIR, worker.pid)
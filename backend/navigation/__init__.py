@@ -1,6 +1,15 @@
 """Navigation package"""
 from .campus_map import CampusMap
-from .pathfinding import dijkstra, get_navigation_instructions
-from .navigator import Navigator
+from .pathfinding import astar, dijkstra, get_navigation_instructions
+from .route_table import RouteTable
 
-__all__ = ['CampusMap', 'dijkstra', 'get_navigation_instructions', 'Navigator']
+__all__ = ['CampusMap', 'astar', 'dijkstra', 'get_navigation_instructions', 'RouteTable', 'Navigator']
+
+
+def __getattr__(name):
+    # The navigator pulls in the motor and sensor drivers (and their GPIO
+    # config), so maps and routing load without the robot hardware
+    if name == "Navigator":
+        from .navigator import Navigator
+        return Navigator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
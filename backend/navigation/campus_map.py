@@ -3,10 +3,22 @@ Topological Map for University A Block
 Graph structure where:
 - Nodes = Physical locations (rooms, corridors, landmarks)
 - Edges = Navigation actions (forward, turn)
+
+Edit the map through add_edge / remove_edge / remove_node / block_edge so
+listeners (e.g. the route table) are told about the change
 """
+import math
+import threading
+
 
 class CampusMap:
-    def __init__(self):
+    def __init__(self, graph=None, coordinates=None, aliases=None):
+        """
+        :param graph: {node: {neighbor: edge}} of another campus (e.g. a generated one)
+                      instead of the built-in A Block map
+        :param coordinates: {node: (x, y, floor)} for that graph
+        :param aliases: {user name: node} for that graph
+        """
         # Define the graph structure
         # Format: {node: {neighbor: {"distance": meters, "action": "forward/turn_left/turn_right", "angle": degrees}}}
         self.graph = {
@@ -81,10 +93,152 @@ class CampusMap:
             "c2.5": "C2_5_Classroom",
             "c2.5 classroom": "C2_5_Classroom"
         }
+        
+        # Plan position of each node: (x, y, floor), meters from the entrance.
+        # Used for the A* heuristic; nodes on different floors may share x, y
+        self.coordinates = {
+            "Entrance": (0.0, 0.0, 0),
+            "Corridor_Main": (0.0, 5.0, 0),
+            "Stairs": (0.0, 8.0, 0),
+            "Faculty_Offices": (-4.0, 5.0, 0),
+            "Director_Office": (-10.0, 5.0, 0),
+            "Accounts_Office": (4.0, 5.0, 0),
+            "Exam_Branch": (9.0, 5.0, 0),
+            "Library_Entrance": (2.0, 8.0, 0),
+            "Digital_Library": (10.0, 8.0, 0),
+            "Floor_1_Corridor": (0.0, 8.0, 1),
+            "CS_Lab": (-10.0, 8.0, 1),
+            "D4": (7.0, 8.0, 1),
+            "C2_5_Classroom": (12.0, 8.0, 1)
+        }
+        
+        if graph is not None:
+            self.graph = graph
+            self.coordinates = coordinates or {}
+            self.aliases = aliases or {}
+        
+        self.blocked = set()  # (from, to) edges that can't be used right now
+        self.version = 0      # bumped on every edit
+        self._listeners = []
+        self._lock = threading.RLock()
+        self._heuristic_scale = None  # (version, scale)
+    
+    def add_listener(self, callback):
+        """Call callback() after every edit of the map"""
+        self._listeners.append(callback)
+    
+    def _changed(self):
+        self.version += 1
+    
+    def _notify(self):
+        for callback in list(self._listeners):
+            callback()
+    
+    def add_edge(self, from_node, to_node, distance, action="forward", angle=0):
+        """Add or replace a one-way edge, creating either node if needed"""
+        with self._lock:
+            self.graph.setdefault(from_node, {})[to_node] = {"distance": distance, "action": action, "angle": angle}
+            self.graph.setdefault(to_node, {})
+            self._changed()
+        self._notify()
+    
+    def remove_edge(self, from_node, to_node):
+        """:return: False if there was no such edge"""
+        with self._lock:
+            if to_node not in self.graph.get(from_node, {}):
+                return False
+            del self.graph[from_node][to_node]
+            self.blocked.discard((from_node, to_node))
+            self._changed()
+        self._notify()
+        return True
+    
+    def remove_node(self, node):
+        """Remove a node with all edges into and out of it"""
+        with self._lock:
+            if node not in self.graph:
+                return False
+            del self.graph[node]
+            for neighbors in self.graph.values():
+                neighbors.pop(node, None)
+            self.blocked = {edge for edge in self.blocked if node not in edge}
+            self._changed()
+        self._notify()
+        return True
+    
+    def block_edge(self, from_node, to_node, blocked=True, both_ways=True):
+        """
+        Mark an edge unusable (e.g. a closed corridor) or usable again
+        :param both_ways: Also (un)block the edge in the opposite direction
+        :return: False if there is no such edge
+        """
+        edges = [(from_node, to_node)] + ([(to_node, from_node)] if both_ways else [])
+        with self._lock:
+            edges = [(a, b) for a, b in edges if b in self.graph.get(a, {})]
+            if not edges:
+                return False
+            if blocked:
+                self.blocked.update(edges)
+            else:
+                self.blocked.difference_update(edges)
+            self._changed()
+        self._notify()
+        return True
+    
+    def unblock_edge(self, from_node, to_node, both_ways=True):
+        return self.block_edge(from_node, to_node, blocked=False, both_ways=both_ways)
+    
+    def set_coordinates(self, node, x, y, floor=0):
+        """Place a node on the plan (routes don't change, so listeners aren't called)"""
+        with self._lock:
+            self.coordinates[node] = (x, y, floor)
+            self._heuristic_scale = None
+    
+    def get_heuristic_scale(self):
+        """
+        Factor for the straight-line A* heuristic: the largest s <= 1 with
+        s * straight-line distance <= edge distance on every edge, so A* still
+        finds the shortest route even where a hand-entered distance is shorter
+        than the plan. 0 (plain Dijkstra) when a node has no coordinates
+        """
+        with self._lock:
+            if self._heuristic_scale is not None and self._heuristic_scale[0] == self.version:
+                return self._heuristic_scale[1]
+            scale = 1.0
+            for node, neighbors in self.graph.items():
+                for neighbor, edge in neighbors.items():
+                    if node not in self.coordinates or neighbor not in self.coordinates:
+                        scale = 0.0
+                        break
+                    (x1, y1), (x2, y2) = self.coordinates[node][:2], self.coordinates[neighbor][:2]
+                    straight = math.hypot(x2 - x1, y2 - y1)
+                    if straight > 0:
+                        scale = min(scale, edge["distance"] / straight)
+                if not scale:
+                    break
+            self._heuristic_scale = (self.version, scale)
+            return scale
+    
+    def snapshot(self):
+        """
+        Consistent copy of the usable graph
+        :return: (version, nodes, {node: [(neighbor, distance)]}) without blocked edges
+        """
+        with self._lock:
+            nodes = list(self.graph.keys())
+            adjacency = {
+                node: [(neighbor, edge["distance"]) for neighbor, edge in neighbors.items()
+                       if (node, neighbor) not in self.blocked]
+                for node, neighbors in self.graph.items()
+            }
+            return self.version, nodes, adjacency
     
     def get_neighbors(self, node):
-        """Get all neighbors of a node"""
-        return self.graph.get(node, {})
+        """Get all neighbors of a node (blocked edges left out)"""
+        neighbors = self.graph.get(node, {})
+        if not self.blocked:
+            return neighbors
+        return {neighbor: edge for neighbor, edge in neighbors.items() if (node, neighbor) not in self.blocked}
     
     def get_all_nodes(self):
         """Get list of all nodes"""
@@ -109,6 +263,6 @@ class CampusMap:
         """Get distance between two connected nodes"""
         neighbors = self.graph.get(from_node, {})
         edge = neighbors.get(to_node)
-        if edge:
+        if edge and (from_node, to_node) not in self.blocked:
             return edge["distance"]
         return float('inf')  # No direct connection
@@ -1,44 +1,91 @@
 """
-Dijkstra's Algorithm for shortest path finding
+Shortest path search (Dijkstra and A*) over a CampusMap
+Both keep the best distance and predecessor per node and rebuild the path
+once at the goal, so memory stays linear in the number of nodes reached
 """
+import math
 import heapq
 
-def dijkstra(graph_map, start, goal):
+
+def _walk_back(previous, goal):
+    path = [goal]
+    while previous[path[-1]] is not None:
+        path.append(previous[path[-1]])
+    path.reverse()
+    return path
+
+
+def _search(graph_map, start, goal, heuristic=None):
     """
-    Find shortest path using Dijkstra's algorithm
-    
-    :param graph_map: CampusMap instance
-    :param start: Start node name
-    :param goal: Goal node name
-    :return: (path, total_distance) or (None, None) if no path
+    :param heuristic: Callable node -> lower bound of its distance to goal, or None for Dijkstra
     """
-    # Priority queue: (distance, current_node, path)
-    pq = [(0, start, [start])]
-    visited = set()
+    get_neighbors = graph_map.get_neighbors
+    best = {start: 0}
+    previous = {start: None}
+    # (priority, -distance, node): on equal priority the node furthest along goes first
+    pq = [(heuristic(start) if heuristic else 0, 0, start)]
     
     while pq:
-        current_dist, current_node, path = heapq.heappop(pq)
-        
-        if current_node in visited:
-            continue
+        _, neg_dist, current_node = heapq.heappop(pq)
+        current_dist = -neg_dist
         
-        visited.add(current_node)
+        if current_dist > best[current_node]:
+            continue  # a shorter way here was already expanded
         
         # Goal reached
         if current_node == goal:
-            return path, current_dist
+            return _walk_back(previous, goal), current_dist
         
         # Explore neighbors
-        neighbors = graph_map.get_neighbors(current_node)
-        for neighbor, edge_data in neighbors.items():
-            if neighbor not in visited:
-                new_dist = current_dist + edge_data["distance"]
-                new_path = path + [neighbor]
-                heapq.heappush(pq, (new_dist, neighbor, new_path))
+        for neighbor, edge_data in get_neighbors(current_node).items():
+            new_dist = current_dist + edge_data["distance"]
+            if new_dist < best.get(neighbor, math.inf):
+                best[neighbor] = new_dist
+                previous[neighbor] = current_node
+                priority = new_dist + heuristic(neighbor) if heuristic else new_dist
+                heapq.heappush(pq, (priority, -new_dist, neighbor))
     
     return None, None  # No path found
 
 
+def dijkstra(graph_map, start, goal):
+    """
+    Find shortest path using Dijkstra's algorithm
+    
+    :param graph_map: CampusMap instance
+    :param start: Start node name
+    :param goal: Goal node name
+    :return: (path, total_distance) or (None, None) if no path
+    """
+    return _search(graph_map, start, goal)
+
+
+def astar(graph_map, start, goal):
+    """
+    Find shortest path using A* with the straight-line distance on the plan
+    (CampusMap.coordinates) as heuristic; falls back to Dijkstra when nodes
+    have no coordinates
+    
+    :param graph_map: CampusMap instance
+    :param start: Start node name
+    :param goal: Goal node name
+    :return: (path, total_distance) or (None, None) if no path
+    """
+    scale = graph_map.get_heuristic_scale()
+    target = graph_map.coordinates.get(goal)
+    coordinates = graph_map.coordinates
+    if not scale or target is None or start not in coordinates:
+        return _search(graph_map, start, goal)
+    
+    goal_x, goal_y = target[0], target[1]
+    
+    def heuristic(node):
+        position = coordinates[node]
+        return scale * math.hypot(position[0] - goal_x, position[1] - goal_y)
+    
+    return _search(graph_map, start, goal, heuristic)
+
+
 def get_navigation_instructions(graph_map, path):
     """
     Convert path to movement instructions
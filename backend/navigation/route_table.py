@@ -0,0 +1,175 @@
+"""
+All-pairs route table for a CampusMap
+Shortest distances and predecessors for every (start, goal) pair are
+computed once (Dijkstra from every node) and kept in NumPy matrices, so a
+route lookup walks the predecessor row back from the goal in O(path length)
+instead of searching the graph per request.
+
+Map edits and blocked edges invalidate the table and it is rebuilt in a
+background thread; until the new table is in place, lookups fall back to
+A* on the live map (holding the map's lock, so edits wait for the search),
+and a route never uses a blocked edge
+"""
+import heapq
+import logging
+import threading
+import time
+
+import numpy as np
+
+from .pathfinding import astar, get_navigation_instructions
+
+log = logging.getLogger(__name__)
+
+
+def all_pairs(nodes, adjacency):
+    """
+    Dijkstra from every node
+
+    :param nodes: Node names; matrix rows/columns follow this order
+    :param adjacency: {node: [(neighbor, distance)]}
+    :return: (distances, predecessor) n x n matrices; distances[s, g] is inf and
+             predecessor[s, g] is -1 when g can't be reached from s
+    """
+    index = {node: i for i, node in enumerate(nodes)}
+    n = len(nodes)
+    neighbors = [[(index[neighbor], float(distance)) for neighbor, distance in adjacency.get(node, ())
+                  if neighbor in index] for node in nodes]
+
+    distances = np.full((n, n), np.inf, dtype="float32")
+    predecessor = np.full((n, n), -1, dtype="int16" if n < 2 ** 15 else "int32")
+    for source in range(n):
+        best = [float("inf")] * n
+        done = [False] * n
+        best[source] = 0.0
+        pq = [(0.0, source, -1)]
+        while pq:
+            dist, node, prev = heapq.heappop(pq)
+            if done[node]:
+                continue
+            done[node] = True
+            distances[source, node] = dist
+            predecessor[source, node] = prev
+            for neighbor, weight in neighbors[node]:
+                new_dist = dist + weight
+                if new_dist < best[neighbor]:
+                    best[neighbor] = new_dist
+                    heapq.heappush(pq, (new_dist, neighbor, node))
+    return distances, predecessor
+
+
+class _Table:
+    def __init__(self, version, nodes, distances, predecessor, build_seconds):
+        self.version = version
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.distances = distances
+        self.predecessor = predecessor
+        self.build_seconds = build_seconds
+
+
+class RouteTable:
+    def __init__(self, campus_map, background=True):
+        """
+        Build the table now and rebuild it whenever campus_map is edited
+
+        :param campus_map: CampusMap instance
+        :param background: Rebuild in a background thread (False: rebuild inline on every edit)
+        """
+        self.map = campus_map
+        self.background = background
+        self._table = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._worker = None
+        self.stats = {"builds": 0, "table_lookups": 0, "fallback_lookups": 0}
+        self.rebuild()
+        campus_map.add_listener(self.invalidate)
+
+    def rebuild(self):
+        """Recompute the table from the current map (blocking)"""
+        version, nodes, adjacency = self.map.snapshot()
+        start = time.perf_counter()
+        distances, predecessor = all_pairs(nodes, adjacency)
+        table = _Table(version, nodes, distances, predecessor, time.perf_counter() - start)
+        with self._lock:
+            # A slower, older build must not replace a newer one
+            if self._table is None or table.version >= self._table.version:
+                self._table = table
+            self.stats["builds"] += 1
+        return table
+
+    def invalidate(self):
+        """The map changed: schedule a rebuild (edits that arrive meanwhile share one)"""
+        if not self.background:
+            self.rebuild()
+            return
+        with self._lock:
+            self._dirty = True
+            if self._worker is not None:
+                return
+            self._worker = threading.Thread(target=self._rebuild_loop, name="route-table", daemon=True)
+            self._worker.start()
+
+    def _rebuild_loop(self):
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    self._worker = None
+                    return
+                self._dirty = False
+            try:
+                self.rebuild()
+            except Exception:
+                log.exception("❌ Route table rebuild failed")
+
+    def is_current(self):
+        table = self._table
+        return table is not None and table.version == self.map.version
+
+    def route(self, start, goal):
+        """
+        Shortest path, same contract as dijkstra
+        :return: (path, total_distance) or (None, None) if no path
+        """
+        table = self._table
+        if table is None or table.version != self.map.version:
+            with self._lock:
+                self.stats["fallback_lookups"] += 1
+            with self.map._lock:
+                return astar(self.map, start, goal)
+
+        with self._lock:
+            self.stats["table_lookups"] += 1
+        s, g = table.index.get(start), table.index.get(goal)
+        if s is None or g is None or not np.isfinite(table.distances[s, g]):
+            return None, None
+
+        row = table.predecessor[s]
+        path = [g]
+        while path[-1] != s:
+            path.append(int(row[path[-1]]))
+        return [table.nodes[i] for i in reversed(path)], float(table.distances[s, g])
+
+    def distance(self, start, goal):
+        """Shortest distance in meters, inf if unreachable"""
+        path, distance = self.route(start, goal)
+        return distance if path else float("inf")
+
+    def get_navigation_instructions(self, start, goal):
+        """Movement instructions for the shortest route (empty if there is none)"""
+        path, _ = self.route(start, goal)
+        return get_navigation_instructions(self.map, path)
+
+    def get_stats(self):
+        table = self._table
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "nodes": len(table.nodes) if table else 0,
+            "current": self.is_current(),
+            "version": table.version if table else None,
+            "last_build_ms": round(table.build_seconds * 1000, 2) if table else None,
+            "table_bytes": int(table.distances.nbytes + table.predecessor.nbytes) if table else 0
+        }
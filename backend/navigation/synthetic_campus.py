@@ -0,0 +1,74 @@
+"""
+Synthetic campus graphs for benchmarks and tests
+Buildings sit on a grid; every floor has a corridor (a node every few
+meters) with rooms off both sides, stairwells at both corridor ends join
+the floors, and outdoor paths join neighbouring building entrances.
+Edge distances are never shorter than the straight line between node
+coordinates, so the A* heuristic stays exact
+"""
+import math
+import random
+
+from .campus_map import CampusMap
+
+STAIRS_DISTANCE = 4.0   # meters charged for one flight
+ROOM_DEPTH = (3.0, 8.0)
+OUTDOOR_DETOUR = (1.0, 1.3)
+
+
+def _connect(graph, coordinates, a, b, action, angle, back_action, back_angle, distance=None, detour=1.0):
+    if distance is None:
+        (x1, y1), (x2, y2) = coordinates[a][:2], coordinates[b][:2]
+        distance = math.ceil(math.hypot(x2 - x1, y2 - y1) * detour * 100) / 100
+    graph[a][b] = {"distance": distance, "action": action, "angle": angle}
+    graph[b][a] = {"distance": distance, "action": back_action, "angle": back_angle}
+
+
+def generate_campus(buildings=6, floors=4, corridor_nodes=30, rooms_per_node=2, spacing=5.0, seed=0):
+    """
+    Build a campus of buildings * floors * corridor_nodes * (1 + rooms_per_node) nodes
+
+    :param spacing: Meters between corridor nodes
+    :param seed: Same seed, same campus
+    :return: CampusMap with coordinates and a "building N" alias per entrance
+    """
+    rng = random.Random(seed)
+    graph, coordinates, aliases = {}, {}, {}
+    columns = math.ceil(math.sqrt(buildings))
+    gap = corridor_nodes * spacing + 40.0
+
+    def node(name, x, y, floor):
+        graph[name] = {}
+        coordinates[name] = (x, y, floor)
+        return name
+
+    for b in range(buildings):
+        origin_x, origin_y = (b % columns) * gap, (b // columns) * gap
+        for floor in range(floors):
+            corridor = [node(f"B{b}_F{floor}_C{i}", origin_x + i * spacing, origin_y, floor)
+                        for i in range(corridor_nodes)]
+            for i, current in enumerate(corridor):
+                if i:
+                    _connect(graph, coordinates, corridor[i - 1], current, "forward", 0, "forward", 180)
+                for k in range(rooms_per_node):
+                    side = 1 if k % 2 == 0 else -1
+                    depth = rng.uniform(*ROOM_DEPTH) * (k // 2 + 1)
+                    room = node(f"B{b}_F{floor}_R{i}_{k}", origin_x + i * spacing, origin_y + side * depth, floor)
+                    if side > 0:
+                        _connect(graph, coordinates, current, room, "turn_left", 90, "turn_right", -90)
+                    else:
+                        _connect(graph, coordinates, current, room, "turn_right", -90, "turn_left", 90)
+            if floor:
+                for i in (0, corridor_nodes - 1):
+                    _connect(graph, coordinates, f"B{b}_F{floor - 1}_C{i}", corridor[i],
+                             "stairs_up", 0, "stairs_down", 0, distance=STAIRS_DISTANCE)
+        aliases[f"building {b}"] = f"B{b}_F0_C0"
+
+    # Outdoor paths to the right and lower neighbours on the grid
+    for b in range(buildings):
+        for other in (b + 1 if (b + 1) % columns else None, b + columns):
+            if other is not None and other < buildings:
+                _connect(graph, coordinates, f"B{b}_F0_C0", f"B{other}_F0_C0", "forward", 0, "forward", 180,
+                         detour=rng.uniform(*OUTDOOR_DETOUR))
+
+    return CampusMap(graph, coordinates, aliases)
@@ -0,0 +1,28 @@
+"""QA support package"""
+from .admin import admin_allowed
+from .audio_store import AudioStore
+from .batching import MicroBatcher
+from .cache import AnswerCache
+from .documents import load_documents
+from .embedders import OnnxEmbedder, create_embedder, embedder_id
+from .generation import GenerationStats, classify_question, generation_budget
+from .index_factory import choose_index_type, normalize as normalize_vectors
+from .index_store import IndexStore
+from .lexical import LexicalIndex
+from .logs import setup_logging
+from .metrics import MetricsRegistry
+from .promotion import AnswerPromoter
+from .prompt_cache import PromptPrefixCache
+from .scheduler import InferenceScheduler, JobExpired, SchedulerBusy
+from .stt import SpeechToText, decode_audio
+from .tts import SpeechPipeline, sentence_ends, split_sentences, voice_sample_rate, wav_bytes
+from .tts_pool import TTSWorkerPool
+
+__all__ = [
+    'AnswerCache', 'AnswerPromoter', 'AudioStore', 'GenerationStats', 'IndexStore', 'InferenceScheduler',
+    'JobExpired', 'LexicalIndex', 'MetricsRegistry', 'MicroBatcher', 'OnnxEmbedder', 'PromptPrefixCache',
+    'SchedulerBusy', 'SpeechPipeline', 'SpeechToText', 'TTSWorkerPool',
+    'admin_allowed', 'choose_index_type', 'classify_question', 'create_embedder', 'decode_audio', 'embedder_id', 'generation_budget',
+    'load_documents', 'normalize_vectors', 'sentence_ends', 'setup_logging', 'split_sentences', 'voice_sample_rate',
+    'wav_bytes'
+]
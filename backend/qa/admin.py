@@ -0,0 +1,23 @@
+"""
+Access check for the admin routes (/kb/reload, /kb/review)
+With QA_ADMIN_TOKEN set, a request must send "Authorization: Bearer <token>";
+without it only requests made on this machine get through. Requests relayed
+by a proxy (Cloudflare Tunnel, nginx) also arrive from localhost, so one
+carrying forwarding headers counts as remote
+"""
+import hmac
+
+LOOPBACK = {"127.0.0.1", "::1", "localhost"}
+FORWARDING_HEADERS = ("forwarded", "x-forwarded-for", "x-real-ip", "cf-connecting-ip")
+
+
+def admin_allowed(headers, client_host, token=None):
+    """
+    :param headers: Request headers (case-insensitive mapping)
+    :param client_host: Peer address of the connection
+    :param token: Admin token, or None to allow local requests only
+    """
+    if token:
+        sent = headers.get("authorization") or ""
+        return hmac.compare_digest(sent.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+    return client_host in LOOPBACK and not any(headers.get(name) for name in FORWARDING_HEADERS)
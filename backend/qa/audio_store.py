@@ -0,0 +1,77 @@
+"""
+Content-addressed store of pre-rendered answer audio
+Files are keyed by sha256(voice model id + answer text), so a changed answer
+or a new voice gets a new file and stale ones are simply never looked up
+"""
+import os
+import hashlib
+import tempfile
+
+
+class AudioStore:
+    def __init__(self, root, voice_model):
+        """
+        :param root: Directory holding the rendered WAV files
+        :param voice_model: Piper voice model path, part of every key
+        """
+        self.root = os.path.abspath(root)
+        self.voice_id = self._voice_id(voice_model)
+        os.makedirs(self.root, exist_ok=True)
+    
+    @staticmethod
+    def _voice_id(voice_model):
+        """
+        Name, size and mtime of the voice model and its .json config, so a
+        replaced voice gets new keys without reading the 100MB+ model
+        """
+        parts = [os.path.basename(voice_model)]
+        for path in (voice_model, voice_model + ".json"):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+        return ":".join(parts)
+    
+    def key(self, text):
+        return hashlib.sha256(f"{self.voice_id}\0{text}".encode("utf-8")).hexdigest()
+    
+    def path_for(self, text):
+        key = self.key(text)
+        return os.path.join(self.root, key[:2], key + ".wav")
+    
+    def lookup(self, text):
+        """Path of the rendered WAV for text, or None if it hasn't been rendered"""
+        path = self.path_for(text)
+        return path if os.path.exists(path) else None
+    
+    def put(self, text, wav_bytes):
+        """Atomically write rendered audio for text"""
+        path = self.path_for(text)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(wav_bytes)
+        os.replace(tmp_path, path)
+        return path
+    
+    def prerender(self, texts, synthesize):
+        """
+        Render every text that isn't in the store yet
+        
+        :param texts: Answer texts
+        :param synthesize: Callable text -> WAV bytes (or None on failure)
+        :return: Dict with rendered / skipped / failed counts
+        """
+        stats = {"rendered": 0, "skipped": 0, "failed": 0}
+        for text in dict.fromkeys(texts):
+            if self.lookup(text):
+                stats["skipped"] += 1
+                continue
+            wav_bytes = synthesize(text)
+            if wav_bytes:
+                self.put(text, wav_bytes)
+                stats["rendered"] += 1
+            else:
+                stats["failed"] += 1
+        return stats
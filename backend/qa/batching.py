@@ -0,0 +1,77 @@
+"""
+Micro-batching scheduler
+Collects concurrent requests for a few milliseconds (or up to a batch cap)
+and hands them to one batched call, e.g. a single encode + FAISS search
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    def __init__(self, process_batch, max_batch=16, max_wait_ms=5, name="batcher"):
+        """
+        :param process_batch: Callable list of items -> list of results (same order)
+        :param max_batch: Max items per batch
+        :param max_wait_ms: How long the first item waits for company
+        """
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.stats = {"batches": 0, "items": 0, "max_batch_seen": 0}
+        self._start()
+        # Threads don't survive fork: a preloaded engine needs its own worker in every child
+        os.register_at_fork(after_in_child=self._start)
+    
+    def _start(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+    
+    def submit(self, item, timeout=None):
+        """Queue an item and block until its batch has been processed"""
+        future = Future()
+        self._queue.put((item, future))
+        return future.result(timeout)
+    
+    def pending(self):
+        """Items waiting for a batch"""
+        return self._queue.qsize()
+    
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+    
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+            
+            self.stats["batches"] += 1
+            self.stats["items"] += len(batch)
+            self.stats["max_batch_seen"] = max(self.stats["max_batch_seen"], len(batch))
+    
+    def get_stats(self):
+        stats = dict(self.stats)
+        stats["avg_batch"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        stats["pending"] = self._queue.qsize()
+        return stats
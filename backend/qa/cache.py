@@ -0,0 +1,127 @@
+"""
+Two-tier answer cache for the QA engine
+- Tier 1: exact-match LRU keyed on the normalized query text
+- Tier 2: semantic tier, reuses an answer whose query embedding is close enough
+"""
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+class AnswerCache:
+    def __init__(self, max_size=256, ttl=3600, semantic_size=256, semantic_distance=0.15):
+        """
+        :param max_size: Max entries in the exact-match tier
+        :param ttl: Seconds an entry stays valid (0 = never expires)
+        :param semantic_size: Max entries in the semantic tier (0 = disabled)
+        :param semantic_distance: Max squared L2 distance for a semantic hit
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.semantic_size = semantic_size
+        self.semantic_distance = semantic_distance
+        
+        self._lock = threading.Lock()
+        self._exact = OrderedDict()      # key -> (answer, source, tag, expires_at)
+        self._semantic = OrderedDict()   # key -> (vector, answer, source, tag, expires_at)
+        self.stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+    
+    @staticmethod
+    def normalize(query):
+        """Lowercase, drop punctuation and collapse whitespace"""
+        query = re.sub(r"[^\w\s]", " ", query.lower())
+        return " ".join(query.split())
+    
+    def _expiry(self):
+        return time.monotonic() + self.ttl if self.ttl else float("inf")
+    
+    def get(self, query):
+        """Exact tier lookup, returns (answer, source, tag) or None"""
+        key = self.normalize(query)
+        with self._lock:
+            entry = self._exact.get(key)
+            if entry is None:
+                return None
+            answer, source, tag, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._exact[key]
+                self.stats["evictions"] += 1
+                return None
+            self._exact.move_to_end(key)
+            self.stats["exact_hits"] += 1
+            return answer, source, tag
+    
+    def get_semantic(self, query_vec):
+        """Semantic tier lookup, returns (answer, source, tag) or None"""
+        if not self.semantic_size:
+            return None
+        query_vec = np.asarray(query_vec, dtype="float32").reshape(-1)
+        now = time.monotonic()
+        
+        with self._lock:
+            expired = [k for k, e in self._semantic.items() if e[4] < now]
+            for k in expired:
+                del self._semantic[k]
+            self.stats["evictions"] += len(expired)
+            
+            if not self._semantic:
+                return None
+            
+            keys = list(self._semantic.keys())
+            matrix = np.stack([self._semantic[k][0] for k in keys])
+            distances = ((matrix - query_vec) ** 2).sum(axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] > self.semantic_distance:
+                return None
+            
+            key = keys[best]
+            self._semantic.move_to_end(key)
+            self.stats["semantic_hits"] += 1
+            _, answer, source, tag, _ = self._semantic[key]
+            return answer, source, tag
+    
+    def record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+    
+    def put(self, query, answer, source, query_vec=None, tag=None):
+        """
+        Store an answer in the exact tier, and in the semantic tier if a vector is given
+        :param tag: Returned with the answer on a hit (e.g. the learned-answer cluster id)
+        """
+        key = self.normalize(query)
+        expires_at = self._expiry()
+        
+        with self._lock:
+            self._exact[key] = (answer, source, tag, expires_at)
+            self._exact.move_to_end(key)
+            while len(self._exact) > self.max_size:
+                self._exact.popitem(last=False)
+                self.stats["evictions"] += 1
+            
+            if query_vec is not None and self.semantic_size:
+                vec = np.asarray(query_vec, dtype="float32").reshape(-1)
+                self._semantic[key] = (vec, answer, source, tag, expires_at)
+                self._semantic.move_to_end(key)
+                while len(self._semantic) > self.semantic_size:
+                    self._semantic.popitem(last=False)
+                    self.stats["evictions"] += 1
+    
+    def clear(self):
+        """Drop every entry (called when the knowledge base is reloaded)"""
+        with self._lock:
+            self._exact.clear()
+            self._semantic.clear()
+            self.stats["invalidations"] += 1
+    
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["exact_size"] = len(self._exact)
+            stats["semantic_size"] = len(self._semantic)
+        lookups = stats["exact_hits"] + stats["semantic_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["exact_hits"] + stats["semantic_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,99 @@
+"""
+Document store over every knowledge-base source
+- knowledge_base.json        general Q&A pairs
+- knowledge_base/faqs.json   categorized FAQs with keywords
+- knowledge_base/faculty.json faculty directory, expanded into Q&A documents
+
+Every document has a stable id, category, question, answer, keywords and source
+"""
+import os
+import re
+import json
+import hashlib
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "_", text.lower()).strip("_")
+
+
+def _read_json(path):
+    if not path or not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def kb_documents(items):
+    docs = []
+    for item in items:
+        digest = hashlib.sha256(item["question"].encode("utf-8")).hexdigest()[:10]
+        docs.append({
+            "id": item.get("id", f"kb_{digest}"),
+            "category": item.get("category", "General"),
+            "question": item["question"],
+            "answer": item["answer"],
+            "keywords": item.get("keywords", []),
+            "source": "knowledge_base"
+        })
+    return docs
+
+
+def faq_documents(items):
+    return [{
+        "id": item["id"],
+        "category": item.get("category", "General"),
+        "question": item["question"],
+        "answer": item["answer"],
+        "keywords": item.get("keywords", []),
+        "source": "faq"
+    } for item in items]
+
+
+def faculty_documents(people):
+    """Expand each faculty record into who-is / office / email / teaches questions"""
+    docs = []
+    for person in people:
+        name, slug = person["name"], _slug(person["name"])
+        keywords = [part.lower() for part in name.replace(".", "").split() if len(part) > 2]
+        keywords += [person.get("department", "").lower(), person.get("office", "").lower()]
+        keywords += [s.strip().lower() for s in person.get("specialization", "").split(",") if s.strip()]
+        keywords = [k for k in keywords if k]
+        
+        templates = [
+            ("who", f"Who is {name}?",
+             f"{name} is {person.get('title', 'a faculty member')} in the {person.get('department', '')} department."),
+            ("office", f"Where is {name}'s office?",
+             f"{name}'s office is at {person.get('office', 'the faculty offices')}."),
+            ("email", f"What is {name}'s email?",
+             f"You can email {name} at {person.get('email', 'the department office')}."),
+            ("specialization", f"What does {name} teach?",
+             f"{name} specializes in {person.get('specialization', 'their department courses')}."),
+        ]
+        for suffix, question, answer in templates:
+            docs.append({
+                "id": f"faculty_{slug}_{suffix}",
+                "category": "Faculty",
+                "question": question,
+                "answer": answer,
+                "keywords": keywords,
+                "source": "faculty"
+            })
+    return docs
+
+
+def load_documents(kb_path, faq_path=None, faculty_path=None):
+    """Load all sources into one list of documents with unique ids"""
+    docs = (
+        kb_documents(_read_json(kb_path))
+        + faq_documents(_read_json(faq_path))
+        + faculty_documents(_read_json(faculty_path))
+    )
+    
+    seen = {}
+    for doc in docs:
+        if doc["id"] in seen:
+            seen[doc["id"]] += 1
+            doc["id"] = f"{doc['id']}_{seen[doc['id']]}"
+        else:
+            seen[doc["id"]] = 0
+    return docs
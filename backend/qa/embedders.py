@@ -0,0 +1,84 @@
+"""
+Query/document embedding backends
+- torch: SentenceTransformer (PyTorch)
+- onnx:  exported, int8-quantized ONNX Runtime model with its own tokenizer;
+         mean pooling + L2 normalization like all-MiniLM-L6-v2, no torch import
+
+Both expose encode(texts, batch_size=...) -> (n, dim) float32 and
+get_sentence_embedding_dimension(), so the engine doesn't care which is loaded
+"""
+import os
+
+import numpy as np
+
+
+class OnnxEmbedder:
+    MODEL_FILES = ("model_quantized.onnx", "model.onnx")
+    
+    def __init__(self, model_dir, threads=0, max_length=256):
+        """
+        :param model_dir: Directory from export_onnx_embedder.py (model + tokenizer.json)
+        :param threads: ONNX Runtime intra-op threads (0 = all cores)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        
+        model_path = next(
+            (os.path.join(model_dir, name) for name in self.MODEL_FILES
+             if os.path.exists(os.path.join(model_dir, name))),
+            None
+        )
+        if model_path is None:
+            raise FileNotFoundError(f"No ONNX model in {model_dir} (run export_onnx_embedder.py)")
+        
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dim = self.session.get_outputs()[0].shape[-1]
+        
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+    
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+    
+    def encode(self, texts, batch_size=32, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(list(texts[start:start + batch_size]))
+            input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {"input_ids": input_ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            
+            hidden = self.session.run(None, feeds)[0]
+            weights = mask[..., None].astype(np.float32)
+            batches.append((hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None))
+        
+        if not batches:
+            return np.empty((0, self.dim), dtype=np.float32)
+        vectors = np.concatenate(batches).astype(np.float32)
+        return vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+
+
+def embedder_id(backend, model_name):
+    """Identity recorded in the index manifest; a different id triggers a re-embed"""
+    return model_name if backend == "torch" else f"{model_name}:onnx-int8"
+
+
+def create_embedder(backend, model_name, onnx_dir=None, threads=0):
+    """
+    :param backend: "torch" (SentenceTransformer) or "onnx" (quantized ONNX Runtime)
+    """
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name)
+    if backend == "onnx":
+        return OnnxEmbedder(onnx_dir, threads=threads)
+    raise ValueError(f"Unknown embedding backend '{backend}'")
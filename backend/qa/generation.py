@@ -0,0 +1,109 @@
+"""
+Adaptive generation budget for LLM answers
+Picks a token budget and sentence limit from the kind of question, so a
+greeting doesn't get the same allowance as an explanation, and keeps
+per-request generation stats (tokens, stop reason, estimated time saved)
+
+Time saved by an early stop is estimated against the mean length of answers
+of the same type that ended naturally. Those are the answers that fit their
+budget, so the mean leans short and the estimate is a lower bound; no
+estimate is made for a type until it has natural stops
+"""
+import re
+import threading
+from collections import deque
+
+GREETING_WORDS = {
+    "hi", "hello", "hey", "salam", "assalam", "assalamualaikum", "thanks", "thank", "bye", "goodbye",
+    "morning", "afternoon", "evening", "good", "ok", "okay", "how", "are", "you", "doing", "what's", "up"
+}
+EXPLANATION_WORDS = {"why", "how", "explain", "describe", "difference", "compare", "process", "steps"}
+FACTUAL_STARTS = {"who", "where", "when", "what", "which", "is", "are", "can", "do", "does", "whom", "whose"}
+
+DEFAULT_BUDGETS = {
+    "greeting": {"max_tokens": 48, "max_sentences": 1},
+    "factual": {"max_tokens": 96, "max_sentences": 2},
+    "explanation": {"max_tokens": 220, "max_sentences": 4},
+    "general": {"max_tokens": 128, "max_sentences": 3}
+}
+
+
+def classify_question(query):
+    """Rough question type: greeting, factual, explanation or general"""
+    words = re.findall(r"[a-z']+", query.lower())
+    if not words:
+        return "general"
+    if len(words) <= 5 and all(word in GREETING_WORDS for word in words):
+        return "greeting"
+    if EXPLANATION_WORDS.intersection(words):
+        return "explanation"
+    if words[0] in FACTUAL_STARTS and len(words) <= 12:
+        return "factual"
+    return "general"
+
+
+def generation_budget(query, budgets=None, max_tokens=None):
+    """
+    :param budgets: Overrides for DEFAULT_BUDGETS
+    :param max_tokens: Hard ceiling applied to every budget
+    :return: (question type, {"max_tokens", "max_sentences"})
+    """
+    kind = classify_question(query)
+    budget = dict(DEFAULT_BUDGETS[kind], **(budgets or {}).get(kind, {}))
+    if max_tokens:
+        budget["max_tokens"] = min(budget["max_tokens"], max_tokens)
+    return kind, budget
+
+
+class GenerationStats:
+    def __init__(self, recent=20):
+        """
+        :param recent: How many per-request records to keep
+        """
+        self._lock = threading.Lock()
+        self.totals = {"requests": 0, "tokens": 0, "seconds": 0.0, "tokens_saved": 0, "seconds_saved": 0.0}
+        self.stop_reasons = {}
+        self.natural = {}     # question type -> (answers that stopped naturally, their tokens)
+        self.recent = deque(maxlen=recent)
+
+    def record(self, kind, budget, tokens, seconds, stop_reason):
+        """:param stop_reason: natural, sentences, budget, deadline or cancelled"""
+        per_token = seconds / tokens if tokens else 0.0
+        early = stop_reason in ("sentences", "budget", "deadline")
+        with self._lock:
+            count, total = self.natural.get(kind, (0, 0))
+            if stop_reason == "natural":
+                self.natural[kind] = (count + 1, total + tokens)
+        tokens_saved = max(round(total / count) - tokens, 0) if early and count else 0
+        entry = {
+            "type": kind,
+            "max_tokens": budget["max_tokens"],
+            "max_sentences": budget["max_sentences"],
+            "tokens": tokens,
+            "seconds": round(seconds, 3),
+            "stop_reason": stop_reason,
+            "tokens_saved": tokens_saved,
+            "seconds_saved": round(tokens_saved * per_token, 3)
+        }
+        with self._lock:
+            self.totals["requests"] += 1
+            self.totals["tokens"] += tokens
+            self.totals["seconds"] += seconds
+            self.totals["tokens_saved"] += tokens_saved
+            self.totals["seconds_saved"] += entry["seconds_saved"]
+            self.stop_reasons[stop_reason] = self.stop_reasons.get(stop_reason, 0) + 1
+            self.recent.append(entry)
+        return entry
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.totals)
+            stats["stop_reasons"] = dict(self.stop_reasons)
+            stats["natural_avg_tokens"] = {kind: round(total / count, 1) for kind, (count, total) in self.natural.items()}
+            stats["recent"] = list(self.recent)
+        requests = stats["requests"]
+        stats["avg_tokens"] = round(stats["tokens"] / requests, 1) if requests else 0.0
+        stats["tokens_per_second"] = round(stats["tokens"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["seconds_saved"] = round(stats["seconds_saved"], 3)
+        return stats
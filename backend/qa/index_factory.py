@@ -0,0 +1,89 @@
+"""
+Size-aware FAISS index selection
+- flat       exact search, raw float32 (small corpora)
+- hnsw       graph search, raw float32
+- hnsw_sq8   graph search, 8-bit scalar-quantized vectors
+- ivf_sq8    inverted lists, 8-bit scalar-quantized vectors
+- ivf_pq     inverted lists, product-quantized vectors (largest corpora)
+
+Vectors are L2-normalized, so squared L2 = 2 - 2 * cosine and the distance
+threshold means the same thing whatever the index type
+"""
+import math
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "hnsw", "hnsw_sq8", "ivf_sq8", "ivf_pq")
+REMOVABLE_TYPES = {"flat", "ivf_sq8", "ivf_pq"}
+
+DEFAULT_PARAMS = {
+    "hnsw_min": 10000,       # auto: flat below this many vectors
+    "ivf_min": 200000,       # auto: hnsw_sq8 below this, ivf_pq above
+    "hnsw_m": 32,
+    "ef_search": 64,
+    "nprobe": 16,
+    "pq_m": 48,
+}
+
+
+def normalize(vectors):
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def choose_index_type(n_vectors, requested="auto", params=None):
+    """Resolve "auto" to an index type for a corpus of n_vectors"""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    if requested != "auto":
+        if requested not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type '{requested}'")
+        return requested
+    if n_vectors < params["hnsw_min"]:
+        return "flat"
+    if n_vectors < params["ivf_min"]:
+        return "hnsw_sq8"
+    return "ivf_pq"
+
+
+def _factory_string(index_type, dim, n_vectors, params):
+    nlist = max(1, min(int(4 * math.sqrt(max(n_vectors, 1))), n_vectors // 39 or 1))
+    pq_m = params["pq_m"] if dim % params["pq_m"] == 0 else 8
+    pq_bits = max(1, min(8, int(math.log2(max(n_vectors // 39, 2)))))  # 2^bits centroids need ~39x training points
+    return {
+        "flat": "Flat",
+        "hnsw": f"HNSW{params['hnsw_m']}",
+        "hnsw_sq8": f"HNSW{params['hnsw_m']}_SQ8",
+        "ivf_sq8": f"IVF{nlist},SQ8",
+        "ivf_pq": f"IVF{nlist},PQ{pq_m}x{pq_bits}",
+    }[index_type]
+
+
+def configure_search(index, params=None):
+    """Apply efSearch / nprobe to the index wrapped by an IndexIDMap"""
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    inner = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if hasattr(inner, "hnsw"):
+        inner.hnsw.efSearch = params["ef_search"]
+    if hasattr(inner, "nprobe"):
+        inner.nprobe = params["nprobe"]
+    return index
+
+
+def build_index(index_type, vectors, ids, params=None):
+    """
+    Build and train an ID-mapped index of index_type over normalized vectors
+    
+    :param vectors: (n, dim) float32, already normalized
+    :param ids: (n,) int64 vector IDs
+    """
+    params = {**DEFAULT_PARAMS, **(params or {})}
+    dim = vectors.shape[1]
+    inner = faiss.index_factory(dim, _factory_string(index_type, dim, len(vectors), params), faiss.METRIC_L2)
+    if not inner.is_trained:
+        inner.train(vectors)
+    index = faiss.IndexIDMap2(inner)
+    if len(vectors):
+        index.add_with_ids(vectors, ids)
+    return configure_search(index, params)
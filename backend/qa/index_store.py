@@ -0,0 +1,223 @@
+"""
+Content-fingerprinted FAISS index store
+Keeps three artifacts next to the index path:
+- <name>.index            IndexIDMap2 over the KB question vectors
+- <name>.manifest.json    content hash + stable vector ID per KB entry,
+                          plus the calibrated KB threshold (calibrate_threshold.py)
+- <name>.embeddings.npy   vectors in manifest order (memory-mappable)
+
+On startup only new or changed entries are embedded, removed entries are
+dropped from the ID-mapped index, and a full rebuild only happens when the
+embedding model changes (or the artifacts are missing/corrupt). When the
+index type changes (or an HNSW index loses entries) the FAISS structure is
+rebuilt from the stored vectors without re-embedding anything
+"""
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+
+import faiss
+import numpy as np
+
+from .index_factory import REMOVABLE_TYPES, build_index, choose_index_type, configure_search, normalize
+
+MANIFEST_VERSION = 2
+
+
+def content_keys(texts):
+    """Stable key per text: content hash plus occurrence number for duplicates"""
+    seen = {}
+    keys = []
+    for text in texts:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        seen[digest] = seen.get(digest, -1) + 1
+        keys.append(f"{digest}:{seen[digest]}")
+    return keys
+
+
+def _atomic_write(path, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def _atomic_write_index(index, path):
+    # A new inode: processes that have the old file mapped keep reading the old one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    os.close(fd)
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+class IndexStore:
+    def __init__(self, index_path, embed_model, index_type="auto", index_params=None, mmap=False):
+        """
+        :param index_path: Path of the FAISS index file
+        :param embed_model: Embedding model name, recorded in the manifest
+        :param index_type: "auto" or one of qa.index_factory.INDEX_TYPES
+        :param index_params: Overrides for qa.index_factory.DEFAULT_PARAMS
+        :param mmap: Map the index file read-only instead of copying it into memory
+                     (an index that needs updating is re-read normally first)
+        """
+        base = os.path.splitext(index_path)[0]
+        self.index_path = index_path
+        self.manifest_path = base + ".manifest.json"
+        self.embeddings_path = base + ".embeddings.npy"
+        self.embed_model = embed_model
+        self.index_type = index_type
+        self.index_params = index_params or {}
+        self.mmap = mmap
+    
+    def _read_index(self, mmap=False):
+        if mmap:
+            # Flag name and coverage vary across faiss releases; fall back to a normal read
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            try:
+                return configure_search(faiss.read_index(self.index_path, flag | faiss.IO_FLAG_READ_ONLY),
+                                        self.index_params)
+            except RuntimeError:
+                pass
+        return configure_search(faiss.read_index(self.index_path), self.index_params)
+    
+    def _read_manifest(self):
+        with open(self.manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    
+    def load(self):
+        """
+        :return: (manifest, index, embeddings) or None if missing, stale or inconsistent
+                 index is None when only the FAISS file needs rebuilding
+        """
+        try:
+            manifest = self._read_manifest()
+            if manifest.get("version") != MANIFEST_VERSION or manifest.get("embed_model") != self.embed_model:
+                return None
+            
+            embeddings = np.load(self.embeddings_path, mmap_mode="r")
+            entries = manifest["entries"]
+            if embeddings.shape[0] != len(entries):
+                return None
+            
+            # A missing or inconsistent index is rebuilt from the stored vectors
+            try:
+                index = self._read_index(self.mmap)
+                if index.ntotal != len(entries):
+                    index = None
+            except RuntimeError:
+                index = None
+            return manifest, index, embeddings
+        except (OSError, ValueError, KeyError, RuntimeError):
+            return None
+    
+    def save(self, index, manifest, embeddings):
+        _atomic_write_index(index, self.index_path)
+        _atomic_write(self.embeddings_path, lambda f: np.save(f, embeddings))
+        _atomic_write(self.manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+    
+    def save_calibration(self, calibration):
+        """Record the calibrated KB threshold in the manifest, so it is loaded with the index"""
+        manifest = self._read_manifest()
+        manifest["calibration"] = calibration
+        _atomic_write(self.manifest_path, lambda f: f.write(json.dumps(manifest, indent=2).encode("utf-8")))
+    
+    def _kept_calibration(self, previous):
+        """The calibration survives KB edits and forced re-embeds, but not a model change"""
+        if previous is not None:
+            return previous[0].get("calibration")
+        try:
+            manifest = self._read_manifest()
+        except (OSError, ValueError):
+            return None
+        return manifest.get("calibration") if manifest.get("embed_model") == self.embed_model else None
+    
+    def snapshot(self, dest_dir):
+        """Copy the current artifacts into dest_dir (for versioned builds)"""
+        os.makedirs(dest_dir, exist_ok=True)
+        for path in (self.index_path, self.manifest_path, self.embeddings_path):
+            shutil.copy2(path, os.path.join(dest_dir, os.path.basename(path)))
+    
+    def sync(self, texts, encode, force=False):
+        """
+        Bring the stored index in line with texts
+        
+        :param texts: Texts to index (KB questions), position = KB index
+        :param encode: Callable list of texts -> 2D float array
+        :param force: Ignore stored artifacts and re-embed everything
+        :return: (index, id_to_pos, stats) where id_to_pos maps vector IDs to text positions;
+                 stats["calibration"] is the stored threshold calibration or None
+        """
+        keys = content_keys(texts)
+        index_type = choose_index_type(len(texts), self.index_type, self.index_params)
+        previous = None if force else self.load()
+        calibration = self._kept_calibration(previous)
+        stats = {"reused": 0, "embedded": 0, "removed": 0, "full_rebuild": previous is None,
+                 "index_rebuilt": False, "index_type": index_type, "calibration": calibration}
+        
+        if previous is None:
+            vectors = normalize(encode(texts))
+            ids = np.arange(len(texts), dtype="int64")
+            index = build_index(index_type, vectors, ids, self.index_params)
+            next_id = len(texts)
+            stats["embedded"] = len(texts)
+        else:
+            manifest, index, stored = previous
+            old = {entry["key"]: (entry["id"], row) for row, entry in enumerate(manifest["entries"])}
+            current = set(keys)
+            removed = [vec_id for key, (vec_id, _) in old.items() if key not in current]
+            
+            ids = np.empty(len(texts), dtype="int64")
+            vectors = np.empty((len(texts), stored.shape[1]), dtype="float32")
+            new_positions = []
+            for pos, key in enumerate(keys):
+                if key in old:
+                    ids[pos], row = old[key]
+                    vectors[pos] = stored[row]
+                else:
+                    new_positions.append(pos)
+            del stored
+            
+            next_id = manifest["next_id"]
+            new_ids = np.arange(next_id, next_id + len(new_positions), dtype="int64")
+            if new_positions:
+                vectors[new_positions] = normalize(encode([texts[pos] for pos in new_positions]))
+                ids[new_positions] = new_ids
+                next_id += len(new_positions)
+            
+            rebuild_index = (
+                index is None
+                or manifest.get("index_type") != index_type
+                or (removed and index_type not in REMOVABLE_TYPES)
+            )
+            if rebuild_index:
+                index = build_index(index_type, vectors, ids, self.index_params)
+            else:
+                if self.mmap and (removed or new_positions):
+                    index = self._read_index()  # mapped pages are read-only
+                if removed:
+                    index.remove_ids(np.array(removed, dtype="int64"))
+                if new_positions:
+                    index.add_with_ids(vectors[new_positions], new_ids)
+            
+            stats.update(reused=len(texts) - len(new_positions), embedded=len(new_positions),
+                         removed=len(removed), index_rebuilt=rebuild_index)
+        
+        if stats["full_rebuild"] or stats["index_rebuilt"] or stats["embedded"] or stats["removed"]:
+            manifest = {
+                "version": MANIFEST_VERSION,
+                "embed_model": self.embed_model,
+                "normalized": True,
+                "index_type": index_type,
+                "dim": int(vectors.shape[1]),
+                "next_id": int(next_id),
+                "entries": [{"key": key, "id": int(vec_id)} for key, vec_id in zip(keys, ids)]
+            }
+            if calibration:
+                manifest["calibration"] = calibration
+            self.save(index, manifest, vectors)
+        
+        id_to_pos = np.full(next_id, -1, dtype="int64")
+        id_to_pos[ids] = np.arange(len(texts), dtype="int64")
+        return index, id_to_pos, stats
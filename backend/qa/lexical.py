@@ -0,0 +1,92 @@
+"""
+Lexical retrieval next to the FAISS index
+- Normalized-question hash map: exact / near-exact matches without running the embedder
+- BM25 inverted index over questions + keywords, fused with vector distances
+"""
+import re
+import math
+from collections import Counter, defaultdict
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "of", "in", "on", "at", "to", "for", "and", "or",
+    "what", "where", "who", "when", "how", "which", "do", "does", "i", "can", "my", "your",
+    "me", "you", "it", "be", "there", "please", "tell"
+}
+FILLER_PREFIX = re.compile(r"^(please |can you tell me |could you tell me |tell me )+")
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"\w+", text.lower()) if t not in STOPWORDS]
+
+
+def normalize_question(text):
+    """Key for near-exact matching: case, punctuation, articles and filler prefixes don't matter"""
+    text = " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+    text = FILLER_PREFIX.sub("", text)
+    return " ".join(t for t in text.split() if t not in {"a", "an", "the", "please"})
+
+
+class LexicalIndex:
+    def __init__(self, documents, k1=1.5, b=0.75, saturation=3.0):
+        """
+        :param documents: KB documents (question, answer, optional keywords)
+        :param k1, b: BM25 parameters
+        :param saturation: BM25 score that earns half the lexical bonus in fuse()
+        """
+        self.k1 = k1
+        self.b = b
+        self.saturation = saturation
+        self.exact = {}
+        self.postings = defaultdict(list)   # term -> [(doc position, term frequency)]
+        self.doc_lengths = []
+        
+        for pos, doc in enumerate(documents):
+            self.exact.setdefault(normalize_question(doc["question"]), pos)
+            tokens = tokenize(doc["question"] + " " + " ".join(doc.get("keywords", [])))
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((pos, tf))
+        
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        n = len(self.doc_lengths)
+        self.idf = {
+            term: math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for term, posting in self.postings.items()
+        }
+    
+    def exact_match(self, query):
+        """KB position whose question normalizes to the same key, or None"""
+        return self.exact.get(normalize_question(query))
+    
+    def scores(self, query):
+        """BM25 score per matching doc position"""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for pos, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[pos] / self.avg_length)
+                scores[pos] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return scores
+    
+    def fuse(self, query, distances, positions, weight):
+        """
+        Re-rank vector candidates with lexical evidence
+        fused distance = L2 distance - weight * score / (score + saturation)
+        
+        The bonus depends on the BM25 score itself, not on the best score for the
+        query, so a weak lexical match (one common word) gets a small bonus even
+        when it is the best one there is
+        
+        :return: List of (position, fused distance, vector distance) sorted best first
+        """
+        scores = self.scores(query)
+        fused = []
+        for dist, pos in zip(distances, positions):
+            if pos < 0:
+                continue
+            score = scores.get(pos, 0.0)
+            lexical = score / (score + self.saturation) if score > 0 else 0.0
+            fused.append((int(pos), float(dist) - weight * lexical, float(dist)))
+        return sorted(fused, key=lambda item: item[1])
@@ -0,0 +1,61 @@
+"""
+Leveled, structured logging for the QA server
+Modules log through logging.getLogger(__name__) with context passed as
+extra={...}; the formatter appends those fields as key=value pairs (text)
+or emits one JSON object per line (json). Per-request detail is logged at
+DEBUG, and anything costly to build is guarded with isEnabledFor, so it
+costs close to nothing at the default INFO level
+"""
+import sys
+import json
+import logging
+
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+def _fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED}
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def formatMessage(self, record):
+        # Fields go on the message line, before any traceback
+        line = super().formatMessage(record)
+        fields = _fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value!r}" if isinstance(value, str) else f"{key}={value}"
+                                   for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **_fields(record)
+        }
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def setup_logging(level="INFO", fmt="text"):
+    """
+    Configure the root logger once (stderr); later calls only change the level
+    :param fmt: "text" or "json"
+    """
+    root = logging.getLogger()
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    if any(getattr(handler, "_qa_handler", False) for handler in root.handlers):
+        return root
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    handler._qa_handler = True
+    root.addHandler(handler)
+    return root
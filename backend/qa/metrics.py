@@ -0,0 +1,262 @@
+"""
+Minimal Prometheus metrics: counters, gauges and histograms with labels,
+rendered in the text exposition format for GET /metrics
+
+Metrics are kept per process. With a multiproc_dir (gunicorn workers), every
+process writes its samples to <dir>/<pid>.json every sync_interval seconds
+and render() aggregates them: counters and histograms are summed over all
+workers, dead ones included, and gauges get a worker="<pid>" label for each
+live worker
+"""
+import os
+import glob
+import json
+import time
+import bisect
+import tempfile
+import threading
+import contextlib
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=(), fn=None):
+        """
+        :param labels: Label names; values are passed positionally to inc/set/observe
+        :param fn: Read the value at scrape time instead of storing it; returns a
+                   number, or a {label values tuple: number} dict for labelled metrics
+        """
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, label_values):
+        if len(label_values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(str(v) for v in label_values)
+
+    def _samples(self):
+        if self.fn is None:
+            with self._lock:
+                return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+        try:
+            value = self.fn()
+        except Exception:
+            return []  # the component isn't loaded yet
+        if value is None:
+            return []
+        values = value if isinstance(value, dict) else {(): value}
+        return [(self.name, self._key(key), (), v) for key, v in sorted(values.items())]
+
+    def render(self, samples=None):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self._samples() if samples is None else samples:
+            lines.append(f"{name}{_format_labels(self.labels, key, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount=1):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, *label_values):
+        key = self._key(label_values)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *label_values):
+        key = self._key(label_values)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def _samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), total))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+
+def _write_json(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_dumps(directory):
+    dumps = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                dumps.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # the worker is being replaced
+    return dumps
+
+
+def clear_multiproc_dir(directory):
+    """Create the shared directory and drop samples of a previous run (call in the master before forking)"""
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def mark_process_dead(directory, pid):
+    """
+    A worker exited: keep its counters and histograms in the totals, drop its gauges
+    (call from gunicorn's child_exit hook)
+    """
+    path = os.path.join(directory, f"{pid}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return
+    data["live"] = False
+    _write_json(path, data)
+
+
+def _aggregate(metric, dumps):
+    totals = {}
+    for dump in dumps:
+        for name, key, extra, value in dump["metrics"].get(metric.name, []):
+            key, extra = tuple(key), tuple(tuple(pair) for pair in extra)
+            if metric.kind == "gauge":
+                if dump["live"]:
+                    totals[(name, key, extra + (("worker", str(dump["pid"])),))] = value
+            else:
+                totals[(name, key, extra)] = totals.get((name, key, extra), 0) + value
+    return [(name, key, extra, value) for (name, key, extra), value in totals.items()]
+
+
+class MetricsRegistry:
+    def __init__(self, multiproc_dir=None, sync_interval=1.0):
+        """
+        :param multiproc_dir: Directory shared by the worker processes; render()
+                              aggregates all of them (None: this process only)
+        :param sync_interval: Seconds between writes of this process's samples
+        """
+        self._metrics = []
+        self.multiproc_dir = multiproc_dir
+        if multiproc_dir is not None:
+            os.makedirs(multiproc_dir, exist_ok=True)
+        self.sync_interval = sync_interval
+        self._sync_pid = None
+        self._stop = threading.Event()
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=(), fn=None):
+        return self._add(Counter(name, help_text, labels, fn))
+
+    def gauge(self, name, help_text, labels=(), fn=None):
+        return self._add(Gauge(name, help_text, labels, fn))
+
+    def histogram(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def _dump(self, live=True):
+        pid = os.getpid()
+        data = {
+            "pid": pid,
+            "live": live,
+            "metrics": {metric.name: [[name, list(key), [list(pair) for pair in extra], value]
+                                      for name, key, extra, value in metric._samples()]
+                        for metric in self._metrics}
+        }
+        _write_json(os.path.join(self.multiproc_dir, f"{pid}.json"), data)
+
+    def start_sync(self):
+        """Write this process's samples every sync_interval (call in each worker, after fork)"""
+        if self.multiproc_dir is None or self._sync_pid == os.getpid():
+            return
+        self._sync_pid = os.getpid()
+        self._stop = threading.Event()
+        self._dump()
+        threading.Thread(target=self._sync_loop, args=(self._stop,), name="metrics-sync", daemon=True).start()
+
+    def _sync_loop(self, stop):
+        while not stop.wait(self.sync_interval):
+            try:
+                self._dump()
+            except OSError:
+                pass  # try again next interval
+
+    def close(self):
+        """Stop syncing and write the final samples of this process"""
+        if self._sync_pid != os.getpid():
+            return
+        self._stop.set()
+        self._sync_pid = None
+        self._dump(live=False)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        if self.multiproc_dir is None:
+            return "\n".join(metric.render() for metric in self._metrics) + "\n"
+        self._dump()  # this worker's numbers are fresh, the others' at most sync_interval old
+        dumps = _read_dumps(self.multiproc_dir)
+        return "\n".join(metric.render(_aggregate(metric, dumps)) for metric in self._metrics) + "\n"
@@ -0,0 +1,302 @@
+"""
+Learned answers: promote repeated LLM fallbacks into a secondary index
+Every LLM answer is recorded against its (normalized) query embedding.
+Similar queries are clustered by distance to a running centroid, and a
+repeat served from the answer cache counts towards the cluster that
+generated the answer; once a cluster has been asked min_count times its answer is promoted into a small
+flat FAISS index that is searched after the main KB, turning a repeated
+generation into a retrieval. With review enabled, clusters wait for approval
+instead of being promoted automatically
+
+State lives in one JSON file (clusters with centroid, count, sample queries
+and status), written atomically at most once per save_interval, and at once
+when a cluster is promoted, queued, approved or rejected. Pending clusters
+that haven't been asked for pending_ttl seconds are dropped, and beyond
+max_pending the least asked ones go first
+"""
+import logging
+import json
+import time
+import threading
+
+import numpy as np
+
+from .index_factory import build_index, normalize
+from .index_store import _atomic_write
+
+log = logging.getLogger(__name__)
+
+STORE_VERSION = 1
+MAX_SAMPLES = 5
+
+PENDING = "pending"
+REVIEW = "review"
+PROMOTED = "promoted"
+REJECTED = "rejected"
+
+
+class AnswerPromoter:
+    def __init__(self, path, embed_model, min_count=5, distance=0.2, review=False,
+                 save_interval=30.0, pending_ttl=7 * 86400, max_pending=5000):
+        """
+        :param path: JSON file holding the clusters
+        :param embed_model: Embedding model id; a different model discards the store
+        :param min_count: Times a cluster must be asked before promotion
+        :param distance: Max squared L2 between normalized query vectors, for
+                         both joining a cluster and matching a promoted answer
+        :param review: Queue clusters for approval instead of promoting them
+        :param save_interval: Min seconds between writes of the store for plain counts
+        :param pending_ttl: Seconds after which a pending cluster nobody asked again is dropped
+        :param max_pending: Max pending clusters kept (None: no cap)
+        """
+        self.path = path
+        self.embed_model = embed_model
+        self.min_count = min_count
+        self.distance = distance
+        self.review = review
+        self.save_interval = save_interval
+        self.pending_ttl = pending_ttl
+        self.max_pending = max_pending
+
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = 0.0
+        self._version = 0     # bumped per snapshot, so an older one is never written last
+        self._written = 0
+        self.clusters = {}    # id -> cluster dict
+        self.centroids = {}   # id -> float32 vector
+        self.next_id = 0
+        self.index = None
+        self.stats = {"recorded": 0, "cache_repeats": 0, "hits": 0, "promotions": 0, "pruned": 0, "saves": 0}
+
+    def load(self):
+        """Load the store; a missing, stale or corrupt file starts an empty one"""
+        with self._lock:
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("version") != STORE_VERSION or data.get("embed_model") != self.embed_model:
+                    data = {}
+            except (OSError, ValueError):
+                data = {}
+
+            self.clusters, self.centroids = {}, {}
+            now = time.time()
+            for cluster in data.get("clusters", []):
+                centroid = np.asarray(cluster.pop("centroid"), dtype="float32")
+                cluster.setdefault("seen_at", now)
+                self.clusters[cluster["id"]] = cluster
+                self.centroids[cluster["id"]] = centroid
+            self.next_id = data.get("next_id", 0)
+            self._dirty = False
+            self._last_save = time.monotonic()
+            self._rebuild_index()
+        return len(self.clusters)
+
+    def _save(self, force=False):
+        """
+        Write the store if it changed and save_interval has passed (or force);
+        the snapshot is taken under the lock, the file written outside it
+        """
+        with self._lock:
+            if not self._dirty or (not force and time.monotonic() - self._last_save < self.save_interval):
+                return False
+            self._prune()
+            clusters = [dict(cluster, centroid=self.centroids[cid].tolist())
+                        for cid, cluster in self.clusters.items()]
+            data = {
+                "version": STORE_VERSION,
+                "embed_model": self.embed_model,
+                "next_id": self.next_id,
+                "clusters": clusters
+            }
+            self._dirty = False
+            self._last_save = time.monotonic()
+            self._version += 1
+            version = self._version
+
+        payload = json.dumps(data).encode("utf-8")
+        with self._save_lock:
+            if version < self._written:
+                return False
+            _atomic_write(self.path, lambda f: f.write(payload))
+            self._written = version
+            self.stats["saves"] += 1
+        return True
+
+    def flush(self):
+        """Write pending changes now (call on shutdown)"""
+        return self._save(force=True)
+
+    def _prune(self):
+        pending = [c for c in self.clusters.values() if c["status"] == PENDING]
+        expired = time.time() - self.pending_ttl if self.pending_ttl else None
+        drop = [c for c in pending if expired is not None and c["seen_at"] < expired]
+        if self.max_pending is not None and len(pending) - len(drop) > self.max_pending:
+            dropped = {c["id"] for c in drop}
+            kept = [c for c in pending if c["id"] not in dropped]
+            # Asked once and long ago goes first
+            kept.sort(key=lambda c: (c["count"], c["seen_at"]))
+            drop += kept[:len(kept) - self.max_pending]
+        for cluster in drop:
+            del self.clusters[cluster["id"]]
+            del self.centroids[cluster["id"]]
+        self.stats["pruned"] += len(drop)
+
+    def _rebuild_index(self):
+        ids = [cid for cid, cluster in self.clusters.items() if cluster["status"] == PROMOTED]
+        if not ids:
+            self.index = None
+            return
+        vectors = np.stack([self.centroids[cid] for cid in ids]).astype("float32")
+        self.index = build_index("flat", vectors, np.asarray(ids, dtype="int64"))
+
+    def _nearest(self, vec):
+        if not self.centroids:
+            return None, None
+        ids = list(self.centroids)
+        centroids = np.stack([self.centroids[cid] for cid in ids])
+        distances = ((centroids - vec) ** 2).sum(axis=1)
+        best = int(np.argmin(distances))
+        return ids[best], float(distances[best])
+
+    def lookup(self, query_vec):
+        """Promoted answer for a query vector, or None"""
+        index = self.index
+        if index is None or query_vec is None:
+            return None
+        vec = normalize(np.asarray(query_vec, dtype="float32").reshape(1, -1))
+        distances, ids = index.search(vec, 1)
+        if ids[0, 0] < 0 or distances[0, 0] > self.distance:
+            return None
+        with self._lock:
+            cluster = self.clusters.get(int(ids[0, 0]))
+            if cluster is None or cluster["status"] != PROMOTED:
+                return None
+            cluster["hits"] = cluster.get("hits", 0) + 1
+            self.stats["hits"] += 1
+            return cluster["answer"]
+
+    def record(self, query, query_vec, answer):
+        """
+        Count an LLM answer towards its query cluster, promoting the cluster
+        (or queueing it for review) once it reaches min_count
+        :return: The cluster dict
+        """
+        vec = normalize(np.asarray(query_vec, dtype="float32").reshape(1, -1))[0]
+        now = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self._lock:
+            self.stats["recorded"] += 1
+            cid, dist = self._nearest(vec)
+            if cid is None or dist > self.distance:
+                cid = self.next_id
+                self.next_id += 1
+                self.clusters[cid] = {
+                    "id": cid, "count": 0, "hits": 0, "status": PENDING,
+                    "queries": [], "answer": answer, "first_seen": now
+                }
+                self.centroids[cid] = vec
+
+            cluster = self.clusters[cid]
+            if cluster["status"] == PENDING:
+                # Running mean keeps the centroid in the middle of the phrasings seen so far
+                centroid = self.centroids[cid] + (vec - self.centroids[cid]) / (cluster["count"] + 1)
+                self.centroids[cid] = normalize(centroid.reshape(1, -1))[0]
+                cluster["answer"] = answer
+            changed = self._count(cluster, query)
+            cluster = dict(cluster)
+        self._save(force=changed)
+        return cluster
+    
+    def record_hit(self, cluster_id, query):
+        """
+        Count a repeat that the answer cache served with this cluster's LLM answer
+        :return: The cluster dict, or None if the cluster is gone
+        """
+        with self._lock:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                return None
+            self.stats["cache_repeats"] += 1
+            changed = self._count(cluster, query)
+            cluster = dict(cluster)
+        self._save(force=changed)
+        return cluster
+    
+    def _count(self, cluster, query):
+        """:return: True when the cluster left PENDING (promoted or queued for review)"""
+        cluster["count"] += 1
+        cluster["seen_at"] = time.time()
+        cluster["last_seen"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        if query not in cluster["queries"] and len(cluster["queries"]) < MAX_SAMPLES:
+            cluster["queries"].append(query)
+        self._dirty = True
+        if cluster["status"] == PENDING and cluster["count"] >= self.min_count:
+            if self.review:
+                cluster["status"] = REVIEW
+            else:
+                self._promote(cluster)
+            return True
+        return False
+
+    def _promote(self, cluster, answer=None):
+        if answer:
+            cluster["answer"] = answer
+        cluster["status"] = PROMOTED
+        cluster["promoted_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self.stats["promotions"] += 1
+        self._rebuild_index()
+        log.info("🎓 Promoted learned answer",
+                 extra={"cluster": cluster["id"], "count": cluster["count"], "query": cluster["queries"][0]})
+
+    def review_queue(self):
+        """Clusters waiting for approval, most asked first"""
+        with self._lock:
+            queue = [dict(c) for c in self.clusters.values() if c["status"] == REVIEW]
+        return sorted(queue, key=lambda c: c["count"], reverse=True)
+
+    def approve(self, cluster_id, answer=None):
+        """
+        Promote a cluster waiting for review, optionally replacing its answer text
+        :return: The cluster dict, or None if there is no such cluster
+        :raises ValueError: if the cluster isn't waiting for review
+        """
+        with self._lock:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                return None
+            if cluster["status"] != REVIEW:
+                raise ValueError(f"Cluster {cluster_id} is {cluster['status']}; only clusters in review can be approved")
+            self._promote(cluster, answer)
+            self._dirty = True
+            cluster = dict(cluster)
+        self._save(force=True)
+        return cluster
+
+    def reject(self, cluster_id):
+        """
+        Never promote a cluster (and withdraw it if it was promoted)
+        :return: The cluster dict, or None if there is no such cluster
+        """
+        with self._lock:
+            cluster = self.clusters.get(cluster_id)
+            if cluster is None:
+                return None
+            was_promoted = cluster["status"] == PROMOTED
+            cluster["status"] = REJECTED
+            if was_promoted:
+                self._rebuild_index()
+            self._dirty = True
+            cluster = dict(cluster)
+        self._save(force=True)
+        return cluster
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+            statuses = [c["status"] for c in self.clusters.values()]
+        stats["clusters"] = len(statuses)
+        for status in (PENDING, REVIEW, PROMOTED, REJECTED):
+            stats[status] = statuses.count(status)
+        return stats
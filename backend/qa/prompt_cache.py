@@ -0,0 +1,77 @@
+"""
+System-prompt KV-cache reuse for llama.cpp
+The fixed prompt prefix is evaluated once and its llama.cpp state snapshotted;
+every request restores the snapshot so only the question part is prefilled
+(Llama.generate skips tokens that already match the restored input ids)
+"""
+import logging
+import time
+import hashlib
+
+log = logging.getLogger(__name__)
+
+
+def common_prefix_length(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PromptPrefixCache:
+    def __init__(self, llm):
+        """
+        :param llm: llama_cpp.Llama instance; callers serialize access to it
+        """
+        self.llm = llm
+        self.prefix = None
+        self.key = None
+        self.tokens = []
+        self.state = None
+        self.stats = {
+            "builds": 0, "hits": 0, "prefix_tokens": 0, "build_ms": 0.0,
+            "prefill_tokens_total": 0, "prefill_tokens_saved": 0
+        }
+
+    @staticmethod
+    def fingerprint(prefix):
+        return hashlib.sha1(prefix.encode("utf-8")).hexdigest()[:12]
+
+    def prepare(self, prefix):
+        """Evaluate and snapshot the prefix, rebuilding only when its text changed"""
+        key = self.fingerprint(prefix)
+        if key == self.key:
+            return
+        start = time.perf_counter()
+        tokens = self.llm.tokenize(prefix.encode("utf-8"))
+        self.llm.reset()
+        self.llm.eval(tokens)
+        self.state = self.llm.save_state()
+        self.prefix, self.key, self.tokens = prefix, key, tokens
+        self.stats["builds"] += 1
+        self.stats["prefix_tokens"] = len(tokens)
+        self.stats["build_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        log.info("🧠 Prompt prefix cached", extra={"tokens": len(tokens), "ms": self.stats["build_ms"], "key": key})
+
+    def restore(self, prefix, prompt):
+        """
+        Load the prefix state right before generating `prompt`
+        :return: number of prompt tokens that will not be prefilled
+        """
+        self.prepare(prefix)
+        self.llm.load_state(self.state)
+        prompt_tokens = self.llm.tokenize(prompt.encode("utf-8"))
+        # Llama.generate always re-evaluates at least the last prompt token
+        saved = min(common_prefix_length(self.tokens, prompt_tokens), len(prompt_tokens) - 1)
+        self.stats["hits"] += 1
+        self.stats["prefill_tokens_total"] += len(prompt_tokens)
+        self.stats["prefill_tokens_saved"] += max(saved, 0)
+        return max(saved, 0)
+
+    def get_stats(self):
+        stats = dict(self.stats, key=self.key)
+        total = stats["prefill_tokens_total"]
+        stats["saved_ratio"] = round(stats["prefill_tokens_saved"] / total, 3) if total else 0.0
+        return stats
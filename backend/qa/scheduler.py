@@ -0,0 +1,184 @@
+"""
+LLM inference scheduler
+A bounded priority queue feeding worker threads that each own a model
+instance. Jobs carry a deadline and a cancel flag, both checked between
+generated tokens, and a full queue is rejected immediately
+"""
+import time
+import queue
+import itertools
+import threading
+
+class SchedulerBusy(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class JobExpired(SchedulerBusy):
+    pass
+
+
+class InferenceJob:
+    _DONE = object()
+
+    def __init__(self, payload, priority, deadline, grace=5.0):
+        self.payload = payload
+        self.priority = priority
+        self.deadline = deadline
+        self.grace = grace
+        self.created = time.monotonic()
+        self.started = None
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self._out = queue.Queue()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def expired(self):
+        return time.monotonic() > self.deadline
+
+    def stream(self):
+        """Yield generated pieces; closing the generator cancels the job"""
+        try:
+            while True:
+                remaining = self.deadline + self.grace - time.monotonic()
+                try:
+                    item = self._out.get(timeout=max(remaining, 0.01))
+                except queue.Empty:
+                    raise JobExpired("LLM request timed out", retry_after=1)
+                if item is self._DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not self.finished.is_set():
+                self.cancel()
+
+    def result(self):
+        return "".join(self.stream())
+
+
+class InferenceScheduler:
+    def __init__(self, run_job, contexts, max_queue=8, name="llm"):
+        """
+        :param run_job: Callable (context, payload) -> iterator of text pieces
+        :param contexts: One per worker, e.g. the model instance that worker owns
+        :param max_queue: Max jobs waiting; further submits raise SchedulerBusy
+        """
+        self.run_job = run_job
+        self.workers = len(contexts)
+        self._queue = queue.PriorityQueue(maxsize=max_queue)
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {
+            "submitted": 0, "completed": 0, "rejected": 0, "expired": 0, "cancelled": 0,
+            "errors": 0, "runs": 0, "busy_workers": 0, "total_run_seconds": 0.0, "total_wait_seconds": 0.0
+        }
+        self._threads = [
+            threading.Thread(target=self._run, args=(context,), name=f"{name}-{i}", daemon=True)
+            for i, context in enumerate(contexts)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _count(self, key, value=1):
+        with self._lock:
+            self.stats[key] += value
+
+    def retry_after(self):
+        """Seconds until a queued job would likely start, from the average job time"""
+        with self._lock:
+            runs = self.stats["runs"]
+            avg = self.stats["total_run_seconds"] / runs if runs else 5.0
+        return max(1, int(avg * (self._queue.qsize() + 1) / self.workers + 0.5))
+
+    def submit(self, payload, priority=0, timeout=60):
+        """
+        Queue a job without waiting for it to run
+        :param priority: Lower runs first; equal priorities run in submit order
+        :param timeout: Seconds from now after which the job is dropped or cut short
+        :raises SchedulerBusy: when the queue is full
+        """
+        if self._closed:
+            raise SchedulerBusy("The assistant is shutting down.", self.retry_after())
+        job = InferenceJob(payload, priority, time.monotonic() + timeout)
+        try:
+            self._queue.put_nowait((priority, next(self._seq), job))
+        except queue.Full:
+            self._count("rejected")
+            raise SchedulerBusy("The assistant is busy. Please try again shortly.", self.retry_after())
+        self._count("submitted")
+        return job
+
+    def _run(self, context):
+        while True:
+            _, _, job = self._queue.get()
+            if job.cancelled.is_set():
+                self._finish(job, "cancelled")
+                continue
+            if job.expired():
+                self._finish(job, "expired", JobExpired("LLM request expired in the queue", self.retry_after()))
+                continue
+
+            job.started = time.monotonic()
+            self._count("busy_workers")
+            outcome = "completed"
+            pieces = None
+            try:
+                pieces = self.run_job(context, job.payload)
+                for piece in pieces:
+                    job._out.put(piece)
+                    if job.cancelled.is_set():
+                        outcome = "cancelled"
+                        break
+                    if job.expired():
+                        outcome = "expired"
+                        break
+                self._finish(job, outcome)
+            except Exception as e:
+                self._finish(job, "errors", e)
+            finally:
+                close = getattr(pieces, "close", None)
+                if close:
+                    close()
+                self._count("busy_workers", -1)
+
+    def _finish(self, job, outcome, error=None):
+        now = time.monotonic()
+        with self._lock:
+            self.stats[outcome] += 1
+            if job.started is not None:
+                self.stats["runs"] += 1
+                self.stats["total_wait_seconds"] += job.started - job.created
+                self.stats["total_run_seconds"] += now - job.started
+        job.finished.set()
+        job._out.put(error if error is not None else job._DONE)
+
+    def close(self, timeout=30):
+        """
+        Stop accepting jobs and wait for queued and running ones to finish
+        :return: True if everything drained within timeout
+        """
+        self._closed = True
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                busy = self.stats["busy_workers"]
+            if not busy and self._queue.empty():
+                return True
+            time.sleep(0.05)
+        return False
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        runs = stats["runs"]
+        stats["avg_run_seconds"] = round(stats.pop("total_run_seconds") / runs, 3) if runs else 0.0
+        stats["avg_wait_seconds"] = round(stats.pop("total_wait_seconds") / runs, 3) if runs else 0.0
+        stats["pending"] = self._queue.qsize()
+        stats["workers"] = self.workers
+        return stats
@@ -0,0 +1,117 @@
+"""
+Speech-to-text backends
+Audio is decoded from in-memory buffers to 16 kHz mono PCM; offline models
+are loaded once and reused for every utterance
+"""
+import io
+import json
+import time
+import wave
+
+import numpy as np
+
+
+def decode_audio(data, sample_rate=16000):
+    """
+    Decode an uploaded audio buffer to 16-bit mono PCM at sample_rate
+    
+    :param data: Raw bytes of a WAV/MP3/OGG/WEBM/... upload
+    :return: PCM bytes
+    """
+    try:
+        with wave.open(io.BytesIO(data), "rb") as wav:
+            if wav.getsampwidth() != 2:
+                raise wave.Error("not 16-bit")
+            rate, channels = wav.getframerate(), wav.getnchannels()
+            samples = np.frombuffer(wav.readframes(wav.getnframes()), dtype=np.int16)
+    except (wave.Error, EOFError):
+        # Compressed formats go through pydub/ffmpeg, still without touching disk
+        from pydub import AudioSegment
+        segment = AudioSegment.from_file(io.BytesIO(data))
+        segment = segment.set_frame_rate(sample_rate).set_channels(1).set_sample_width(2)
+        return segment.raw_data
+    
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    if rate != sample_rate and len(samples):
+        positions = np.linspace(0, len(samples) - 1, int(len(samples) * sample_rate / rate))
+        samples = np.interp(positions, np.arange(len(samples)), samples)
+    return samples.astype(np.int16).tobytes()
+
+
+class VoskRecognizer:
+    name = "vosk"
+    
+    def __init__(self, model_path, sample_rate=16000):
+        from vosk import Model, SetLogLevel
+        SetLogLevel(-1)
+        self.model = Model(model_path)
+        self.sample_rate = sample_rate
+    
+    def transcribe_pcm(self, pcm):
+        from vosk import KaldiRecognizer
+        recognizer = KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get("text", "")
+
+
+class WhisperCppRecognizer:
+    name = "whisper_cpp"
+    
+    def __init__(self, model_path, sample_rate=16000):
+        from pywhispercpp.model import Model
+        self.model = Model(model_path, print_progress=False, print_realtime=False)
+        self.sample_rate = sample_rate
+    
+    def transcribe_pcm(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        segments = self.model.transcribe(samples)
+        return " ".join(segment.text.strip() for segment in segments)
+
+
+class GoogleRecognizer:
+    """Online fallback through speech_recognition's Google web API"""
+    name = "google"
+    
+    def __init__(self, model_path=None, sample_rate=16000):
+        import speech_recognition as sr
+        self.sr = sr
+        self.recognizer = sr.Recognizer()
+        self.sample_rate = sample_rate
+    
+    def transcribe_pcm(self, pcm):
+        try:
+            return self.recognizer.recognize_google(self.sr.AudioData(pcm, self.sample_rate, 2))
+        except self.sr.UnknownValueError:
+            return ""
+
+
+STT_BACKENDS = {
+    VoskRecognizer.name: VoskRecognizer,
+    WhisperCppRecognizer.name: WhisperCppRecognizer,
+    GoogleRecognizer.name: GoogleRecognizer,
+}
+
+
+class SpeechToText:
+    def __init__(self, backend, model_path, sample_rate=16000):
+        """
+        :param backend: One of STT_BACKENDS ("vosk", "whisper_cpp", "google")
+        :param model_path: Model directory/file for offline backends
+        """
+        if backend not in STT_BACKENDS:
+            raise ValueError(f"Unknown STT backend '{backend}'")
+        self.sample_rate = sample_rate
+        self.recognizer = STT_BACKENDS[backend](model_path, sample_rate)
+        self.backend = backend
+    
+    def transcribe(self, data):
+        """
+        Transcribe an uploaded audio buffer
+        :return: (text or None, latency in ms)
+        """
+        start = time.perf_counter()
+        pcm = decode_audio(data, self.sample_rate)
+        text = self.recognizer.transcribe_pcm(pcm).strip()
+        latency_ms = (time.perf_counter() - start) * 1000
+        return (text or None), latency_ms
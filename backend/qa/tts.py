@@ -0,0 +1,152 @@
+"""
+Sentence-pipelined text-to-speech
+Cuts a token stream at sentence boundaries and synthesizes each sentence
+while the next one is still being generated
+"""
+import io
+import logging
+import re
+import json
+import wave
+import queue
+import struct
+import threading
+
+log = logging.getLogger(__name__)
+
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+ABBREVIATIONS = {"dr", "mr", "mrs", "ms", "prof", "st", "no", "e.g", "i.e", "etc", "vs", "a.m", "p.m"}
+
+
+def sentence_ends(text, min_chars=12):
+    """
+    End offsets of the complete sentences in text
+    A sentence only counts once whitespace follows its terminator, so an
+    unfinished tail (or a streamed "3." that may become "3.5") is not included
+    """
+    ends = []
+    start = 0
+    for match in SENTENCE_END.finditer(text):
+        end = match.end()
+        words = text[start:match.start()].split()
+        last_word = words[-1].lower().rstrip(".") if words else ""
+        if last_word in ABBREVIATIONS or len(text[start:end].strip()) < min_chars:
+            continue
+        ends.append(end)
+        start = end
+    return ends
+
+
+def split_sentences(pieces, min_chars=12):
+    """
+    Group streamed text pieces into complete sentences
+    
+    :param pieces: Iterable of text fragments (LLM tokens or a whole answer)
+    :param min_chars: Sentences shorter than this are merged with the next one
+    :return: Generator of sentence strings
+    """
+    buffer = ""
+    for piece in pieces:
+        buffer += piece
+        start = 0
+        for end in sentence_ends(buffer, min_chars):
+            yield buffer[start:end].strip()
+            start = end
+        buffer = buffer[start:]
+    
+    if buffer.strip():
+        yield buffer.strip()
+
+
+def wav_stream_header(sample_rate, channels=1, sample_width=2):
+    """WAV header with open-ended sizes so PCM can be streamed after it"""
+    byte_rate = sample_rate * channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                                channels * sample_width, sample_width * 8)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+
+def wav_bytes(pcm, sample_rate):
+    """Wrap raw 16-bit mono PCM in a complete WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def voice_sample_rate(model_path, default=22050):
+    """Read the sample rate from a piper voice's .onnx.json config"""
+    try:
+        with open(model_path + ".json", "r", encoding="utf-8") as f:
+            return json.load(f)["audio"]["sample_rate"]
+    except (OSError, KeyError, ValueError):
+        return default
+
+
+class SpeechPipeline:
+    _DONE = object()
+    
+    def __init__(self, synthesize, sample_rate, max_pending=8):
+        """
+        :param synthesize: Callable text -> raw 16-bit mono PCM bytes (or None on failure)
+        :param sample_rate: Sample rate of the PCM returned by synthesize
+        :param max_pending: Max generated sentences waiting for synthesis
+        """
+        self.synthesize = synthesize
+        self.sample_rate = sample_rate
+        self.max_pending = max_pending
+    
+    @staticmethod
+    def _put(pending, item, stop):
+        """Put item unless stop is set first; never blocks on a queue nobody drains"""
+        while not stop.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def _produce(self, sentences, pending, stop):
+        try:
+            for sentence in sentences:
+                if not self._put(pending, sentence, stop):
+                    break
+        except Exception:
+            log.exception("TTS pipeline error")
+        finally:
+            # Stops upstream generation (e.g. the LLM job) when the client went away
+            close = getattr(sentences, "close", None)
+            if close:
+                close()
+            # A consumer that stopped reading has set stop, so the thread still exits
+            self._put(pending, self._DONE, stop)
+    
+    def stream(self, sentences):
+        """
+        Yield a WAV header followed by PCM chunks, one per sentence
+        Generation runs in a background thread so sentence N+1 is produced
+        while sentence N is being synthesized
+        """
+        pending = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        producer = threading.Thread(target=self._produce, args=(sentences, pending, stop), daemon=True)
+        producer.start()
+        
+        try:
+            yield wav_stream_header(self.sample_rate)
+            while True:
+                sentence = pending.get()
+                if sentence is self._DONE:
+                    break
+                pcm = self.synthesize(sentence)
+                if pcm:
+                    yield pcm
+        finally:
+            stop.set()
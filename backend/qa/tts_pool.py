@@ -0,0 +1,260 @@
+"""
+Persistent piper TTS worker pool
+Each worker is a long-lived process that keeps the voice model loaded and
+returns raw PCM over its stdin/stdout pipes, so no request touches a shared
+temp file
+
+The worker side runs this file as a script, so it only needs the stdlib
+(and piper-tts, when installed)
+"""
+import logging
+import os
+import sys
+import queue
+import select
+import struct
+import threading
+import subprocess
+
+log = logging.getLogger(__name__)
+
+# Frame = 1 byte type + 4 byte big-endian length + payload
+SYNTH, PING, QUIT = b"S", b"P", b"Q"
+READY, OK, PONG, ERROR = b"R", b"O", b"G", b"E"
+
+
+def _write_frame(stream, kind, payload=b""):
+    stream.write(kind + struct.pack(">I", len(payload)) + payload)
+    stream.flush()
+
+
+def _read_exact(stream, size):
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise EOFError("TTS worker pipe closed")
+        data += chunk
+    return data
+
+
+def _read_frame(stream):
+    header = _read_exact(stream, 5)
+    size = struct.unpack(">I", header[1:])[0]
+    return header[:1], _read_exact(stream, size)
+
+
+# -------------------------------------------------------
+# WORKER PROCESS
+# -------------------------------------------------------
+def _load_voice(model_path):
+    """Load the piper voice once, or fall back to the CLI if piper-tts isn't importable"""
+    try:
+        from piper.voice import PiperVoice
+        return PiperVoice.load(model_path)
+    except ImportError:
+        return None
+
+
+def _synthesize(voice, model_path, text):
+    if voice is None:
+        p = subprocess.run(
+            ["piper", "--model", model_path, "--output-raw"],
+            input=text.encode(), capture_output=True, timeout=30
+        )
+        if p.returncode != 0:
+            raise RuntimeError(p.stderr.decode())
+        return p.stdout
+    
+    if hasattr(voice, "synthesize_stream_raw"):
+        return b"".join(voice.synthesize_stream_raw(text))
+    return b"".join(chunk.audio_int16_bytes for chunk in voice.synthesize(text))
+
+
+def _worker_main(model_path):
+    stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+    try:
+        voice = _load_voice(model_path)
+    except Exception as e:
+        _write_frame(stdout, ERROR, f"voice load failed: {e}".encode())
+        return
+    _write_frame(stdout, READY, b"1" if voice is not None else b"0")
+    
+    while True:
+        try:
+            kind, payload = _read_frame(stdin)
+        except EOFError:
+            break
+        
+        if kind == QUIT:
+            break
+        if kind == PING:
+            _write_frame(stdout, PONG)
+            continue
+        try:
+            _write_frame(stdout, OK, _synthesize(voice, model_path, payload.decode()))
+        except Exception as e:
+            _write_frame(stdout, ERROR, str(e).encode())
+
+
+# -------------------------------------------------------
+# POOL (API PROCESS)
+# -------------------------------------------------------
+class TTSWorker:
+    def __init__(self, model_path, worker_id):
+        self.model_path = model_path
+        self.worker_id = worker_id
+        self.process = None
+        self.restarts = -1
+        self.resident_model = False
+    
+    def start(self, timeout=60):
+        self.stop()
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.model_path],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE
+        )
+        self.restarts += 1
+        
+        kind, payload = self._receive(timeout)
+        if kind != READY:
+            raise RuntimeError(payload.decode())
+        self.resident_model = payload == b"1"
+    
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            _write_frame(self.process.stdin, QUIT)
+        except (OSError, ValueError):
+            pass
+        try:
+            self.process.wait(timeout=2)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+    
+    def _receive(self, timeout):
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise TimeoutError(f"TTS worker {self.worker_id} timed out")
+        return _read_frame(self.process.stdout)
+    
+    def request(self, kind, payload, timeout):
+        if self.process is None:
+            raise EOFError(f"TTS worker {self.worker_id} is stopped")
+        _write_frame(self.process.stdin, kind, payload)
+        return self._receive(timeout)
+    
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+
+class TTSWorkerPool:
+    def __init__(self, model_path, size=2, timeout=30, health_interval=30):
+        """
+        :param model_path: Piper .onnx voice model
+        :param size: Number of worker processes
+        :param timeout: Seconds to wait for one synthesis
+        :param health_interval: Seconds between health checks of idle workers
+        """
+        self.model_path = model_path
+        self.size = size
+        self.timeout = timeout
+        self.health_interval = health_interval
+        self.workers = []
+        self._idle = queue.Queue()
+        self._stop = threading.Event()
+        self._health_thread = None
+    
+    def start(self):
+        for i in range(self.size):
+            worker = TTSWorker(self.model_path, i)
+            worker.start()
+            self.workers.append(worker)
+            self._idle.put(worker)
+        
+        self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+        self._health_thread.start()
+        return self
+    
+    def _restart(self, worker):
+        if self._stop.is_set():
+            return
+        log.warning("♻️  Restarting TTS worker", extra={"worker": worker.worker_id})
+        try:
+            worker.start()
+        except Exception:
+            log.exception("TTS worker restart failed", extra={"worker": worker.worker_id})
+    
+    def synthesize(self, text):
+        """Return raw 16-bit mono PCM for text, or None on failure"""
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            log.error("TTS error: no free worker")
+            return None
+        
+        try:
+            for attempt in range(2):
+                if not worker.is_alive():
+                    self._restart(worker)
+                try:
+                    kind, payload = worker.request(SYNTH, text.encode(), self.timeout)
+                except (EOFError, OSError, TimeoutError) as e:
+                    log.warning("TTS worker failed", extra={"worker": worker.worker_id, "error": str(e)})
+                    self._restart(worker)
+                    continue
+                if kind == OK:
+                    return payload
+                log.error("TTS error", extra={"error": payload.decode()})
+                return None
+            return None
+        finally:
+            self._idle.put(worker)
+    
+    def check_health(self):
+        """
+        Ping the idle workers one at a time and restart the ones that don't
+        answer; only the worker being checked is out of the pool, so
+        synthesize keeps using the others meanwhile
+        """
+        checked = set()
+        for _ in range(len(self.workers)):
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            if worker.worker_id in checked:
+                # Went round the pool once already
+                self._idle.put(worker)
+                return
+            checked.add(worker.worker_id)
+            try:
+                healthy = worker.is_alive() and worker.request(PING, b"", 5)[0] == PONG
+            except (EOFError, OSError, TimeoutError):
+                healthy = False
+            if not healthy:
+                self._restart(worker)
+            self._idle.put(worker)
+    
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+    
+    def status(self):
+        return [
+            {"id": w.worker_id, "alive": w.is_alive(), "restarts": w.restarts, "resident_model": w.resident_model}
+            for w in self.workers
+        ]
+    
+    def close(self):
+        self._stop.set()
+        for worker in self.workers:
+            worker.stop()
+        self.workers = []
+
+
+if __name__ == "__main__":
+    _worker_main(sys.argv[1])
@@ -1,190 +1,833 @@
 """
 QA Engine - Handles Knowledge Base, FAISS Search, LLM, and TTS
 """
+import gc
 import os
 import json
-import subprocess
-import traceback
+import time
+import logging
+import atexit
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-from llama_cpp import Llama
-import speech_recognition as sr
-from pydub import AudioSegment
 
 from config import (
-    MODEL_PATH, LLM_CTX, LLM_MAX_TOKENS, LLM_TEMPERATURE,
-    FAISS_L2_THRESHOLD, EMBED_MODEL, KB_PATH, FAISS_PATH,
-    TTS_MODEL, UPLOAD_FOLDER, ALLOWED_AUDIO_EXTENSIONS
+    MODEL_PATH, LLM_CTX, LLM_MAX_TOKENS, LLM_TEMPERATURE, LLM_PREFIX_CACHE, LLM_USE_MMAP, FAISS_MMAP,
+    LLM_WORKERS, LLM_QUEUE_MAX, LLM_JOB_DEADLINE, LLM_SHORT_QUERY_WORDS, LLM_BUDGETS, LLM_GEN_DEADLINE,
+    FAISS_L2_THRESHOLD, FAISS_USE_CALIBRATION, EMBED_MODEL, KB_PATH, FAQ_PATH, FACULTY_PATH, FAISS_PATH,
+    TTS_MODEL, UPLOAD_FOLDER, ALLOWED_AUDIO_EXTENSIONS,
+    CACHE_MAX_SIZE, CACHE_TTL_SECONDS, CACHE_SEMANTIC_SIZE, CACHE_SEMANTIC_DISTANCE,
+    TTS_PIPELINE_MAX_PENDING, TTS_POOL_SIZE, TTS_TIMEOUT, TTS_HEALTH_INTERVAL,
+    TTS_AUDIO_STORE, STT_BACKEND, STT_MODEL_PATH, STT_SAMPLE_RATE,
+    SEARCH_BATCH_MAX, SEARCH_BATCH_WAIT_MS,
+    HYBRID_CANDIDATES, HYBRID_LEXICAL_WEIGHT, BM25_K1, BM25_B, BM25_SATURATION,
+    FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS, EMBED_BACKEND, ONNX_EMBED_DIR, EMBED_THREADS,
+    PROMOTION_PATH, PROMOTION_MIN_COUNT, PROMOTION_DISTANCE, PROMOTION_REVIEW,
+    PROMOTION_SAVE_INTERVAL, PROMOTION_PENDING_TTL, PROMOTION_MAX_PENDING,
+    BATCH_MAX_QUESTIONS, BATCH_LLM_CONCURRENCY, DISTANCE_BUCKETS, TOKENS_PER_SECOND_BUCKETS,
+    METRICS_MULTIPROC_DIR, METRICS_SYNC_INTERVAL
 )
+from qa import (
+    AnswerCache, AnswerPromoter, AudioStore, GenerationStats, IndexStore, InferenceScheduler, LexicalIndex,
+    MetricsRegistry, MicroBatcher, PromptPrefixCache, SchedulerBusy, SpeechPipeline, SpeechToText, TTSWorkerPool,
+    create_embedder, embedder_id, generation_budget, load_documents, normalize_vectors, sentence_ends,
+    split_sentences, voice_sample_rate, wav_bytes
+)
+
+log = logging.getLogger(__name__)
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+REPHRASE_ANSWER = "Could you please rephrase your question?"
+LLM_ERROR_ANSWER = "I'm having trouble processing that. Please try again."
+
+SYSTEM_PROMPT = "You are a helpful AI assistant at COMSATS University Sahiwal. Answer naturally in 2-3 sentences."
+PROMPT_TEMPLATE = """{system}
+
+Question: {query}
+Answer:"""
+
+# Startup stages reported by /health; "index" needs "embedder" and "kb"
+STAGES = ("embedder", "kb", "index", "llm", "tts", "stt")
+REQUIRED_STAGES = ("embedder", "kb", "index", "llm")
+
+
+class KnowledgeState:
+    """
+    KB documents together with everything built from them: FAISS index, vector
+    ID -> position map, lexical index and threshold. A reload builds a new one
+    and swaps it in whole; a request reads self.kb once and keeps using that
+    """
+    def __init__(self, documents=(), index=None, id_to_pos=None, lexical=None, threshold=FAISS_L2_THRESHOLD):
+        self.documents = list(documents)
+        self.index = index
+        self.id_to_pos = np.empty(0, dtype="int64") if id_to_pos is None else id_to_pos
+        self.lexical = lexical if lexical is not None else LexicalIndex([])
+        self.threshold = threshold
+
+
+class WarmingUp(Exception):
+    """Raised when a request needs a stage that is still loading"""
+    def __init__(self, stage):
+        super().__init__(f"The assistant is still warming up ({stage} loading). Please try again shortly.")
+        self.stage = stage
+
 
 class QAEngine:
     def __init__(self):
         self.embedder = None
         self.llm = None
-        self.knowledge_base = []
-        self.faiss_index = None
+        self.prefix_cache = None
+        self.llm_scheduler = None
+        self.generation_stats = GenerationStats()
+        self.kb = KnowledgeState()
+        self._reload_lock = threading.Lock()
+        self.index_store = IndexStore(
+            FAISS_PATH, embedder_id(EMBED_BACKEND, EMBED_MODEL), FAISS_INDEX_TYPE, FAISS_INDEX_PARAMS, mmap=FAISS_MMAP
+        )
+        self.lexical_hits = 0
+        self.promoter = AnswerPromoter(
+            PROMOTION_PATH, embedder_id(EMBED_BACKEND, EMBED_MODEL),
+            min_count=PROMOTION_MIN_COUNT, distance=PROMOTION_DISTANCE, review=PROMOTION_REVIEW,
+            save_interval=PROMOTION_SAVE_INTERVAL, pending_ttl=PROMOTION_PENDING_TTL,
+            max_pending=PROMOTION_MAX_PENDING
+        )
+        self.answer_cache = AnswerCache(
+            max_size=CACHE_MAX_SIZE,
+            ttl=CACHE_TTL_SECONDS,
+            semantic_size=CACHE_SEMANTIC_SIZE,
+            semantic_distance=CACHE_SEMANTIC_DISTANCE
+        )
+        self.tts_pool = None
+        self.audio_store = None
+        self.stt = None
+        self.search_batcher = MicroBatcher(
+            self._search_batch, max_batch=SEARCH_BATCH_MAX, max_wait_ms=SEARCH_BATCH_WAIT_MS, name="kb-search"
+        )
+        self.stages = {name: {"status": "pending"} for name in STAGES}
+        self._register_metrics()
+    
+    def _register_metrics(self):
+        """Metrics for GET /metrics; component stats are read at scrape time"""
+        self.metrics = m = MetricsRegistry(METRICS_MULTIPROC_DIR, METRICS_SYNC_INTERVAL)
+        self.stage_seconds = m.histogram(
+            "qa_stage_seconds", "Time spent in each pipeline stage", ["stage"]
+        )
+        self.answers_total = m.counter(
+            "qa_answers_total", "Answers by source (knowledge_base, learned, llm, cache)", ["source"]
+        )
+        self.top1_distance = m.histogram(
+            "qa_top1_distance", "Fused distance of the best KB candidate per searched query",
+            buckets=DISTANCE_BUCKETS
+        )
+        self.llm_tokens = m.counter("qa_llm_tokens_total", "Tokens generated by the LLM")
+        self.llm_tokens_per_second = m.histogram(
+            "qa_llm_tokens_per_second", "Decode speed of each LLM generation", buckets=TOKENS_PER_SECOND_BUCKETS
+        )
+        m.counter(
+            "qa_llm_jobs_total", "LLM jobs by outcome", ["outcome"],
+            fn=lambda: {(outcome,): self.llm_scheduler.stats[outcome] for outcome in
+                        ("submitted", "rejected", "completed", "cancelled", "expired", "errors")}
+        )
+        m.gauge("qa_llm_queue_depth", "LLM jobs waiting for a worker", fn=lambda: self.llm_scheduler.get_stats()["pending"])
+        m.gauge("qa_llm_busy_workers", "LLM workers generating", fn=lambda: self.llm_scheduler.stats["busy_workers"])
+        m.gauge("qa_search_queue_depth", "Queries waiting for the embedding micro-batcher",
+                fn=self.search_batcher.pending)
+        m.counter(
+            "qa_cache_lookups_total", "Answer cache lookups by result", ["result"],
+            fn=lambda: {(result,): self.answer_cache.get_stats()[key] for result, key in
+                        (("exact_hit", "exact_hits"), ("semantic_hit", "semantic_hits"), ("miss", "misses"))}
+        )
+        m.counter("qa_exact_kb_hits_total", "Questions answered by the verbatim KB match",
+                  fn=lambda: self.lexical_hits)
+        m.gauge("qa_stage_ready", "1 when a startup stage is ready", ["stage"],
+                fn=lambda: {(name,): int(stage["status"] == "ready") for name, stage in self.stages.items()})
+    
+    def render_metrics(self):
+        """Prometheus text exposition of every metric"""
+        return self.metrics.render()
     
     def initialize(self):
-        try:
-            print("=" * 60)
-            print("INITIALIZING Q&A ENGINE")
-            print("=" * 60)
-            
-            print("\n[1/4] Loading Sentence Transformer...")
-            self.embedder = SentenceTransformer(EMBED_MODEL)
-            print("✅ Embedding model loaded")
-            
-            print("\n[2/4] Loading Knowledge Base...")
-            self.knowledge_base = self._load_kb()
-            print(f"✅ Loaded {len(self.knowledge_base)} Q&A pairs")
-            
-            print("\n[3/4] Building FAISS Index...")
-            self.faiss_index = self._build_faiss_index()
-            print("✅ FAISS index ready")
-            
-            print("\n[4/4] Loading TinyLlama Model...")
-            if not os.path.exists(MODEL_PATH):
-                print(f"❌ ERROR: Model not found at {MODEL_PATH}")
-                return False
-            
-            self.llm = Llama(model_path=MODEL_PATH, n_ctx=LLM_CTX, n_threads=4, verbose=False)
-            print("✅ LLaMA model loaded")
-            
-            print("\n" + "=" * 60)
-            print("🤖 Q&A ENGINE READY!")
-            print(f"📊 KB Size: {len(self.knowledge_base)} | Threshold: {FAISS_L2_THRESHOLD}")
-            print("=" * 60)
-            return True
+        """
+        Load every stage, running independent loads concurrently
+        :return: True when all required stages (embedder, kb, index, llm) are ready
+        """
+        log.info("Initializing Q&A engine")
+        start = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=len(STAGES), thread_name_prefix="init") as pool:
+            embedder = pool.submit(self._run_stage, "embedder", self._load_embedder)
+            kb = pool.submit(self._run_stage, "kb", self._load_knowledge)
+            pool.submit(self._run_stage, "llm", self._load_llm)
+            pool.submit(self._run_stage, "tts", self._start_tts)
+            pool.submit(self._run_stage, "stt", self._load_stt)
             
+            if embedder.result() and kb.result():
+                self._run_stage("index", self._load_index)
+            else:
+                self._mark_stage("index", "failed", error="embedder or knowledge base unavailable")
+        
+        ready = all(self.is_ready(name) for name in REQUIRED_STAGES)
+        log.log(
+            logging.INFO if ready else logging.WARNING,
+            "🤖 Q&A engine ready" if ready else "⚠️  Q&A engine partially ready",
+            extra={"kb_size": len(self.kb.documents), "threshold": self.kb.threshold,
+                   "startup_seconds": round(time.perf_counter() - start, 1)}
+        )
+        return ready
+    
+    def preload(self):
+        """
+        Load the fork-safe, read-mostly stages in the server master before it
+        forks workers (gunicorn preload_app), so every worker shares those pages
+        copy-on-write. Each worker then calls start_background() for the rest:
+        the LLM (weights memory-mapped, so shared through the page cache), TTS and STT
+        """
+        log.info("📦 Preloading shared models in the master process")
+        self._run_stage("kb", self._load_knowledge)
+        # ONNX Runtime starts its thread pool when the session is created and
+        # those threads don't survive fork; that backend loads per worker
+        if EMBED_BACKEND != "onnx":
+            if self._run_stage("embedder", self._load_embedder) and self._run_stage("index", self._load_index):
+                # The index is mapped read-only and shared: this search faults its pages
+                # into the page cache once, before the fork, instead of in every worker
+                index = self.kb.index
+                if index is not None and index.ntotal:
+                    index.search(np.zeros((1, index.d), dtype="float32"), 1)
+        # Objects that live for the whole process shouldn't be touched by the
+        # collector in the workers, or their pages get copied
+        gc.freeze()
+    
+    def start_background(self):
+        """Run initialize() in a background thread so the API can serve while loading"""
+        self.metrics.start_sync()
+        thread = threading.Thread(target=self.initialize, name="qa-init", daemon=True)
+        thread.start()
+        return thread
+    
+    def shutdown(self, timeout=30):
+        """Drain the LLM queue, stop the TTS workers, write the learned-answer store and final metrics"""
+        drained = self.llm_scheduler.close(timeout) if self.llm_scheduler else True
+        if self.tts_pool:
+            self.tts_pool.close()
+        try:
+            self.promoter.flush()
+        except Exception:
+            log.exception("❌ Learned answers could not be saved")
+        self.metrics.close()
+        log.info("👋 Q&A engine stopped" + ("" if drained else " (LLM jobs still running were abandoned)"))
+        return drained
+    
+    def _mark_stage(self, name, status, **info):
+        self.stages[name] = {"status": status, **info}
+    
+    def _run_stage(self, name, load):
+        if self.is_ready(name):
+            return True  # loaded by preload() in the server master
+        self._mark_stage(name, "loading")
+        log.info("⏳ Loading stage", extra={"stage": name})
+        start = time.perf_counter()
+        try:
+            load()
         except Exception as e:
-            print(f"\n❌ INIT FAILED: {str(e)}")
-            traceback.print_exc()
+            log.exception("❌ Stage failed", extra={"stage": name})
+            self._mark_stage(name, "failed", error=str(e))
             return False
+        seconds = round(time.perf_counter() - start, 2)
+        self._mark_stage(name, "ready", seconds=seconds)
+        log.info("✅ Stage ready", extra={"stage": name, "seconds": seconds})
+        return True
+    
+    def is_ready(self, name):
+        return self.stages[name]["status"] == "ready"
+    
+    def readiness(self):
+        statuses = [stage["status"] for stage in self.stages.values()]
+        if all(status == "ready" for status in statuses):
+            overall = "ok"
+        elif any(status in ("pending", "loading") for status in statuses):
+            overall = "warming_up"
+        else:
+            overall = "degraded"
+        return overall, self.stages
+    
+    def health_report(self):
+        status, stages = self.readiness()
+        return {
+            "status": status,
+            "stages": stages,
+            "kb_size": len(self.kb.documents),
+            "cache": self.answer_cache.get_stats(),
+            "search_batching": self.search_batcher.get_stats(),
+            "exact_kb_hits": self.lexical_hits,
+            "kb_threshold": self.kb.threshold,
+            "tts_workers": self.tts_pool.status() if self.tts_pool else [],
+            "llm_prefix_cache": self.prefix_cache.get_stats() if self.prefix_cache else None,
+            "llm_scheduler": self.llm_scheduler.get_stats() if self.llm_scheduler else None,
+            "learned_answers": self.promoter.get_stats(),
+            "generation": self.generation_stats.get_stats()
+        }
+    
+    def _require(self, name):
+        if not self.is_ready(name):
+            if self.stages[name]["status"] in ("pending", "loading"):
+                raise WarmingUp(name)
+            raise RuntimeError(f"{name} unavailable: {self.stages[name].get('error', 'failed to load')}")
+    
+    def _load_embedder(self):
+        self.embedder = create_embedder(EMBED_BACKEND, EMBED_MODEL, ONNX_EMBED_DIR, EMBED_THREADS)
+    
+    @property
+    def knowledge_base(self):
+        return self.kb.documents
+    
+    def _load_knowledge(self):
+        self.kb = KnowledgeState(self._load_kb())
+        log.info("📚 Knowledge base loaded", extra={"kb_size": len(self.kb.documents)})
+    
+    def _load_index(self):
+        self.kb = self._build_kb_state(self.kb.documents)
+        learned = self.promoter.load()
+        if learned:
+            log.info("🎓 Learned answers loaded", extra={"clusters": learned})
+    
+    def _create_llm(self):
+        if not os.path.exists(MODEL_PATH):
+            raise FileNotFoundError(f"Model not found at {MODEL_PATH}")
+        from llama_cpp import Llama
+        return Llama(model_path=MODEL_PATH, n_ctx=LLM_CTX, n_threads=4, use_mmap=LLM_USE_MMAP, verbose=False)
+    
+    def _load_llm(self):
+        # Each scheduler worker owns its own model instance (and prefix cache)
+        contexts = []
+        for _ in range(max(LLM_WORKERS, 1)):
+            llm = self._create_llm()
+            prefix_cache = PromptPrefixCache(llm) if LLM_PREFIX_CACHE else None
+            if prefix_cache:
+                prefix_cache.prepare(self._prompt_prefix())
+            contexts.append((llm, prefix_cache))
+        self.llm, self.prefix_cache = contexts[0]
+        self.llm_scheduler = InferenceScheduler(self._run_llm_job, contexts, max_queue=LLM_QUEUE_MAX, name="llm")
+    
+    def _start_tts(self):
+        self.tts_pool = TTSWorkerPool(
+            TTS_MODEL, size=TTS_POOL_SIZE, timeout=TTS_TIMEOUT, health_interval=TTS_HEALTH_INTERVAL
+        ).start()
+        atexit.register(self.tts_pool.close)
+        self.audio_store = AudioStore(TTS_AUDIO_STORE, TTS_MODEL)
+    
+    def _load_stt(self):
+        self.stt = SpeechToText(STT_BACKEND, STT_MODEL_PATH, STT_SAMPLE_RATE)
     
     def _load_kb(self):
         if not os.path.exists(KB_PATH):
             default = [{"question": "What is your name?", "answer": "I am the campus assistant."}]
             with open(KB_PATH, "w", encoding="utf-8") as f:
                 json.dump(default, f, indent=2)
-            return default
         
-        with open(KB_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return load_documents(KB_PATH, FAQ_PATH, FACULTY_PATH)
+    
+    def _build_kb_state(self, documents, rebuild=False):
+        """
+        Sync the fingerprinted index with documents, re-embedding only new or
+        changed questions, and build the lexical index next to it
+        :return: KnowledgeState, not yet in use
+        """
+        lexical = LexicalIndex(documents, k1=BM25_K1, b=BM25_B, saturation=BM25_SATURATION)
+        if len(documents) == 0:
+            return KnowledgeState(documents, faiss.IndexIDMap2(faiss.IndexFlatL2(384)), lexical=lexical)
+        
+        index, id_to_pos, stats = self.index_store.sync(
+            [item["question"] for item in documents], self.embedder.encode, force=rebuild
+        )
+        log.info(
+            "Built new index" if stats["full_rebuild"] else "Loaded existing index",
+            extra={key: stats[key] for key in ("index_type", "reused", "embedded", "removed")}
+        )
+        threshold = self._kb_threshold(stats["calibration"], stats["index_type"])
+        return KnowledgeState(documents, index, id_to_pos, lexical, threshold)
     
-    def _build_faiss_index(self):
-        if len(self.knowledge_base) == 0:
-            return faiss.IndexFlatL2(384)
+    @staticmethod
+    def _kb_threshold(calibration, index_type):
+        """Calibrated threshold from the index manifest, else FAISS_L2_THRESHOLD"""
+        if not FAISS_USE_CALIBRATION or not calibration:
+            return FAISS_L2_THRESHOLD
+        calibrated_for = [calibration.get(key) for key in ("index_type", "lexical_weight", "bm25_saturation")]
+        if calibrated_for != [index_type, HYBRID_LEXICAL_WEIGHT, BM25_SATURATION]:
+            log.warning(
+                "⚠️  Calibrated threshold ignored: index type or lexical scoring changed, rerun calibrate_threshold.py",
+                extra={"calibrated_for": calibrated_for,
+                       "fallback": FAISS_L2_THRESHOLD}
+            )
+            return FAISS_L2_THRESHOLD
+        log.info("🎯 Using calibrated KB threshold", extra={"threshold": calibration["threshold"]})
+        return calibration["threshold"]
+    
+    def reload_kb(self):
+        """Reload the knowledge base from disk, sync the index and drop cached answers"""
+        self._require("index")
+        with self._reload_lock:
+            # Requests keep searching the old state until the new one is complete
+            self.kb = self._build_kb_state(self._load_kb())
+        self.answer_cache.clear()
+        log.info("🔄 Knowledge base reloaded", extra={"kb_size": len(self.kb.documents)})
+        return len(self.kb.documents)
+    
+    def _search_batch(self, queries):
+        """
+        One encode call and one FAISS search for a whole batch of queries
+        :return: (query_vec, distances, indexes, kb) per query; indexes are positions in kb.documents
+        """
+        kb = self.kb
+        with self.stage_seconds.time("embed"):
+            vectors = normalize_vectors(self.embedder.encode(queries, batch_size=len(queries)))
+        with self.stage_seconds.time("faiss_search"):
+            distances, ids = kb.index.search(vectors, HYBRID_CANDIDATES)
+        indexes = np.where(ids >= 0, kb.id_to_pos[np.maximum(ids, 0)], -1) if len(kb.id_to_pos) else ids
+        return [(vectors[i:i + 1], distances[i], indexes[i], kb) for i in range(len(queries))]
+    
+    def _embed_and_search(self, query):
+        """:return: (query_vec, distances, indexes, kb) via the micro-batcher"""
+        with self.stage_seconds.time("kb_search"):
+            return self.search_batcher.submit(query)
+    
+    def _match_kb(self, query, distances, indexes, kb):
+        """Fuse vector candidates with BM25 and apply the threshold to the fused distance"""
+        if len(kb.documents) == 0 or indexes[0] < 0:
+            return None, None
         
-        if os.path.exists(FAISS_PATH):
-            print("Loading existing index...")
-            return faiss.read_index(FAISS_PATH)
+        ranked = kb.lexical.fuse(query, distances, indexes, HYBRID_LEXICAL_WEIGHT)
+        best_idx, best_dist, _ = ranked[0]
+        hit = best_dist <= kb.threshold
+        self.top1_distance.observe(best_dist)
         
-        print("Building new index...")
-        vectors = self.embedder.encode([item["question"] for item in self.knowledge_base])
-        vectors = np.array(vectors).astype("float32")
+        if log.isEnabledFor(logging.DEBUG):
+            top = [{"question": kb.documents[idx]["question"][:50], "fused": round(float(fused), 3),
+                    "l2": round(float(dist), 3)} for idx, fused, dist in ranked[:3]]
+            log.debug("KB search", extra={"query": query, "top": top, "use": "kb" if hit else "llm"})
         
-        index = faiss.IndexFlatL2(vectors.shape[1])
-        index.add(vectors)
-        faiss.write_index(index, FAISS_PATH)
-        return index
+        if hit:
+            return kb.documents[best_idx]["answer"], best_dist
+        return None, best_dist
+    
+    def _exact_kb_match(self, query):
+        """Near-verbatim KB question: answered from the hash map without the embedder"""
+        kb = self.kb
+        pos = kb.lexical.exact_match(query)
+        if pos is None:
+            return None
+        self.lexical_hits += 1
+        log.debug("Exact KB match", extra={"query": query, "question": kb.documents[pos]["question"][:50]})
+        return kb.documents[pos]["answer"]
     
     def search_kb(self, query):
-        if len(self.knowledge_base) == 0:
+        if len(self.kb.documents) == 0:
             return None, None
         
+        exact = self._exact_kb_match(query)
+        if exact:
+            return exact, 0.0
+        
         try:
-            query_vec = self.embedder.encode([query]).astype("float32")
-            distances, indexes = self.faiss_index.search(query_vec, 3)
-            
-            best_idx = indexes[0][0]
-            best_dist = distances[0][0]
-            
-            print(f"\n🔍 Search: '{query}'")
-            for i in range(min(3, len(indexes[0]))):
-                idx = indexes[0][i]
-                dist = distances[0][i]
-                q = self.knowledge_base[idx]["question"][:50]
-                status = "✅" if dist <= FAISS_L2_THRESHOLD else "❌"
-                print(f"   {i+1}. [{dist:.3f}] {status} '{q}...'")
-            
-            if best_dist <= FAISS_L2_THRESHOLD:
-                print(f"📌 Using KB (dist={best_dist:.3f})")
-                return self.knowledge_base[best_idx]["answer"], best_dist
-            else:
-                print(f"🤖 Using LLM (dist={best_dist:.3f} > threshold)")
-                return None, best_dist
-                
-        except Exception as e:
-            print(f"Search error: {e}")
+            _, distances, indexes, kb = self._embed_and_search(query)
+            return self._match_kb(query, distances, indexes, kb)
+        except Exception:
+            log.exception("Search error")
             return None, None
     
+    def _build_prompt(self, query):
+        return PROMPT_TEMPLATE.format(system=SYSTEM_PROMPT, query=query)
+    
+    @staticmethod
+    def _prompt_prefix():
+        """Fixed part of the prompt, cut at the last newline so it tokenizes the same inside the full prompt"""
+        head = PROMPT_TEMPLATE.split("{query}")[0].format(system=SYSTEM_PROMPT)
+        return head[:head.rfind("\n") + 1]
+    
+    def _restore_prompt_prefix(self, llm, prefix_cache, prompt):
+        """Restore the cached system-prompt state on a worker's model"""
+        if prefix_cache is None:
+            return
+        try:
+            prefix_cache.restore(self._prompt_prefix(), prompt)
+        except Exception:
+            log.exception("Prompt cache error")
+            llm.reset()
+    
+    def _run_llm_job(self, context, payload):
+        """
+        Scheduler job: yield answer text pieces as llama.cpp generates them
+        Stops after the budget's sentence count or LLM_GEN_DEADLINE seconds
+        """
+        llm, prefix_cache = context
+        prompt, kind, budget, submitted = payload
+        self.stage_seconds.observe(time.perf_counter() - submitted, "llm_queue")
+        self._restore_prompt_prefix(llm, prefix_cache, prompt)
+        start = time.perf_counter()
+        first_token = None
+        tokens = 0
+        text = ""
+        stop_reason = "cancelled"
+        chunks = llm(
+            prompt,
+            max_tokens=budget["max_tokens"],
+            temperature=LLM_TEMPERATURE,
+            stop=["Question:", "\n\n\n"],
+            stream=True
+        )
+        try:
+            for chunk in chunks:
+                choice = chunk["choices"][0]
+                tokens += 1
+                if first_token is None:
+                    first_token = time.perf_counter()
+                    self.stage_seconds.observe(first_token - start, "llm_prefill")
+                piece = choice["text"]
+                if piece:
+                    text += piece
+                    ends = sentence_ends(text)
+                    if len(ends) >= budget["max_sentences"]:
+                        # The boundary shows up one token late (" Next"), keep only what precedes it
+                        keep = piece[:max(ends[budget["max_sentences"] - 1] - (len(text) - len(piece)), 0)]
+                        if keep:
+                            yield keep
+                        stop_reason = "sentences"
+                        break
+                    yield piece
+                if choice.get("finish_reason") == "length":
+                    stop_reason = "budget"
+                    break
+                if time.perf_counter() - start > LLM_GEN_DEADLINE:
+                    stop_reason = "deadline"
+                    break
+            else:
+                stop_reason = "natural"
+        finally:
+            close = getattr(chunks, "close", None)
+            if close:
+                close()
+            end = time.perf_counter()
+            self.generation_stats.record(kind, budget, tokens, end - start, stop_reason)
+            self.llm_tokens.inc(amount=tokens)
+            if first_token is not None and tokens > 1:
+                self.stage_seconds.observe(end - first_token, "llm_decode")
+                self.llm_tokens_per_second.observe((tokens - 1) / max(end - first_token, 1e-6))
+    
+    def _submit_llm(self, query, interactive=True):
+        """
+        Queue an LLM job; short and interactive requests run first
+        :raises SchedulerBusy: when the inference queue is full
+        """
+        self._require("llm")
+        priority = (0 if interactive else 2) + (0 if len(query.split()) <= LLM_SHORT_QUERY_WORDS else 1)
+        kind, budget = generation_budget(query, LLM_BUDGETS, LLM_MAX_TOKENS)
+        return self.llm_scheduler.submit(
+            (self._build_prompt(query), kind, budget, time.perf_counter()), priority=priority, timeout=LLM_JOB_DEADLINE
+        )
+    
     def generate_llm_answer(self, query):
+        job = self._submit_llm(query)
         try:
-            prompt = f"""You are a helpful AI assistant at COMSATS University Sahiwal. Answer naturally in 2-3 sentences.
-
-Question: {query}
-Answer:"""
-            
-            result = self.llm(
-                prompt,
-                max_tokens=LLM_MAX_TOKENS,
-                temperature=LLM_TEMPERATURE,
-                stop=["Question:", "\n\n\n"]
-            )
-            
-            text = result["choices"][0]["text"].strip()
-            return text if text and len(text) > 5 else "Could you please rephrase your question?"
-            
-        except Exception as e:
-            print(f"LLM error: {e}")
-            return "I'm having trouble processing that. Please try again."
+            text = job.result().strip()
+            return text if text and len(text) > 5 else REPHRASE_ANSWER
+        except SchedulerBusy:
+            raise
+        except Exception:
+            log.exception("LLM error")
+            return LLM_ERROR_ANSWER
     
-    def get_answer(self, query):
-        kb_answer, distance = self.search_kb(query)
+    def stream_llm_answer(self, query):
+        """
+        Queue the LLM job now and return a generator of its text pieces
+        Closing the generator (e.g. the client disconnected) cancels generation
+        """
+        return self._llm_pieces(self._submit_llm(query))
+    
+    @staticmethod
+    def _llm_pieces(job):
+        try:
+            yield from job.stream()
+        except SchedulerBusy:
+            raise
+        except Exception:
+            log.exception("LLM error")
+            yield LLM_ERROR_ANSWER
+    
+    def _retrieve(self, query):
+        """
+        Cache and KB lookup
+        :return: (answer, source, query_vec), answer is None when the LLM is needed
+        """
+        cached = self._retrieve_cached(query)
+        if cached:
+            return cached
         
+        try:
+            query_vec, distances, indexes, kb = self._embed_and_search(query)
+        except Exception:
+            log.exception("Search error")
+            self.answer_cache.record_miss()
+            self.answers_total.inc("llm")
+            return None, "llm", None
+        return self._retrieve_searched(query, query_vec, distances, indexes, kb)[:3]
+    
+    def _retrieve_cached(self, query):
+        """Exact cache and verbatim KB lookups, which need no embedding"""
+        cached = self.answer_cache.get(query)
+        if cached:
+            self._count_cache_hit(query, cached)
+            return cached[0], cached[1], None
+        
+        self._require("index")
+        exact = self._exact_kb_match(query)
+        if exact:
+            self.answers_total.inc("knowledge_base")
+            self.answer_cache.record_miss()
+            self.answer_cache.put(query, exact, "knowledge_base")
+            return exact, "knowledge_base", None
+        return None
+    
+    def _retrieve_searched(self, query, query_vec, distances, indexes, kb):
+        """
+        Semantic cache, KB threshold and learned answers for an embedded query
+        :return: (answer, source, query_vec, distance)
+        """
+        cached = self.answer_cache.get_semantic(query_vec)
+        if cached:
+            self._count_cache_hit(query, cached)
+            answer, source, cluster_id = cached
+            self.answer_cache.put(query, answer, source, tag=cluster_id)
+            return answer, source, query_vec, None
+        
+        self.answer_cache.record_miss()
+        kb_answer, distance = self._match_kb(query, distances, indexes, kb)
         if kb_answer:
-            return kb_answer, "knowledge_base"
+            self.answers_total.inc("knowledge_base")
+            self.answer_cache.put(query, kb_answer, "knowledge_base", query_vec)
+            return kb_answer, "knowledge_base", query_vec, distance
+        
+        learned = self.promoter.lookup(query_vec)
+        if learned:
+            log.debug("Learned answer hit", extra={"query": query})
+            self.answers_total.inc("learned")
+            self.answer_cache.put(query, learned, "learned", query_vec)
+            return learned, "learned", query_vec, distance
+        self.answers_total.inc("llm")
+        return None, "llm", query_vec, distance
+    
+    def _count_cache_hit(self, query, cached):
+        """A cached LLM answer still counts as an ask towards its learned-answer cluster"""
+        self.answers_total.inc("cache")
+        _, source, cluster_id = cached
+        if source == "llm" and cluster_id is not None:
+            try:
+                self.promoter.record_hit(cluster_id, query)
+            except Exception:
+                log.exception("Learned answer store error")
+    
+    def _remember(self, query, answer, source, query_vec):
+        if answer in (REPHRASE_ANSWER, LLM_ERROR_ANSWER):
+            return
+        cluster_id = None
+        if source == "llm" and query_vec is not None:
+            try:
+                cluster_id = self.promoter.record(query, query_vec, answer)["id"]
+            except Exception:
+                log.exception("Learned answer store error")
+        self.answer_cache.put(query, answer, source, query_vec, tag=cluster_id)
+    
+    def get_answer(self, query):
+        with self.stage_seconds.time("answer"):
+            answer, source, query_vec = self._retrieve(query)
+            if answer is None:
+                answer = self.generate_llm_answer(query)
+                self._remember(query, answer, source, query_vec)
+        return answer, source
+    
+    def answer_batch(self, queries):
+        """
+        Answer a list of questions with one encode call and one FAISS search
+        Misses go to the LLM as background jobs, at most BATCH_LLM_CONCURRENCY
+        in the queue at a time, so interactive /ask requests still go first
+        :return: One {"question", "answer", "source", "distance"} per query, in
+                 input order; an item the LLM queue couldn't take carries
+                 "error" and "retry_after" instead of an answer
+        :raises ValueError: for an empty, oversized or malformed list
+        """
+        if not isinstance(queries, list) or not all(isinstance(q, str) and q.strip() for q in queries):
+            raise ValueError("questions must be a list of non-empty strings")
+        if not queries or len(queries) > BATCH_MAX_QUESTIONS:
+            raise ValueError(f"Send between 1 and {BATCH_MAX_QUESTIONS} questions")
+        
+        results = [None] * len(queries)
+        pending = []
+        for i, query in enumerate(queries):
+            cached = self._retrieve_cached(query)
+            if cached:
+                results[i] = {"question": query, "answer": cached[0], "source": cached[1], "distance": None}
+            else:
+                pending.append(i)
+        
+        misses = []
+        if pending:
+            try:
+                searched = self._search_batch([queries[i] for i in pending])
+            except Exception:
+                log.exception("Search error")
+                searched = [(None, None, None, None)] * len(pending)
+            for i, (query_vec, distances, indexes, kb) in zip(pending, searched):
+                if query_vec is None:
+                    self.answer_cache.record_miss()
+                    self.answers_total.inc("llm")
+                    answer, source, distance = None, "llm", None
+                else:
+                    answer, source, query_vec, distance = self._retrieve_searched(
+                        queries[i], query_vec, distances, indexes, kb
+                    )
+                results[i] = {"question": queries[i], "answer": answer, "source": source,
+                              "distance": None if distance is None else round(float(distance), 4)}
+                if answer is None:
+                    misses.append((i, query_vec))
+        
+        if misses:
+            self._answer_batch_misses(queries, misses, results)
+        return results
+    
+    def _answer_batch_misses(self, queries, misses, results):
+        """Run LLM jobs for batch misses through a sliding window of BATCH_LLM_CONCURRENCY jobs"""
+        groups = {}  # repeated questions in one batch share a job
+        for i, query_vec in misses:
+            groups.setdefault(queries[i], []).append((i, query_vec))
+        
+        window = deque()
+        for query, members in groups.items():
+            if len(window) >= BATCH_LLM_CONCURRENCY:
+                self._finish_batch_job(*window.popleft(), results)
+            try:
+                window.append((query, members, self._submit_llm(query, interactive=False)))
+            except (SchedulerBusy, WarmingUp) as e:
+                retry_after = getattr(e, "retry_after", 5)
+                for i, _ in members:
+                    results[i].update(error=str(e), retry_after=retry_after)
+        while window:
+            self._finish_batch_job(*window.popleft(), results)
+    
+    def _finish_batch_job(self, query, members, job, results):
+        try:
+            answer = self._final_llm_text(job.result())
+            self._remember(query, answer, "llm", members[0][1])
+            update = {"answer": answer}
+        except SchedulerBusy as e:
+            update = {"error": str(e), "retry_after": e.retry_after}
+        except Exception:
+            log.exception("LLM error")
+            update = {"answer": LLM_ERROR_ANSWER}
+        for i, _ in members:
+            results[i].update(update)
+    
+    @staticmethod
+    def _final_llm_text(text):
+        text = text.strip()
+        return text if len(text) > 5 else REPHRASE_ANSWER
+    
+    def _stream_llm_and_remember(self, query, source, query_vec):
+        """Queue the LLM job and return its pieces, caching the full answer once generation finishes"""
+        return self._remember_stream(self.stream_llm_answer(query), query, source, query_vec)
+    
+    def _remember_stream(self, pieces, query, source, query_vec):
+        collected = []
+        for piece in pieces:
+            collected.append(piece)
+            yield piece
+        self._remember(query, self._final_llm_text("".join(collected)), source, query_vec)
+    
+    def stream_answer(self, query):
+        """
+        Return an iterator of (event, payload) pairs for a streamed answer
+        KB and cache hits arrive as a single "answer" event, LLM answers as
+        "token" events followed by a "done" event with the full text.
+        Retrieval and LLM admission happen before this returns, so WarmingUp
+        and SchedulerBusy surface before any response has been started
+        """
+        answer, source, query_vec = self._retrieve(query)
+        if answer is not None:
+            return iter([("answer", {"answer": answer, "source": source})])
+        return self._token_events(self._stream_llm_and_remember(query, source, query_vec), source)
+    
+    def _token_events(self, pieces, source):
+        collected = []
+        try:
+            for piece in pieces:
+                collected.append(piece)
+                yield "token", {"text": piece}
+        finally:
+            pieces.close()
+        yield "done", {"answer": self._final_llm_text("".join(collected)), "source": source}
+    
+    def answer_audio(self, query):
+        """
+        Audio answer for query
+        :return: (path, None) when the answer has pre-rendered audio in the store,
+                 otherwise (None, wav_stream) from the sentence pipeline
+        """
+        answer, source, query_vec = self._retrieve(query)
+        if answer is not None:
+            path = self.audio_store.lookup(answer) if self.audio_store else None
+            if path:
+                return path, None
+        
+        self._require("tts")
+        if answer is not None:
+            pieces = [answer]
         else:
-            return self.generate_llm_answer(query), "llm"
+            pieces = self._stream_llm_and_remember(query, source, query_vec)
+        return None, self.stream_speech(pieces)
+    
+    def stream_speech(self, pieces):
+        """
+        Yield a chunked WAV stream for streamed answer text
+        Text is cut at sentence boundaries and each sentence is synthesized
+        while the next one is still being generated
+        """
+        pipeline = SpeechPipeline(
+            self.synthesize_pcm,
+            voice_sample_rate(TTS_MODEL),
+            max_pending=TTS_PIPELINE_MAX_PENDING
+        )
+        return pipeline.stream(split_sentences(pieces))
     
     def generate_speech(self, text):
-        try:
-            output_file = os.path.join(UPLOAD_FOLDER, f"response_{os.getpid()}.wav")
-            tts_cmd = ["piper", "--model", TTS_MODEL, "--output_file", output_file]
-            
-            p = subprocess.Popen(tts_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            stdout, stderr = p.communicate(input=text.encode(), timeout=30)
-            
-            if p.returncode != 0:
-                print(f"TTS error: {stderr.decode()}")
-                return None
-            
-            return output_file if os.path.exists(output_file) else None
-        except Exception as e:
-            print(f"TTS error: {e}")
+        """Synthesize text to a complete WAV file in memory"""
+        pcm = self.synthesize_pcm(text)
+        if not pcm:
             return None
+        return wav_bytes(pcm, voice_sample_rate(TTS_MODEL))
     
-    def transcribe_audio(self, audio_path):
-        try:
-            recognizer = sr.Recognizer()
-            audio = AudioSegment.from_file(audio_path)
-            wav_path = os.path.join(UPLOAD_FOLDER, "temp.wav")
-            audio.export(wav_path, format="wav")
-            
-            with sr.AudioFile(wav_path) as source:
-                audio_data = recognizer.record(source)
-            
-            text = recognizer.recognize_google(audio_data)
-            if os.path.exists(wav_path):
-                os.remove(wav_path)
-            return text
-        except:
+    def synthesize_pcm(self, text):
+        """Synthesize text to raw 16-bit mono PCM in memory"""
+        if self.tts_pool is None:
+            log.error("TTS error: worker pool not started")
             return None
+        with self.stage_seconds.time("tts"):
+            return self.tts_pool.synthesize(text)
+    
+    def transcribe_audio(self, audio_data):
+        """
+        Transcribe an uploaded audio buffer in memory
+        :return: (text or None, latency in ms)
+        """
+        self._require("stt")
+        try:
+            text, latency_ms = self.stt.transcribe(audio_data)
+            self.stage_seconds.observe(latency_ms / 1000, "stt")
+            log.debug("STT", extra={"backend": self.stt.backend, "ms": round(latency_ms), "text": text})
+            return text, latency_ms
+        except Exception:
+            log.exception("STT error")
+            return None, 0.0
     
     @staticmethod
     def allowed_file(filename):
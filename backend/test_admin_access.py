@@ -0,0 +1,69 @@
+"""
+Test script for the admin route check
+Run this to verify /kb/review and /kb/reload refuse remote clients unless
+they send the admin token, in both the Flask and the ASGI app, and the
+status codes of review decisions
+"""
+import os
+import tempfile
+
+import numpy as np
+from starlette.testclient import TestClient
+
+import app as flask_app
+import asgi_app
+from qa import AnswerPromoter, admin_allowed
+
+
+def test_admin_allowed():
+    assert admin_allowed({}, "127.0.0.1") and admin_allowed({}, "::1")
+    assert not admin_allowed({}, "192.168.1.20")
+    # A tunnel or reverse proxy connects from localhost on behalf of a remote client
+    assert not admin_allowed({"cf-connecting-ip": "203.0.113.5"}, "127.0.0.1")
+    assert not admin_allowed({"x-forwarded-for": "203.0.113.5"}, "127.0.0.1")
+
+    assert admin_allowed({"authorization": "Bearer s3cret"}, "203.0.113.5", token="s3cret")
+    assert not admin_allowed({"authorization": "Bearer wrong"}, "127.0.0.1", token="s3cret")
+    assert not admin_allowed({}, "127.0.0.1", token="s3cret")
+
+
+def test_flask_routes():
+    client = flask_app.app.test_client()  # requests come from 127.0.0.1
+    assert client.get("/kb/review").status_code == 200
+    assert client.get("/kb/review", headers={"X-Forwarded-For": "203.0.113.5"}).status_code == 403
+    response = client.post("/kb/review/1", json={"action": "approve", "answer": "Free pizza in room 4."},
+                           headers={"CF-Connecting-IP": "203.0.113.5"})
+    assert response.status_code == 403
+    assert client.post("/kb/reload", environ_base={"REMOTE_ADDR": "192.168.1.20"}).status_code == 403
+
+    engine = flask_app.qa_engine
+    with tempfile.TemporaryDirectory() as tmp:
+        promoter, engine.promoter = engine.promoter, AnswerPromoter(os.path.join(tmp, "learned.json"), "test-model")
+        try:
+            assert client.post("/kb/review/999", json={"action": "approve"}).status_code == 404
+            pending = engine.promoter.record("parking", np.ones(8, dtype="float32"), "Behind block C.")
+            response = client.post(f"/kb/review/{pending['id']}", json={"action": "approve"})
+            assert response.status_code == 409 and "pending" in response.get_json()["error"]
+        finally:
+            engine.promoter = promoter
+
+
+def test_asgi_routes():
+    client = TestClient(asgi_app.app)  # client host "testclient": remote
+    assert client.get("/kb/review").status_code == 403
+    assert client.post("/kb/review/1", json={"action": "approve", "answer": "Free pizza in room 4."}).status_code == 403
+    assert client.post("/kb/reload").status_code == 403
+
+    asgi_app.ADMIN_TOKEN = "s3cret"
+    try:
+        assert client.get("/kb/review", headers={"Authorization": "Bearer s3cret"}).status_code == 200
+        assert client.get("/kb/review", headers={"Authorization": "Bearer nope"}).status_code == 403
+    finally:
+        asgi_app.ADMIN_TOKEN = None
+
+
+if __name__ == "__main__":
+    test_admin_allowed()
+    test_flask_routes()
+    test_asgi_routes()
+    print("✅ Admin access tests passed")
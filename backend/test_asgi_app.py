@@ -0,0 +1,231 @@
+"""
+Test script for the ASGI app
+Serves asgi_app on the benchmark's stub engine through starlette's
+TestClient, with the lifespan running, and checks /ask for text and audio,
+serving while the LLM still loads, the upload limit, where uploads and
+model calls run and the shutdown drain
+"""
+import json
+import tempfile
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.testclient import TestClient
+
+import asgi_app
+from qa_engine import WarmingUp
+from bench_qa_pipeline import BenchEngine, StageTimer, StubRecognizer, synthetic_clip
+
+
+class RecordingSpool(tempfile.SpooledTemporaryFile):
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instances.append(self)
+
+
+class AppUnderTest:
+    """asgi_app with a stub engine and its own executors, restored afterwards"""
+    names = ("qa_engine", "MODEL_EXECUTOR", "STT_EXECUTOR", "TTS_EXECUTOR", "MAX_UPLOAD_BYTES", "UPLOAD_SPOOL", "tempfile")
+
+    def __init__(self, workdir, **overrides):
+        self.engine = BenchEngine(StageTimer(), True, workdir)
+        self.values = dict(
+            qa_engine=self.engine,
+            MODEL_EXECUTOR=ThreadPoolExecutor(2, thread_name_prefix="asgi-model"),
+            STT_EXECUTOR=ThreadPoolExecutor(1, thread_name_prefix="asgi-stt"),
+            TTS_EXECUTOR=ThreadPoolExecutor(1, thread_name_prefix="asgi-tts"),
+            **overrides
+        )
+
+    def __enter__(self):
+        self.saved = {name: getattr(asgi_app, name) for name in self.names}
+        for name, value in self.values.items():
+            setattr(asgi_app, name, value)
+        return self
+
+    def __exit__(self, *exc):
+        for name, value in self.saved.items():
+            setattr(asgi_app, name, value)
+
+
+def sse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def wait_ready(engine, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not engine.is_ready("index") or not engine.is_ready("llm"):
+        assert time.monotonic() < deadline, engine.stages
+        time.sleep(0.05)
+
+
+def test_ask_and_shutdown():
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir) as app:
+        engine = app.engine
+        shutdown_calls = []
+        shutdown = engine.shutdown
+        engine.shutdown = lambda timeout: shutdown_calls.append(timeout) or shutdown(timeout)
+
+        with TestClient(asgi_app.app) as client:  # runs the lifespan: background init
+            wait_ready(engine)
+            assert client.get("/health").status_code == 200
+
+            question = engine.knowledge_base[0]["question"]
+            response = client.post("/ask", data={"text": question})
+            assert response.status_code == 200
+            assert response.json() == {"answer": engine.knowledge_base[0]["answer"],
+                                       "source": "knowledge_base", "format": "text"}
+
+            response = client.post("/ask", data={"text": "What is the meaning of life?"})
+            assert response.status_code == 200 and response.json()["source"] == "llm"
+
+            assert client.post("/ask", data={}).status_code == 400
+
+        # Lifespan exit drains the engine and stops the executors
+        assert shutdown_calls == [asgi_app.ASGI_SHUTDOWN_TIMEOUT]
+        assert engine.llm_scheduler._closed
+        for name in ("MODEL_EXECUTOR", "STT_EXECUTOR", "TTS_EXECUTOR"):
+            try:
+                getattr(asgi_app, name).submit(int)
+            except RuntimeError:
+                continue
+            raise AssertionError(f"{name} still accepts work after shutdown")
+
+
+def test_audio_upload_is_spooled_and_transcribed_off_loop():
+    clip = synthetic_clip(0)  # ~260 KB
+    RecordingSpool.instances.clear()
+    spool = types.SimpleNamespace(SpooledTemporaryFile=RecordingSpool)
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir, UPLOAD_SPOOL=64 * 1024, tempfile=spool) as app:
+        engine = app.engine
+        threads = []
+        transcribe = engine.transcribe_audio
+        engine.transcribe_audio = lambda data: threads.append(threading.current_thread().name) or transcribe(data)
+
+        with TestClient(asgi_app.app) as client:
+            wait_ready(engine)
+            question = engine.knowledge_base[0]["question"]
+            StubRecognizer.register(clip, question)
+
+            response = client.post("/ask", content=clip, headers={"Content-Type": "audio/wav"})
+            assert response.status_code == 200, response.text
+            body = response.json()
+            assert body["source"] == "knowledge_base" and "stt_latency_ms" in body
+
+            response = client.post("/ask", files={"audio": ("question.wav", clip, "audio/wav")})
+            assert response.status_code == 200 and response.json()["source"] == "knowledge_base"
+
+        # The raw body went to disk past UPLOAD_SPOOL; STT ran on its own pool
+        assert len(RecordingSpool.instances) == 1 and RecordingSpool.instances[0]._rolled
+        assert len(threads) == 2 and all(name.startswith("asgi-stt") for name in threads)
+
+
+def test_oversized_upload_rejected():
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir, MAX_UPLOAD_BYTES=10000) as app:
+        with TestClient(asgi_app.app) as client:
+            wait_ready(app.engine)
+            response = client.post("/ask", content=bytes(50000), headers={"Content-Type": "audio/wav"})
+            assert response.status_code == 413
+            response = client.post("/ask", files={"audio": ("question.wav", bytes(50000), "audio/wav")})
+            assert response.status_code == 413
+            # Small bodies still go through
+            assert client.post("/ask", data={"text": "Where is the library?"}).status_code == 200
+
+
+def test_stream_sse():
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir) as app:
+        engine = app.engine
+        with TestClient(asgi_app.app) as client:
+            wait_ready(engine)
+            item = engine.knowledge_base[0]
+            response = client.post("/ask", data={"text": item["question"], "response_format": "stream"})
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            assert sse_events(response.text) == [("answer", {"answer": item["answer"], "source": "knowledge_base"})]
+
+            # LLM answers arrive token by token, then one "done" with the whole text
+            response = client.post("/ask", data={"text": "Why is the sky blue?", "response_format": "stream"})
+            events = sse_events(response.text)
+            names = [name for name, _ in events]
+            assert names[-1] == "done" and set(names[:-1]) == {"token"} and len(names) > 2
+            done = events[-1][1]
+            assert done["source"] == "llm"
+            assert done["answer"] == "".join(payload["text"] for _, payload in events[:-1]).strip()
+
+            # The streamed answer was cached like a plain one
+            response = client.post("/ask", data={"text": "Why is the sky blue?"})
+            assert response.json()["answer"] == done["answer"]
+            assert engine.answer_cache.get_stats()["exact_hits"] >= 1
+
+
+def test_kb_answers_while_llm_loads():
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir) as app:
+        engine = app.engine
+        release = threading.Event()
+        create_llm = engine._create_llm
+        engine._create_llm = lambda: release.wait(10) and create_llm()
+
+        with TestClient(asgi_app.app) as client:
+            try:
+                deadline = time.monotonic() + 30
+                while not engine.is_ready("index"):
+                    assert time.monotonic() < deadline, engine.stages
+                    time.sleep(0.05)
+
+                health = client.get("/health").json()
+                assert health["status"] == "warming_up"
+                assert health["stages"]["llm"]["status"] == "loading"
+                assert health["stages"]["index"]["status"] == "ready"
+
+                # Retrieval is up: KB questions are answered, LLM questions get a clear 503
+                item = engine.knowledge_base[0]
+                response = client.post("/ask", data={"text": item["question"]})
+                assert response.status_code == 200 and response.json()["answer"] == item["answer"]
+
+                response = client.post("/ask", data={"text": "Why is the sky blue?"})
+                assert response.status_code == 503 and response.headers["Retry-After"] == "5"
+                assert response.json()["status"] == "warming_up" and response.json()["stage"] == "llm"
+                try:
+                    engine.get_answer("Why is the sky blue?")
+                    raise AssertionError("answered without an LLM")
+                except WarmingUp as e:
+                    assert e.stage == "llm"
+            finally:
+                release.set()
+
+            wait_ready(engine)
+            response = client.post("/ask", data={"text": "Why is the sky blue?"})
+            assert response.status_code == 200 and response.json()["source"] == "llm"
+
+
+def test_ask_batch():
+    with tempfile.TemporaryDirectory() as workdir, AppUnderTest(workdir) as app:
+        with TestClient(asgi_app.app) as client:
+            wait_ready(app.engine)
+            questions = ["Why is the sky blue?", app.engine.knowledge_base[0]["question"]]
+            response = client.post("/ask/batch", json={"questions": questions})
+            assert response.status_code == 200
+            body = response.json()
+            assert body["count"] == 2 and [r["question"] for r in body["results"]] == questions
+            assert [r["source"] for r in body["results"]] == ["llm", "knowledge_base"]
+
+            for bad in ({"questions": []}, {"questions": ["ok", 3]}, {}, ["Why is the sky blue?"]):
+                assert client.post("/ask/batch", json=bad).status_code == 400, bad
+
+
+if __name__ == "__main__":
+    test_ask_and_shutdown()
+    test_audio_upload_is_spooled_and_transcribed_off_loop()
+    test_oversized_upload_rejected()
+    test_stream_sse()
+    test_kb_answers_while_llm_loads()
+    test_ask_batch()
+    print("✅ ASGI app tests passed")
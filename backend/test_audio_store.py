@@ -0,0 +1,76 @@
+"""
+Test script for the pre-rendered answer audio store
+"""
+import os
+import tempfile
+
+from build_qa_index import prerender_audio
+from qa import AudioStore
+
+
+def make_voice(tmp, data=b"voice"):
+    path = os.path.join(tmp, "voice.onnx")
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_lookup_and_put():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AudioStore(os.path.join(tmp, "audio"), make_voice(tmp))
+        assert store.lookup("Hello") is None
+
+        path = store.put("Hello", b"RIFF1")
+        assert store.lookup("Hello") == path
+        assert store.lookup("Hello!") is None
+        with open(path, "rb") as f:
+            assert f.read() == b"RIFF1"
+
+        # Overwrite goes through a temp file and a rename: no partial file, no leftovers
+        assert store.put("Hello", b"RIFF2") == path
+        with open(path, "rb") as f:
+            assert f.read() == b"RIFF2"
+        assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+
+
+def test_new_voice_gets_new_keys():
+    with tempfile.TemporaryDirectory() as tmp:
+        voice = make_voice(tmp)
+        store = AudioStore(os.path.join(tmp, "audio"), voice)
+        store.put("Hello", b"RIFF")
+        assert AudioStore(os.path.join(tmp, "audio"), voice).lookup("Hello")
+
+        make_voice(tmp, b"retrained voice")
+        os.utime(voice, ns=(0, 12345))
+        assert AudioStore(os.path.join(tmp, "audio"), voice).lookup("Hello") is None
+
+
+def test_prerender_counts():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = AudioStore(os.path.join(tmp, "audio"), make_voice(tmp))
+        store.put("Cached answer.", b"RIFF")
+        calls = []
+
+        def synthesize(text):
+            calls.append(text)
+            return None if text == "Broken answer." else text.encode("utf-8")
+
+        documents = [{"answer": "Cached answer."}, {"answer": "New answer."},
+                     {"answer": "New answer."}, {"answer": "Broken answer."}]
+        stats = prerender_audio(documents, store, synthesize)
+        assert stats == {"rendered": 1, "skipped": 1, "failed": 1}
+        assert calls == ["New answer.", "Broken answer."]
+        with open(store.lookup("New answer."), "rb") as f:
+            assert f.read().startswith(b"RIFF")
+
+        # Second run only retries what failed
+        calls.clear()
+        assert prerender_audio(documents, store, synthesize) == {"rendered": 0, "skipped": 2, "failed": 1}
+        assert calls == ["Broken answer."]
+
+
+if __name__ == "__main__":
+    test_lookup_and_put()
+    test_new_voice_gets_new_keys()
+    test_prerender_counts()
+    print("✅ Audio store tests passed")
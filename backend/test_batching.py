@@ -0,0 +1,83 @@
+"""
+Test script for the micro-batching scheduler
+"""
+import os
+import threading
+import time
+
+from qa import MicroBatcher
+
+
+def test_concurrent_items_share_a_batch():
+    gate = threading.Event()
+    batches = []
+
+    def process(items):
+        batches.append(list(items))
+        gate.wait(5)  # hold the first batch so the rest queue up behind it
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch=4, max_wait_ms=50, name="test-batcher")
+    results = {}
+    threads = [threading.Thread(target=lambda i=i: results.__setitem__(i, batcher.submit(i, timeout=5)))
+               for i in range(9)]
+    threads[0].start()
+    while not batches:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while batcher.pending() < 8:
+        time.sleep(0.001)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {i: i * 2 for i in range(9)}
+    assert [len(batch) for batch in batches] == [1, 4, 4]
+    stats = batcher.get_stats()
+    assert (stats["batches"], stats["items"], stats["max_batch_seen"], stats["pending"]) == (3, 9, 4, 0)
+
+
+def test_batch_error_reaches_every_caller():
+    def process(items):
+        if "bad" in items:
+            raise ValueError("bad item")
+        return items
+
+    batcher = MicroBatcher(process, max_batch=8, max_wait_ms=1, name="test-batcher")
+    try:
+        batcher.submit("bad", timeout=5)
+        raise AssertionError("error swallowed")
+    except ValueError:
+        pass
+    assert batcher.submit("good", timeout=5) == "good"  # the worker is still running
+
+
+def test_worker_restarted_after_fork():
+    batcher = MicroBatcher(lambda items: [(item, os.getpid()) for item in items], name="test-batcher")
+    assert batcher.submit("parent", timeout=5) == ("parent", os.getpid())
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            item, worker_pid = batcher.submit("child", timeout=5)
+            ok = item == "child" and worker_pid == os.getpid() and batcher._thread.is_alive()
+        except Exception:
+            ok = False
+        os.write(write_fd, b"1" if ok else b"0")
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "rb") as f:
+        child_ok = f.read()
+    os.waitpid(pid, 0)
+    assert child_ok == b"1"
+    assert batcher.submit("parent again", timeout=5) == ("parent again", os.getpid())
+
+
+if __name__ == "__main__":
+    test_concurrent_items_share_a_batch()
+    test_batch_error_reaches_every_caller()
+    test_worker_restarted_after_fork()
+    print("✅ Micro-batcher tests passed")
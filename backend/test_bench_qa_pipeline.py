@@ -0,0 +1,40 @@
+"""
+Test script for the QA pipeline benchmark
+Runs the stub backend end to end (no model files needed) and checks the
+baseline diff
+"""
+from bench_qa_pipeline import STAGES, compare, run_benchmark
+
+
+def test_stub_run_covers_every_stage():
+    first = run_benchmark("stub", repeat=1, warmup=2)
+    second = run_benchmark("stub", repeat=1, warmup=2)
+
+    assert first["queries"] == second["queries"] > 0
+    assert first["sources"] == second["sources"]  # deterministic routing
+    assert first["sources"].get("knowledge_base") and first["sources"].get("llm")
+    for stage in STAGES:
+        assert first["stages"][stage]["count"] > 0, stage
+        assert first["stages"][stage]["count"] == second["stages"][stage]["count"], stage
+        assert first["stages"][stage]["p50_ms"] <= first["stages"][stage]["p99_ms"]
+    assert first["stages"]["llm_decode"]["items"] > first["stages"]["llm_decode"]["count"]
+
+
+def test_compare_flags_regressions():
+    def report(p50, p95, p99):
+        stats = {"count": 10, "p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+        return {"end_to_end": stats, "stages": {"embed": stats}}
+
+    rows = compare(report(10, 20, 30), report(10, 20, 20), tolerance=0.2, min_ms=1.0)
+    regressed = {(row["stage"], row["metric"]) for row in rows if row["regression"]}
+    assert regressed == {("end_to_end", "p99_ms"), ("embed", "p99_ms")}
+
+    # Large relative change but below the absolute floor
+    rows = compare(report(0.2, 0.2, 0.2), report(0.1, 0.1, 0.1), tolerance=0.2, min_ms=1.0)
+    assert not any(row["regression"] for row in rows)
+
+
+if __name__ == "__main__":
+    test_stub_run_covers_every_stage()
+    test_compare_flags_regressions()
+    print("✅ Benchmark tests passed")
@@ -0,0 +1,69 @@
+"""
+Test script for the KB threshold calibration
+Run this to verify the sweep metrics, the lexical bonus the distances are
+fused with, and that the chosen threshold is kept in the index manifest
+across syncs
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from calibrate_threshold import choose, sweep
+from qa import IndexStore, LexicalIndex
+
+
+def test_sweep_and_choose():
+    # Three answerable paraphrases (one ranked wrong) and one out-of-scope question
+    positions = np.array([0, 1, 2, 3])
+    distances = np.array([0.3, 0.5, 0.7, 0.9])
+    expected = [{0}, {1}, {5}, set()]
+
+    rows = sweep(positions, distances, expected, [0.2, 0.4, 0.6, 0.8, 1.0], kb_ms=10, llm_ms=1010)
+    by_threshold = {row["threshold"]: row for row in rows}
+    assert by_threshold[0.2]["hit_rate"] == 0 and by_threshold[0.2]["precision"] == 1.0
+    assert by_threshold[0.6]["hit_rate"] == 0.5 and by_threshold[0.6]["precision"] == 1.0
+    assert by_threshold[0.6]["recall"] == round(2 / 3, 4) and by_threshold[0.6]["avg_ms"] == 510
+    assert by_threshold[0.8]["false_hits"] == 1 and by_threshold[1.0]["false_hits"] == 2
+    assert by_threshold[0.4]["false_misses"] == 1
+
+    assert choose(rows, min_precision=0.95)["threshold"] == 0.6
+    assert choose(rows, min_precision=0.5)["threshold"] == 1.0
+    assert choose([row for row in rows if row["threshold"] >= 0.8], min_precision=0.95) is None
+
+
+def test_lexical_bonus_saturates():
+    documents = [{"question": f"Where is room {i}?"} for i in range(20)]
+    documents.append({"question": "Where is the canteen?", "keywords": ["food", "lunch"]})
+    lexical = LexicalIndex(documents, saturation=3.0)
+    fused = lambda query: lexical.fuse(query, [0.5], [20], weight=0.3)[0][1]
+
+    # The best lexical match of a query doesn't get the full bonus by default
+    assert 0.5 - 0.3 < fused("canteen food lunch") < fused("canteen") < 0.5
+    assert fused("library") == 0.5
+
+
+def test_calibration_survives_sync():
+    rng = np.random.default_rng(0)
+    encode = lambda texts: rng.standard_normal((len(texts), 8)).astype("float32")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = IndexStore(os.path.join(tmp, "vector.index"), "model-a", "flat")
+        _, _, stats = store.sync(["a", "b"], encode)
+        assert stats["calibration"] is None
+
+        store.save_calibration({"threshold": 0.65, "index_type": "flat", "lexical_weight": 0.3})
+        _, _, stats = store.sync(["a", "b", "c"], encode)  # KB edit rewrites the manifest
+        assert stats["embedded"] == 1 and stats["calibration"]["threshold"] == 0.65
+        _, _, stats = store.sync(["a", "b", "c"], encode, force=True)
+        assert stats["calibration"]["threshold"] == 0.65
+
+        other_model = IndexStore(store.index_path, "model-b", "flat")
+        _, _, stats = other_model.sync(["a", "b", "c"], encode)
+        assert stats["full_rebuild"] and stats["calibration"] is None
+
+
+if __name__ == "__main__":
+    test_sweep_and_choose()
+    test_lexical_bonus_saturates()
+    test_calibration_survives_sync()
+    print("✅ Calibration tests passed")
@@ -0,0 +1,98 @@
+"""
+Test script for the adaptive generation budget
+Checks question typing, budgets, the per-request stats and where an LLM
+job stops, using the benchmark's stub model (no GGUF needed)
+"""
+import tempfile
+import time
+
+import qa_engine
+from bench_qa_pipeline import BenchEngine, StageTimer, StubLlama
+from qa import GenerationStats, classify_question, generation_budget
+
+
+def test_classify_and_budget():
+    assert classify_question("hello, how are you?") == "greeting"
+    assert classify_question("Where is the CS lab?") == "factual"
+    assert classify_question("Explain how fee refunds work") == "explanation"
+    assert classify_question("Tell me something interesting about the campus history please") == "general"
+    assert classify_question("???") == "general"
+
+    kind, budget = generation_budget("Where is the CS lab?")
+    assert kind == "factual" and budget == {"max_tokens": 96, "max_sentences": 2}
+    kind, budget = generation_budget("Why is the sky blue?", {"explanation": {"max_sentences": 2}}, max_tokens=100)
+    assert kind == "explanation" and budget == {"max_tokens": 100, "max_sentences": 2}
+
+
+def test_stats_estimate_savings():
+    stats = GenerationStats(recent=2)
+    budget = {"max_tokens": 96, "max_sentences": 2}
+    # No natural stops of this type yet: nothing to compare an early stop with
+    assert stats.record("factual", budget, 10, 1.0, "sentences")["tokens_saved"] == 0
+
+    stats.record("factual", budget, 40, 4.0, "natural")
+    stats.record("factual", budget, 60, 6.0, "natural")
+    entry = stats.record("factual", budget, 20, 2.0, "sentences")
+    assert entry["tokens_saved"] == 30 and entry["seconds_saved"] == 3.0
+    assert stats.record("factual", budget, 20, 2.0, "cancelled")["tokens_saved"] == 0
+    assert stats.record("greeting", budget, 20, 2.0, "budget")["tokens_saved"] == 0  # other type
+
+    summary = stats.get_stats()
+    assert summary["requests"] == 6 and summary["tokens"] == 170
+    assert summary["stop_reasons"] == {"sentences": 2, "natural": 2, "cancelled": 1, "budget": 1}
+    assert summary["natural_avg_tokens"] == {"factual": 50.0}
+    assert summary["tokens_saved"] == 30 and summary["seconds_saved"] == 3.0
+    assert len(summary["recent"]) == 2 and summary["recent"][-1]["type"] == "greeting"
+
+
+def run_job(engine, budget, close_after=None):
+    prompt = "Question: Where is the library?\nAnswer:"
+    job = engine._run_llm_job((StubLlama(), None), (prompt, "factual", budget, time.perf_counter()))
+    pieces = []
+    for piece in job:
+        pieces.append(piece)
+        if close_after is not None and len(pieces) >= close_after:
+            job.close()
+            break
+    return "".join(pieces), engine.generation_stats.get_stats()["recent"][-1]
+
+
+def test_llm_job_stops():
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = BenchEngine(StageTimer(), True, workdir)
+        try:
+            text, entry = run_job(engine, {"max_tokens": 200, "max_sentences": 5})
+            assert entry["stop_reason"] == "natural" and text.count(".") == 3
+
+            # The sentence limit cuts right after the first sentence's period
+            text, entry = run_job(engine, {"max_tokens": 200, "max_sentences": 1})
+            assert entry["stop_reason"] == "sentences"
+            assert text == "You asked about Where is the library."
+            assert entry["tokens_saved"] > 0  # against the natural answer above
+
+            text, entry = run_job(engine, {"max_tokens": 4, "max_sentences": 5})
+            assert entry["stop_reason"] == "budget" and entry["tokens"] == 4 and len(text.split()) == 4
+
+            text, entry = run_job(engine, {"max_tokens": 200, "max_sentences": 5}, close_after=2)
+            assert entry["stop_reason"] == "cancelled" and entry["tokens"] == 2
+
+            deadline = qa_engine.LLM_GEN_DEADLINE
+            qa_engine.LLM_GEN_DEADLINE = -1
+            try:
+                text, entry = run_job(engine, {"max_tokens": 200, "max_sentences": 5})
+            finally:
+                qa_engine.LLM_GEN_DEADLINE = deadline
+            assert entry["stop_reason"] == "deadline" and entry["tokens"] == 1
+
+            assert engine.generation_stats.get_stats()["stop_reasons"] == {
+                "natural": 1, "sentences": 1, "budget": 1, "cancelled": 1, "deadline": 1
+            }
+        finally:
+            engine.shutdown()
+
+
+if __name__ == "__main__":
+    test_classify_and_budget()
+    test_stats_estimate_savings()
+    test_llm_job_stops()
+    print("✅ Generation budget tests passed")
@@ -0,0 +1,123 @@
+"""
+Test script for the content-fingerprinted index store
+Edits a small KB between syncs and checks that only new or changed
+questions are embedded, and that the threshold calibration is kept
+"""
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+
+from qa import IndexStore, normalize_vectors
+
+DIM = 32
+QUESTIONS = [
+    "Where is the library?",
+    "When does the cafeteria open?",
+    "Who teaches Data Structures?",
+    "Where can I pay fees?",
+    "What are library hours?",
+]
+CALIBRATION = {"threshold": 0.42, "embed_model": "test-model"}
+
+
+class RecordingEncoder:
+    """Deterministic vector per text; remembers what it was asked to embed"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        vectors = np.empty((len(texts), DIM), dtype="float32")
+        for row, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.md5(text.encode("utf-8")).digest()[:4], "little")
+            vectors[row] = np.random.default_rng(seed).standard_normal(DIM)
+        return vectors
+
+
+def nearest(index, id_to_pos, text):
+    _, ids = index.search(normalize_vectors(RecordingEncoder()([text])), 1)
+    return int(id_to_pos[ids[0, 0]])
+
+
+def test_incremental_sync():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vector.index")
+        store = IndexStore(path, "test-model", "flat")
+        encode = RecordingEncoder()
+
+        index, id_to_pos, stats = store.sync(QUESTIONS, encode)
+        assert stats["full_rebuild"] and stats["embedded"] == len(QUESTIONS)
+        assert stats["calibration"] is None
+        store.save_calibration(CALIBRATION)
+
+        # Unchanged KB: nothing embedded
+        encode.calls.clear()
+        index, id_to_pos, stats = store.sync(QUESTIONS, encode)
+        assert (stats["reused"], stats["embedded"], stats["removed"]) == (len(QUESTIONS), 0, 0)
+        assert not stats["full_rebuild"] and encode.calls == []
+        assert stats["calibration"] == CALIBRATION
+
+        # One edited entry: only that one is re-encoded, the old vector is dropped
+        edited = list(QUESTIONS)
+        edited[2] = "Who teaches Operating Systems?"
+        index, id_to_pos, stats = store.sync(edited, encode)
+        assert encode.calls == [["Who teaches Operating Systems?"]]
+        assert (stats["reused"], stats["embedded"], stats["removed"]) == (len(QUESTIONS) - 1, 1, 1)
+        assert not stats["full_rebuild"] and not stats["index_rebuilt"]
+        assert stats["calibration"] == CALIBRATION
+        assert index.ntotal == len(edited)
+        for pos, text in enumerate(edited):
+            assert nearest(index, id_to_pos, text) == pos, text
+
+        # Removed and reordered entries map back to their new positions
+        encode.calls.clear()
+        shrunk = [edited[4], edited[0], edited[2]]
+        index, id_to_pos, stats = store.sync(shrunk, encode)
+        assert encode.calls == []
+        assert (stats["reused"], stats["embedded"], stats["removed"]) == (3, 0, 2)
+        for pos, text in enumerate(shrunk):
+            assert nearest(index, id_to_pos, text) == pos, text
+
+        # A fresh store (next process start) picks the synced artifacts up as they are
+        index, id_to_pos, stats = IndexStore(path, "test-model", "flat").sync(shrunk, encode)
+        assert encode.calls == [] and stats["reused"] == 3
+
+
+def test_force_and_model_change():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vector.index")
+        encode = RecordingEncoder()
+        IndexStore(path, "test-model", "flat").sync(QUESTIONS, encode)
+        IndexStore(path, "test-model", "flat").save_calibration(CALIBRATION)
+
+        encode.calls.clear()
+        _, _, stats = IndexStore(path, "test-model", "flat").sync(QUESTIONS, encode, force=True)
+        assert stats["full_rebuild"] and stats["embedded"] == len(QUESTIONS)
+        assert encode.calls == [QUESTIONS]
+        assert stats["calibration"] == CALIBRATION  # re-embedding with the same model keeps it
+
+        _, _, stats = IndexStore(path, "other-model", "flat").sync(QUESTIONS, encode)
+        assert stats["full_rebuild"] and stats["calibration"] is None
+
+
+def test_index_type_change_reuses_vectors():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vector.index")
+        encode = RecordingEncoder()
+        IndexStore(path, "test-model", "flat").sync(QUESTIONS, encode)
+
+        encode.calls.clear()
+        index, id_to_pos, stats = IndexStore(path, "test-model", "hnsw").sync(QUESTIONS, encode)
+        assert stats["index_rebuilt"] and stats["index_type"] == "hnsw"
+        assert encode.calls == [] and stats["reused"] == len(QUESTIONS)
+        assert nearest(index, id_to_pos, QUESTIONS[3]) == 3
+
+
+if __name__ == "__main__":
+    test_incremental_sync()
+    test_force_and_model_change()
+    test_index_type_change_reuses_vectors()
+    print("✅ Index store tests passed")
@@ -0,0 +1,129 @@
+"""
+Test script for promoting repeated LLM answers into the learned-answer index
+Run this to verify clustering, promotion, review, persistence and pruning
+"""
+import os
+import tempfile
+
+import numpy as np
+
+from qa import AnswerPromoter
+
+
+def vec(*values):
+    return np.array(values, dtype="float32")
+
+
+def test_promotes_after_min_count():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "learned.json")
+        promoter = AnswerPromoter(path, "test-model", min_count=3, distance=0.2)
+        promoter.load()
+
+        for v in (vec(1, 0, 0), vec(0.95, 0.05, 0), vec(0.97, 0, 0.03)):
+            assert promoter.lookup(v) is None
+            promoter.record("what is the wifi password", v, "Ask the IT office.")
+        promoter.record("unrelated", vec(0, 1, 0), "Something else.")
+
+        assert promoter.lookup(vec(0.99, 0.01, 0)) == "Ask the IT office."
+        assert promoter.lookup(vec(0, 1, 0)) is None  # asked once only
+
+        reloaded = AnswerPromoter(path, "test-model", min_count=3, distance=0.2)
+        reloaded.load()
+        assert reloaded.lookup(vec(1, 0, 0)) == "Ask the IT office."
+        assert reloaded.get_stats()["promoted"] == 1
+
+        other_model = AnswerPromoter(path, "other-model")
+        assert other_model.load() == 0
+
+
+def test_cache_repeats_count():
+    # One generation, then repeats the answer cache served: still asked three times
+    with tempfile.TemporaryDirectory() as tmp:
+        promoter = AnswerPromoter(os.path.join(tmp, "learned.json"), "test-model", min_count=3)
+        promoter.load()
+        cluster = promoter.record("canteen timings", vec(1, 0, 0), "8am to 6pm.")
+        promoter.record_hit(cluster["id"], "canteen timings")
+        assert promoter.lookup(vec(1, 0, 0)) is None
+        promoter.record_hit(cluster["id"], "when does the canteen open")
+        assert promoter.lookup(vec(1, 0, 0)) == "8am to 6pm."
+        assert promoter.get_stats()["cache_repeats"] == 2
+        assert promoter.record_hit(cluster["id"] + 1, "unknown cluster") is None
+
+
+def test_saves_are_throttled():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "learned.json")
+        promoter = AnswerPromoter(path, "test-model", min_count=2, save_interval=3600)
+        promoter.load()
+        promoter.record("library hours", vec(1, 0, 0), "9am to 8pm.")
+        promoter.record("parking", vec(0, 1, 0), "Behind block C.")
+        assert not os.path.exists(path)  # plain counts wait for the interval
+
+        promoter.record("library timings", vec(1, 0, 0), "9am to 8pm.")  # promotion is written at once
+        reloaded = AnswerPromoter(path, "test-model")
+        assert reloaded.load() == 2
+
+        promoter.record("where to park", vec(0, 1, 0), "Behind block C.")
+        promoter.record("bus stop", vec(0, 0, 1), "At the main gate.")
+        assert promoter.flush() and not promoter.flush()
+        assert reloaded.load() == 3 and promoter.get_stats()["saves"] == 3
+
+
+def test_pending_clusters_pruned():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "learned.json")
+        promoter = AnswerPromoter(path, "test-model", min_count=3, pending_ttl=3600, max_pending=1)
+        promoter.load()
+        for query in ("canteen menu", "canteen food", "what is for lunch"):
+            promoter.record(query, vec(1, 0, 0), "Changes daily.")  # promoted, never pruned
+        for i, v in enumerate((vec(0, 1, 0), vec(0, 0, 1), vec(0, 1, 1))):
+            promoter.record(f"one-off {i}", v, "Ask the front desk.")
+        promoter.record("one-off 2 again", vec(0, 1, 1), "Ask the front desk.")
+        with promoter._lock:
+            promoter.clusters[1]["seen_at"] -= 7200  # "one-off 0" expired
+        promoter.flush()
+
+        stats = promoter.get_stats()
+        # Expired first, then the least asked beyond max_pending
+        assert stats["promoted"] == 1 and stats["pending"] == 1 and stats["pruned"] == 2
+        assert [c["queries"][0] for c in promoter.clusters.values()] == ["canteen menu", "one-off 2"]
+        assert promoter.lookup(vec(1, 0, 0)) == "Changes daily."
+
+
+def test_review_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        promoter = AnswerPromoter(os.path.join(tmp, "learned.json"), "test-model", min_count=2, review=True)
+        promoter.load()
+        promoter.record("gym timings", vec(0, 0, 1), "6am to 9pm.")
+        promoter.record("when is the gym open", vec(0, 0.1, 1), "6am to 9pm.")
+
+        queue = promoter.review_queue()
+        assert len(queue) == 1 and queue[0]["count"] == 2
+        assert promoter.lookup(vec(0, 0, 1)) is None
+
+        # Approval only takes queued clusters: no skipping the queue, no reviving a rejected answer
+        pending = promoter.record("parking", vec(1, 0, 0), "Behind block C.")
+        for cluster_id in (pending["id"], promoter.reject(pending["id"])["id"]):
+            try:
+                promoter.approve(cluster_id)
+                assert False, "approved a cluster that wasn't in review"
+            except ValueError:
+                pass
+        assert promoter.lookup(vec(1, 0, 0)) is None
+        assert promoter.approve(999) is None and promoter.reject(999) is None
+
+        promoter.approve(queue[0]["id"], "The gym is open 6am to 9pm.")
+        assert promoter.lookup(vec(0, 0, 1)) == "The gym is open 6am to 9pm."
+
+        promoter.reject(queue[0]["id"])
+        assert promoter.lookup(vec(0, 0, 1)) is None
+
+
+if __name__ == "__main__":
+    test_promotes_after_min_count()
+    test_cache_repeats_count()
+    test_saves_are_throttled()
+    test_pending_clusters_pruned()
+    test_review_queue()
+    print("✅ Learned answer tests passed")
@@ -0,0 +1,86 @@
+"""
+Test script for the LLM inference scheduler
+Run this to verify admission control, priorities, deadlines and cancellation
+"""
+import time
+import threading
+
+from qa import InferenceScheduler, JobExpired, SchedulerBusy
+
+
+def slow_job(context, words):
+    for word in words:
+        time.sleep(0.02)
+        yield word
+
+
+def make_scheduler(max_queue=2):
+    return InferenceScheduler(slow_job, contexts=[None], max_queue=max_queue, name="test-llm")
+
+
+def test_full_queue_rejected():
+    scheduler = make_scheduler(max_queue=1)
+    running = scheduler.submit(["a"] * 10)
+    time.sleep(0.05)
+    queued = scheduler.submit(["b"])
+
+    try:
+        scheduler.submit(["c"])
+        assert False, "expected SchedulerBusy"
+    except SchedulerBusy as e:
+        assert e.retry_after >= 1
+
+    assert running.result() == "a" * 10
+    assert queued.result() == "b"
+    assert scheduler.get_stats()["rejected"] == 1
+
+
+def test_priority_order():
+    scheduler = make_scheduler(max_queue=4)
+    order = []
+    lock = threading.Lock()
+
+    def record(name, job):
+        job.result()
+        with lock:
+            order.append(name)
+
+    blocker = scheduler.submit(["x"] * 5)
+    time.sleep(0.05)
+    low = scheduler.submit(["l"], priority=3)
+    high = scheduler.submit(["h"], priority=0)
+    threads = [threading.Thread(target=record, args=(name, job)) for name, job in (("low", low), ("high", high))]
+    for thread in threads:
+        thread.start()
+    blocker.result()
+    for thread in threads:
+        thread.join()
+
+    assert order == ["high", "low"]
+
+
+def test_deadline_and_cancel():
+    scheduler = make_scheduler(max_queue=4)
+    blocker = scheduler.submit(["x"] * 10)
+    time.sleep(0.05)
+    expired = scheduler.submit(["never"], timeout=0.05)
+    try:
+        expired.result()
+        assert False, "expected JobExpired"
+    except JobExpired:
+        pass
+    blocker.result()
+
+    job = scheduler.submit(["w"] * 50)
+    stream = job.stream()
+    next(stream)
+    stream.close()  # client went away
+    job.finished.wait(1)
+    assert scheduler.get_stats()["cancelled"] == 1
+
+
+if __name__ == "__main__":
+    test_full_queue_rejected()
+    test_priority_order()
+    test_deadline_and_cancel()
+    print("✅ Scheduler tests passed")
@@ -0,0 +1,90 @@
+"""
+Test script for the Prometheus metrics registry and structured logging
+Run this to verify the text exposition format, aggregation across worker
+processes and log field rendering
+"""
+import os
+import json
+import logging
+import tempfile
+
+from qa import MetricsRegistry
+from qa.metrics import clear_multiproc_dir, mark_process_dead
+from qa.logs import JsonFormatter, TextFormatter
+
+
+def test_exposition_format():
+    registry = MetricsRegistry()
+    answers = registry.counter("qa_answers_total", "Answers by source", ["source"])
+    latency = registry.histogram("qa_stage_seconds", "Stage latency", ["stage"], buckets=(0.1, 1.0))
+    registry.gauge("qa_queue_depth", "Waiting jobs", fn=lambda: 3)
+    registry.gauge("qa_not_loaded", "Component missing", fn=lambda: None.missing)
+
+    answers.inc("llm")
+    answers.inc("knowledge_base", amount=2)
+    latency.observe(0.05, "embed")
+    latency.observe(0.1, "embed")  # le is inclusive
+    latency.observe(3.0, "embed")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE qa_answers_total counter" in lines
+    assert 'qa_answers_total{source="knowledge_base"} 2' in lines
+    assert 'qa_stage_seconds_bucket{stage="embed",le="0.1"} 2' in lines
+    assert 'qa_stage_seconds_bucket{stage="embed",le="1"} 2' in lines
+    assert 'qa_stage_seconds_bucket{stage="embed",le="+Inf"} 3' in lines
+    assert 'qa_stage_seconds_count{stage="embed"} 3' in lines
+    assert "qa_queue_depth 3" in lines
+    assert not any(line.startswith("qa_not_loaded") for line in lines)
+
+
+def test_workers_aggregated():
+    with tempfile.TemporaryDirectory() as tmp:
+        clear_multiproc_dir(tmp)
+        registry = MetricsRegistry(tmp, sync_interval=60)
+        answers = registry.counter("qa_answers_total", "Answers by source", ["source"])
+        latency = registry.histogram("qa_stage_seconds", "Stage latency", ["stage"], buckets=(0.1, 1.0))
+        registry.gauge("qa_queue_depth", "Waiting jobs", fn=lambda: len(answers._values))
+
+        # Forked workers, as under gunicorn: one still serving, one that exited
+        workers = []
+        for amount, exits in ((2, False), (3, True)):
+            pid = os.fork()
+            if pid == 0:
+                registry.start_sync()
+                answers.inc("llm", amount=amount)
+                latency.observe(0.5, "embed")
+                if exits:
+                    registry.close()
+                else:
+                    registry.render()
+                os._exit(0)
+            os.waitpid(pid, 0)
+            workers.append(pid)
+        mark_process_dead(tmp, workers[1])
+
+        answers.inc("llm")
+        lines = registry.render().splitlines()
+        assert 'qa_answers_total{source="llm"} 6' in lines
+        assert 'qa_stage_seconds_bucket{stage="embed",le="1"} 2' in lines
+        assert 'qa_stage_seconds_count{stage="embed"} 2' in lines
+        depths = [line for line in lines if line.startswith("qa_queue_depth{")]
+        assert sorted(depths) == sorted([f'qa_queue_depth{{worker="{os.getpid()}"}} 1',
+                                         f'qa_queue_depth{{worker="{workers[0]}"}} 1'])
+
+
+def test_log_fields():
+    record = logging.LogRecord("qa_engine", logging.DEBUG, __file__, 1, "KB search", None, None)
+    record.query = 'where is "the" lab'
+    record.distance = 0.42
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["msg"] == "KB search" and entry["level"] == "DEBUG"
+    assert entry["query"] == 'where is "the" lab' and entry["distance"] == 0.42
+    assert TextFormatter().format(record).endswith("""query='where is "the" lab' distance=0.42""")
+
+
+if __name__ == "__main__":
+    test_exposition_format()
+    test_workers_aggregated()
+    test_log_fields()
+    print("✅ Metrics tests passed")
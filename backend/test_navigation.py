@@ -2,7 +2,10 @@
 Test script for the navigation system
 Run this to verify components work correctly
 """
-from navigation import CampusMap, dijkstra, get_navigation_instructions
+import random
+
+from navigation import CampusMap, astar, dijkstra, get_navigation_instructions
+from navigation.synthetic_campus import generate_campus
 
 def test_pathfinding():
     print("=" * 60)
@@ -51,5 +54,32 @@ def test_pathfinding():
     print("✅ Tests Complete")
     print("=" * 60)
 
+def test_astar():
+    # The A Block plan matches its edge lengths, so the heuristic is used at full strength
+    campus_map = CampusMap()
+    assert campus_map.get_heuristic_scale() == 1.0
+    for goal in campus_map.get_all_nodes():
+        assert astar(campus_map, "Entrance", goal) == dijkstra(campus_map, "Entrance", goal)
+    assert astar(campus_map, "Entrance", "Nowhere") == (None, None)
+    
+    campus = generate_campus(buildings=4, floors=3, corridor_nodes=12, seed=1)
+    nodes = campus.get_all_nodes()
+    assert len(nodes) == 4 * 3 * 12 * 3 and campus.get_heuristic_scale() == 1.0
+    rng = random.Random(0)
+    for _ in range(100):
+        start, goal = rng.choice(nodes), rng.choice(nodes)
+        path, distance = astar(campus, start, goal)
+        assert abs(distance - dijkstra(campus, start, goal)[1]) < 1e-9
+        assert path[0] == start and path[-1] == goal
+        assert abs(sum(campus.get_edge_weight(a, b) for a, b in zip(path, path[1:])) - distance) < 1e-9
+    
+    # A hand-entered edge shorter than the plan only weakens the heuristic
+    campus.add_edge("B0_F0_C0", "B3_F0_C0", 10.0)
+    assert 0 < campus.get_heuristic_scale() < 1
+    assert astar(campus, "B0_F0_C0", "B3_F2_C5") == dijkstra(campus, "B0_F0_C0", "B3_F2_C5")
+    print("✅ A* OK")
+
+
 if __name__ == "__main__":
     test_pathfinding()
+    test_astar()
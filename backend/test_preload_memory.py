@@ -0,0 +1,171 @@
+"""
+Test script for preload-in-master memory sharing
+Loads a FAISS index (and a stand-in for embedder weights) in the parent,
+forks workers like gunicorn's preload_app does and checks that each worker's
+private memory stays small while it serves searches. When the TinyLlama GGUF
+is present, also checks that a memory-mapped Llama costs a worker far less
+than the model file, and that QAEngine.preload() leaves the master loaded
+and frozen for the fork. Linux only (reads /proc/self/smaps_rollup)
+"""
+import os
+import gc
+import json
+import tempfile
+
+import numpy as np
+
+from bench_qa_pipeline import BenchEngine, StageTimer
+from config import EMBED_BACKEND, MODEL_PATH
+from qa import IndexStore, MicroBatcher, normalize_vectors
+
+N_VECTORS = 30000
+DIM = 384
+WEIGHTS_MB = 64
+
+
+def private_mb():
+    """
+    Private dirty memory: pages this process alone has written. Copy-on-write
+    pages still shared with the master and page-cache pages of mapped files
+    (which every worker shares) are excluded
+    """
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Private_Dirty:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def in_worker(work):
+    """Fork, run work() in the child and return its JSON-able result"""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            result = work()
+        except Exception as e:
+            result = {"error": repr(e)}
+        with os.fdopen(write_fd, "w") as f:
+            json.dump(result, f)
+        os._exit(0)
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = json.load(f)
+    os.waitpid(pid, 0)
+    assert "error" not in result, result["error"]
+    return result
+
+
+def test_forked_workers_share_preloaded_index():
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        print("skipped: needs Linux /proc")
+        return
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = IndexStore(os.path.join(tmp, "vector.index"), "test-model", "flat", mmap=True)
+        texts = [f"question {i}" for i in range(N_VECTORS)]
+        store.sync(texts, lambda batch: rng.standard_normal((len(batch), DIM)).astype("float32"))
+
+        # What a preloading master holds: the index, the stored vectors and model weights
+        index, id_to_pos, _ = store.sync(texts, None)
+        weights = rng.standard_normal(WEIGHTS_MB * 1024 * 1024 // 4).astype("float32")
+        batcher = MicroBatcher(lambda queries: [index.search(q, 3)[1].tolist() for q in queries], name="test")
+        preloaded_mb = (index.ntotal * DIM * 4) / 2 ** 20 + weights.nbytes / 2 ** 20
+        index.search(np.zeros((1, DIM), dtype="float32"), 1)  # warm the mapped index like preload() does
+        gc.freeze()
+
+        def serve():
+            before = private_mb()
+            queries = normalize_vectors(rng.standard_normal((200, DIM)).astype("float32"))
+            for query in queries:
+                batcher.submit(query.reshape(1, -1), timeout=5)  # batcher thread restarted after fork
+            float(weights[::4096].sum())  # read the "model" like an encode would
+            return {"growth_mb": private_mb() - before, "private_mb": private_mb()}
+
+        results = [in_worker(serve) for _ in range(2)]
+
+    for result in results:
+        print(f"worker private memory: {result['private_mb']:.1f} MB "
+              f"(+{result['growth_mb']:.1f} MB while serving, {preloaded_mb:.0f} MB preloaded)")
+        assert result["private_mb"] < preloaded_mb * 0.25
+
+
+def test_mapped_index_survives_rebuild():
+    # A worker (or an in-flight search during /kb/reload) keeps its mapping
+    # while the index file is rewritten, e.g. by build_qa_index.py
+    rng = np.random.default_rng(1)
+    encode = lambda batch: rng.standard_normal((len(batch), DIM)).astype("float32")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vector.index")
+        texts = [f"question {i}" for i in range(5000)]
+        IndexStore(path, "test-model", "flat").sync(texts, encode)
+
+        def search_across_rebuild():
+            index, _, _ = IndexStore(path, "test-model", "flat", mmap=True).sync(texts, None)
+            query = normalize_vectors(encode(["q"]))
+            before = index.search(query, 3)[1].tolist()
+            IndexStore(path, "test-model", "flat").sync(texts, encode, force=True)
+            return {"same": index.search(query, 3)[1].tolist() == before}
+
+        assert in_worker(search_across_rebuild)["same"]  # the child dies of SIGBUS on an in-place rewrite
+
+
+def test_engine_preload():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = BenchEngine(StageTimer(), True, tmp)
+        gc.unfreeze()
+        try:
+            engine.preload()
+            assert gc.get_freeze_count() > 0
+            assert engine.is_ready("kb") and len(engine.knowledge_base) > 0
+            # The per-worker stages are left for start_background()
+            for name in ("llm", "tts", "stt"):
+                assert not engine.is_ready(name), name
+            if EMBED_BACKEND == "onnx":
+                assert not engine.is_ready("index")
+                return
+
+            assert engine.is_ready("embedder") and engine.is_ready("index")
+            assert engine.kb.index.ntotal == len(engine.knowledge_base)
+            question = engine.knowledge_base[0]["question"]
+            answer = engine.knowledge_base[0]["answer"]
+
+            def search():
+                # A forked worker serves KB answers from the preloaded index
+                return {"answer": engine.search_kb(question.lower().rstrip("?"))[0]}
+
+            assert in_worker(search)["answer"] == answer
+        finally:
+            gc.unfreeze()
+            engine.shutdown()
+
+
+def test_mmapped_gguf_is_shared():
+    if not os.path.exists(MODEL_PATH) or not os.path.exists("/proc/self/smaps_rollup"):
+        print("skipped: GGUF model not found")
+        return
+    from llama_cpp import Llama
+
+    model_mb = os.path.getsize(MODEL_PATH) / 2 ** 20
+
+    def load():
+        before = private_mb()
+        llm = Llama(model_path=MODEL_PATH, n_ctx=512, n_threads=1, use_mmap=True, verbose=False)
+        llm("Hello", max_tokens=4)
+        return {"growth_mb": private_mb() - before}
+
+    # Warm the page cache, then measure what one more worker adds
+    in_worker(load)
+    result = in_worker(load)
+    print(f"llama worker private growth: {result['growth_mb']:.1f} MB (model file {model_mb:.0f} MB)")
+    assert result["growth_mb"] < model_mb * 0.5
+
+
+if __name__ == "__main__":
+    test_forked_workers_share_preloaded_index()
+    test_mapped_index_survives_rebuild()
+    test_engine_preload()
+    test_mmapped_gguf_is_shared()
+    print("✅ Preload memory tests passed")
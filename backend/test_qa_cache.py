@@ -0,0 +1,53 @@
+"""
+Test script for the two-tier answer cache
+Run this to verify exact, semantic, TTL and eviction behaviour
+"""
+import time
+
+import numpy as np
+
+from qa import AnswerCache
+
+
+def test_exact_tier():
+    cache = AnswerCache(max_size=2, ttl=0)
+    cache.put("Where is the library?", "Ground floor.", "knowledge_base")
+    
+    assert cache.get("  where is the LIBRARY ") == ("Ground floor.", "knowledge_base", None)
+    assert cache.get("Where is the cafeteria?") is None
+    
+    cache.put("q2", "a2", "llm")
+    cache.put("q3", "a3", "llm")
+    assert cache.get("Where is the library?") is None  # evicted (LRU)
+    assert cache.get_stats()["evictions"] == 1
+
+
+def test_semantic_tier():
+    cache = AnswerCache(semantic_distance=0.1)
+    vec = np.array([1.0, 0.0, 0.0], dtype="float32")
+    cache.put("fee office timings", "9am to 4pm.", "llm", vec, tag=7)
+    
+    assert cache.get_semantic(np.array([0.9, 0.1, 0.0])) == ("9am to 4pm.", "llm", 7)
+    assert cache.get_semantic(np.array([0.0, 1.0, 0.0])) is None
+
+
+def test_ttl_and_invalidation():
+    cache = AnswerCache(ttl=0.05)
+    cache.put("hello", "Hi there!", "llm", np.ones(3))
+    assert cache.get("hello") is not None
+    
+    time.sleep(0.1)
+    assert cache.get("hello") is None
+    assert cache.get_semantic(np.ones(3)) is None
+    
+    cache.put("hello", "Hi there!", "llm", np.ones(3))
+    cache.clear()
+    assert cache.get("hello") is None
+    assert cache.get_stats()["invalidations"] == 1
+
+
+if __name__ == "__main__":
+    test_exact_tier()
+    test_semantic_tier()
+    test_ttl_and_invalidation()
+    print("✅ Cache tests passed")
@@ -0,0 +1,126 @@
+"""
+Test script for QAEngine
+Runs the engine on the benchmark's stub backend (no model files needed)
+"""
+import tempfile
+import threading
+
+from bench_qa_pipeline import BenchEngine, StageTimer
+from config import BATCH_LLM_CONCURRENCY, BATCH_MAX_QUESTIONS
+
+OFF_KB = ["What is the meaning of life?", "Can you write me a poem about rain?",
+          "How do airplanes stay in the air?", "Why is the sky blue?"]
+
+
+def stub_engine(workdir):
+    engine = BenchEngine(StageTimer(), True, workdir)
+    engine.initialize()
+    return engine
+
+
+def test_reload_swaps_whole_state():
+    old_kb = [{"question": "Where is the library?", "answer": "Old library answer"}]
+    new_kb = [{"question": "Where is the library?", "answer": "New library answer"},
+              {"question": "When does the gym open?", "answer": "At 7am"}]
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = stub_engine(workdir)
+        try:
+            engine._load_kb = lambda: old_kb
+            engine.reload_kb()
+            assert engine.search_kb("where is the library")[0] == "Old library answer"
+
+            building, release = threading.Event(), threading.Event()
+            build = engine._build_kb_state
+
+            def slow_build(documents, rebuild=False):
+                state = build(documents, rebuild)
+                building.set()
+                release.wait(5)
+                return state
+
+            engine._build_kb_state = slow_build
+            engine._load_kb = lambda: new_kb
+            reload = threading.Thread(target=engine.reload_kb)
+            reload.start()
+            assert building.wait(5)
+
+            # The new index is built but not yet swapped in: requests see the old state
+            assert engine.knowledge_base == old_kb
+            assert engine.search_kb("where is the library")[0] == "Old library answer"
+            assert engine.search_kb("when does the gym open")[0] is None
+
+            release.set()
+            reload.join(5)
+            assert engine.knowledge_base == new_kb
+            assert engine.search_kb("where is the library")[0] == "New library answer"
+            assert engine.search_kb("when does the gym open")[0] == "At 7am"
+        finally:
+            engine.shutdown()
+
+
+def test_answer_batch_order_and_window():
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = stub_engine(workdir)
+        try:
+            kb = engine.knowledge_base
+            cached_kb, cached_llm = engine.get_answer(kb[0]["question"]), engine.get_answer(OFF_KB[0])
+            assert cached_kb[1] == "knowledge_base" and cached_llm[1] == "llm"
+
+            submitted, in_flight, widest = [], [0], [0]
+            submit, finish = engine._submit_llm, engine._finish_batch_job
+
+            def counting_submit(query, interactive=True):
+                assert not interactive
+                submitted.append(query)
+                in_flight[0] += 1
+                widest[0] = max(widest[0], in_flight[0])
+                return submit(query, interactive)
+
+            def counting_finish(*args):
+                in_flight[0] -= 1
+                return finish(*args)
+
+            engine._submit_llm, engine._finish_batch_job = counting_submit, counting_finish
+            queries = [OFF_KB[1], kb[0]["question"], OFF_KB[2], OFF_KB[0], kb[1]["question"], OFF_KB[3], OFF_KB[1]]
+            results = engine.answer_batch(queries)
+
+            assert [r["question"] for r in results] == queries
+            assert results[1]["answer"] == cached_kb[0] and results[1]["source"] == "knowledge_base"
+            assert results[3]["answer"] == cached_llm[0] and results[3]["source"] == "llm"
+            assert results[4]["answer"] == kb[1]["answer"]
+            for i in (0, 2, 5, 6):
+                assert results[i]["source"] == "llm" and results[i]["answer"], results[i]
+            assert results[0]["answer"] == results[6]["answer"]
+
+            # Only uncached misses reach the LLM, once per distinct question, a window at a time
+            assert submitted == [OFF_KB[1], OFF_KB[2], OFF_KB[3]]
+            assert widest[0] == min(BATCH_LLM_CONCURRENCY, len(submitted))
+            assert in_flight[0] == 0
+
+            # Generated answers were cached like /ask ones
+            assert engine.answer_batch([OFF_KB[2]])[0]["answer"] == results[2]["answer"]
+            assert len(submitted) == 3
+        finally:
+            engine.shutdown()
+
+
+def test_answer_batch_rejects_bad_input():
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = stub_engine(workdir)
+        try:
+            for bad in (None, "Where is the library?", [], ["ok", 3], ["ok", "  "],
+                        ["q"] * (BATCH_MAX_QUESTIONS + 1)):
+                try:
+                    engine.answer_batch(bad)
+                except ValueError:
+                    continue
+                raise AssertionError(f"accepted {bad!r}")
+        finally:
+            engine.shutdown()
+
+
+if __name__ == "__main__":
+    test_reload_swaps_whole_state()
+    test_answer_batch_order_and_window()
+    test_answer_batch_rejects_bad_input()
+    print("✅ QA engine tests passed")
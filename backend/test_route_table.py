@@ -0,0 +1,127 @@
+"""
+Test script for the all-pairs route table
+Checks table lookups against dijkstra, rebuilds after map edits and blocked
+edges, and lookups while the map is being edited. Needs no motor or sensor
+drivers
+"""
+import sys
+import time
+import logging
+import random
+import threading
+
+from navigation import CampusMap, RouteTable, dijkstra, get_navigation_instructions
+from navigation.synthetic_campus import generate_campus
+
+
+def test_route_table():
+    campus_map = CampusMap()
+    table = RouteTable(campus_map)
+    nodes = campus_map.get_all_nodes()
+    
+    # Every pair matches dijkstra
+    for start in nodes:
+        for goal in nodes:
+            path, distance = table.route(start, goal)
+            expected_path, expected_distance = dijkstra(campus_map, start, goal)
+            assert abs(distance - expected_distance) < 1e-4, (start, goal)
+            assert path[0] == start and path[-1] == goal
+            assert sum(campus_map.get_edge_weight(a, b) for a, b in zip(path, path[1:])) == expected_distance
+    assert table.get_stats()["fallback_lookups"] == 0
+    assert table.get_navigation_instructions("Entrance", "D4") == \
+        get_navigation_instructions(campus_map, dijkstra(campus_map, "Entrance", "D4")[0])
+    
+    # Blocking the corridor cuts the faculty wing off; lookups never use the blocked edge
+    campus_map.block_edge("Corridor_Main", "Faculty_Offices")
+    assert table.route("Entrance", "Director_Office") == (None, None)
+    deadline = time.time() + 5
+    while not table.is_current() and time.time() < deadline:
+        time.sleep(0.01)
+    assert table.is_current() and table.route("Entrance", "Director_Office") == (None, None)
+    
+    # A new edge opens a longer way round
+    campus_map.add_edge("Accounts_Office", "Faculty_Offices", 12.0, "turn_left", 90)
+    table.rebuild()
+    path, distance = table.route("Entrance", "Director_Office")
+    assert path == ["Entrance", "Corridor_Main", "Accounts_Office", "Faculty_Offices", "Director_Office"]
+    assert distance == 27.0
+    
+    campus_map.unblock_edge("Corridor_Main", "Faculty_Offices")
+    table.rebuild()
+    assert table.route("Entrance", "Director_Office")[1] == 15.0
+    print(f"✅ Route table OK: {table.get_stats()}")
+
+
+def test_route_table_concurrent_edits():
+    # Edits keep the table stale, so lookups search the live map while it changes
+    campus = generate_campus(buildings=2, floors=2, corridor_nodes=10, seed=2)
+    table = RouteTable(campus)
+    nodes = campus.get_all_nodes()
+    errors = []
+    done = threading.Event()
+    
+    def edit():
+        while not done.is_set():
+            for node in nodes[::3]:
+                campus.add_edge(node, "Kiosk", 3.0)
+            campus.remove_node("Kiosk")
+    
+    def lookup(seed):
+        rng = random.Random(seed)
+        for _ in range(200):
+            try:
+                path, _ = table.route(rng.choice(nodes), rng.choice(nodes))
+                assert path is not None
+            except Exception as e:
+                errors.append(e)
+    
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads often enough to hit a search mid-edit
+    editor = threading.Thread(target=edit)
+    editor.start()
+    lookups = [threading.Thread(target=lookup, args=(seed,)) for seed in range(4)]
+    for thread in lookups:
+        thread.start()
+    for thread in lookups:
+        thread.join()
+    done.set()
+    editor.join()
+    sys.setswitchinterval(switch_interval)
+    
+    assert not errors, errors[:3]
+    stats = table.get_stats()
+    assert stats["table_lookups"] + stats["fallback_lookups"] == 4 * 200 and stats["fallback_lookups"]
+    print(f"✅ Route table under edits OK: {stats}")
+
+
+def test_rebuild_failure_is_logged():
+    campus_map = CampusMap()
+    table = RouteTable(campus_map)
+    failures = []
+    table.rebuild = lambda: failures.append(1) or 1 / 0
+
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append(record)
+
+    handler = Collect()
+    logging.getLogger("navigation.route_table").addHandler(handler)
+    try:
+        campus_map.block_edge("Corridor_Main", "Faculty_Offices")
+        deadline = time.time() + 5
+        while not records and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        logging.getLogger("navigation.route_table").removeHandler(handler)
+
+    assert failures and records and records[0].exc_info[0] is ZeroDivisionError
+    # Lookups still fall back to the live map
+    assert table.route("Entrance", "Director_Office") == (None, None)
+
+
+if __name__ == "__main__":
+    test_route_table()
+    test_route_table_concurrent_edits()
+    test_rebuild_failure_is_logged()
@@ -0,0 +1,57 @@
+"""
+Test script for the sentence-pipelined TTS stream
+"""
+import threading
+import time
+
+from qa import SpeechPipeline, split_sentences
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_split_sentences():
+    pieces = ["Room 3.", "5 is on the ", "first floor. Dr. Khan", " is in room 12. Bye"]
+    assert list(split_sentences(pieces)) == ["Room 3.5 is on the first floor.", "Dr. Khan is in room 12.", "Bye"]
+
+
+def test_stream_yields_header_then_pcm():
+    pipeline = SpeechPipeline(lambda text: text.encode("utf-8"), 22050)
+    chunks = list(pipeline.stream(iter(["One sentence here.", "Another sentence."])))
+    assert chunks[0].startswith(b"RIFF")
+    assert chunks[1:] == [b"One sentence here.", b"Another sentence."]
+
+
+def test_disconnect_stops_producer():
+    closed = threading.Event()
+
+    def sentences():
+        try:
+            while True:
+                yield "An endless supply of sentences."
+        finally:
+            closed.set()
+
+    before = threading.active_count()
+    pipeline = SpeechPipeline(lambda text: b"\0\0", 22050, max_pending=1)
+    stream = pipeline.stream(sentences())
+    next(stream)  # header
+    next(stream)  # first sentence; the producer now fills the queue
+    time.sleep(0.2)
+    stream.close()  # client went away with the queue full
+
+    assert closed.wait(5)
+    assert wait_for(lambda: threading.active_count() <= before), "producer thread leaked"
+
+
+if __name__ == "__main__":
+    test_split_sentences()
+    test_stream_yields_header_then_pcm()
+    test_disconnect_stops_producer()
+    print("✅ Speech pipeline tests passed")
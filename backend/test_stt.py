@@ -0,0 +1,123 @@
+"""
+Test script for speech-to-text decoding and backend dispatch
+Uses generated WAV buffers and a recording backend, so no STT model is needed
+"""
+import io
+import sys
+import types
+import wave
+
+import numpy as np
+
+from qa import SpeechToText, decode_audio
+from qa.stt import STT_BACKENDS
+
+
+def make_wav(samples, rate, channels=1, sample_width=2):
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(sample_width)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buf.getvalue()
+
+
+class RecordingRecognizer:
+    name = "recording"
+    heard = []
+    reply = "  where is the library  "
+
+    def __init__(self, model_path=None, sample_rate=16000):
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+
+    def transcribe_pcm(self, pcm):
+        self.heard.append(pcm)
+        return self.reply
+
+
+def test_decode_wav():
+    # 16 kHz mono passes straight through
+    mono = (np.arange(1600) % 200 - 100).astype(np.int16)
+    assert decode_audio(make_wav(mono, 16000)) == mono.tobytes()
+
+    # 44.1 kHz stereo is downmixed and resampled
+    left = np.full(44100, 1000, dtype=np.int16)
+    right = np.full(44100, 3000, dtype=np.int16)
+    stereo = np.column_stack([left, right]).ravel()
+    pcm = np.frombuffer(decode_audio(make_wav(stereo, 44100, channels=2)), dtype=np.int16)
+    assert len(pcm) == 16000
+    assert (pcm == 2000).all()
+
+    assert decode_audio(make_wav(np.zeros(0, dtype=np.int16), 44100)) == b""
+
+
+def test_compressed_audio_goes_through_pydub():
+    calls = []
+
+    class AudioSegment:
+        raw_data = b"\x01\x00" * 8
+
+        @classmethod
+        def from_file(cls, f):
+            calls.append(("from_file", f.read()))
+            return cls()
+
+        def set_frame_rate(self, rate):
+            calls.append(("rate", rate))
+            return self
+
+        def set_channels(self, channels):
+            calls.append(("channels", channels))
+            return self
+
+        def set_sample_width(self, width):
+            calls.append(("width", width))
+            return self
+
+    saved = sys.modules.get("pydub")
+    sys.modules["pydub"] = types.SimpleNamespace(AudioSegment=AudioSegment)
+    try:
+        assert decode_audio(b"OggS not a wav", 16000) == AudioSegment.raw_data
+        # 8-bit WAV isn't read directly either
+        eight_bit = make_wav(np.full(100, 128, dtype=np.uint8), 8000, sample_width=1)
+        assert decode_audio(eight_bit, 16000) == AudioSegment.raw_data
+    finally:
+        if saved is None:
+            del sys.modules["pydub"]
+        else:
+            sys.modules["pydub"] = saved
+    assert calls[:4] == [("from_file", b"OggS not a wav"), ("rate", 16000), ("channels", 1), ("width", 2)]
+    assert calls[4] == ("from_file", eight_bit)
+
+
+def test_backend_dispatch():
+    STT_BACKENDS[RecordingRecognizer.name] = RecordingRecognizer
+    try:
+        stt = SpeechToText("recording", "/models/stt", sample_rate=8000)
+        assert isinstance(stt.recognizer, RecordingRecognizer)
+        assert stt.recognizer.model_path == "/models/stt" and stt.recognizer.sample_rate == 8000
+
+        samples = np.full(16000, 500, dtype=np.int16)
+        text, latency_ms = stt.transcribe(make_wav(samples, 16000))
+        assert text == "where is the library" and latency_ms >= 0
+        assert len(RecordingRecognizer.heard[-1]) == 8000 * 2  # decoded at the backend's rate
+
+        RecordingRecognizer.reply = "   "
+        assert stt.transcribe(make_wav(samples, 16000))[0] is None
+    finally:
+        del STT_BACKENDS[RecordingRecognizer.name]
+
+    try:
+        SpeechToText("nope", None)
+        raise AssertionError("unknown backend accepted")
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    test_decode_wav()
+    test_compressed_audio_goes_through_pydub()
+    test_backend_dispatch()
+    print("✅ STT tests passed")
@@ -0,0 +1,48 @@
+"""
+Test script for the persistent TTS worker pool
+Workers start without a voice model (piper falls back to the CLI and
+synthesis isn't exercised), which is enough for the ping / restart path
+"""
+import threading
+
+from qa import TTSWorkerPool
+
+
+def test_health_check_leaves_other_workers_usable():
+    pool = TTSWorkerPool("missing-voice.onnx", size=2, health_interval=3600).start()
+    try:
+        first, second = pool.workers
+        restarting, release = threading.Event(), threading.Event()
+        start = first.start
+
+        def slow_start(timeout=60):
+            restarting.set()
+            release.wait(5)
+            start(timeout)
+
+        first.start = slow_start
+        first.process.kill()
+        first.process.wait()
+
+        check = threading.Thread(target=pool.check_health)
+        check.start()
+        assert restarting.wait(5)
+
+        # The dead worker is being restarted; the healthy one is still in the pool
+        worker = pool._idle.get(timeout=2)
+        assert worker is second
+        pool._idle.put(worker)
+
+        release.set()
+        check.join(10)
+        assert not check.is_alive()
+        assert first.is_alive() and first.restarts == 1
+        assert second.restarts == 0
+        assert pool._idle.qsize() == 2
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    test_health_check_leaves_other_workers_usable()
+    print("✅ TTS pool tests passed")